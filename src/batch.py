@@ -0,0 +1,169 @@
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from slugify import slugify
+
+from file_converter import book_metadata
+from llm_cache import ExtractionCache
+from llm_router import format_endpoint_stats
+import main
+from main import (
+    CACHE_MAX_ENTRIES, CACHE_PATH, MAX_CONCURRENT_REQUESTS, RELATIONS_DIR,
+    embeddings, extract_characters_progressively, get_llm_extractor, load_vectordb, split_book
+)
+
+# ===================== CONFIG =====================
+DOSSIER_LIVRES = "../livres"
+EXTENSIONS = {".epub", ".pdf", ".txt"}
+INDEX_WORKERS = 2  # processus d'indexation (chacun charge son modèle d'embeddings)
+BOOK_WORKERS = 4   # livres en cours d'extraction simultanément
+
+
+def discover_books(dossier):
+    """
+    Liste les livres d'un dossier, avec leur titre et auteur.
+
+    Le titre et l'auteur sont lus dans les métadonnées du fichier si possible, sinon le titre
+    est déduit du nom de fichier. Deux livres donnant le même slug ne peuvent pas partager
+    une base Chroma : seul le premier est retenu, les suivants sont signalés en erreur.
+    """
+    books = []
+    doublons = []
+    slugs = set()
+    for nom in sorted(os.listdir(dossier)):
+        chemin = os.path.join(dossier, nom)
+        if not os.path.isfile(chemin) or os.path.splitext(nom)[1].lower() not in EXTENSIONS:
+            continue
+        try:
+            meta = book_metadata(chemin)
+        except Exception:
+            meta = {}
+        titre = meta.get("titre") or os.path.splitext(nom)[0].replace("_", " ")
+        auteur = meta.get("auteur") or "Inconnu"
+        book = {"fichier": chemin, "titre": titre, "auteur": auteur, "slug": slugify(titre)}
+        if book["slug"] in slugs:
+            doublons.append(book)
+        else:
+            slugs.add(book["slug"])
+            books.append(book)
+    return books, doublons
+
+
+def index_book(book):
+    """
+    Convertit et indexe un livre (exécuté dans un processus du pool d'indexation).
+    Retourne la durée de l'indexation en secondes.
+    """
+    debut = time.time()
+    load_vectordb(book["fichier"], book["titre"], book["auteur"], embeddings)
+    return time.time() - debut
+
+
+def extract_book(book, llm_pool, cache, full=False, resume=False):
+    """
+    Extrait les personnages d'un livre déjà indexé, en soumettant les appels LLM au pool partagé.
+    Retourne le chemin du fichier de relations produit.
+    """
+    vectordb = load_vectordb(book["fichier"], book["titre"], book["auteur"], embeddings)
+    chunks = (d["text"] for d in split_book(book["fichier"], book["titre"], book["auteur"])) if full else None
+    return extract_characters_progressively(
+        vectordb, get_llm_extractor(), book["titre"], book["auteur"], RELATIONS_DIR,
+        cache=cache, resume=resume, chunks=chunks, pool=llm_pool
+    )
+
+
+def run_batch(dossier, index_workers=INDEX_WORKERS, book_workers=BOOK_WORKERS,
+              llm_concurrency=None, full=False, resume=False):
+    """
+    Traite tous les livres d'un dossier.
+
+    L'indexation se fait dans un pool de processus ; dès qu'un livre est indexé, son extraction
+    démarre et ses appels LLM rejoignent une file unique, bornée à `llm_concurrency` requêtes
+    simultanées pour l'ensemble des livres (par défaut MAX_CONCURRENT_REQUESTS par serveur LLM).
+    L'échec d'un livre n'interrompt pas les autres.
+
+    Retourne un dictionnaire nom de fichier -> {"statut": "ok" | "erreur", ...}.
+    """
+    if llm_concurrency is None:
+        llm_concurrency = MAX_CONCURRENT_REQUESTS * len(main.OLLAMA_BASE_URLS)
+    os.makedirs(RELATIONS_DIR, exist_ok=True)
+    books, doublons = discover_books(dossier)
+    results = {
+        os.path.basename(b["fichier"]): {"statut": "erreur", "etape": "découverte", "erreur": "titre en double"}
+        for b in doublons
+    }
+    total = len(books)
+    print(f"{total} livres à traiter dans '{dossier}'")
+
+    cache = ExtractionCache(CACHE_PATH, max_entries=CACHE_MAX_ENTRIES)
+    # "spawn" : le modèle d'embeddings déjà chargé dans ce processus ne doit pas être forké
+    index_pool = ProcessPoolExecutor(max_workers=index_workers, mp_context=multiprocessing.get_context("spawn"))
+    llm_pool = ThreadPoolExecutor(max_workers=llm_concurrency)
+    book_pool = ThreadPoolExecutor(max_workers=book_workers)
+
+    try:
+        index_futures = {index_pool.submit(index_book, b): b for b in books}
+        extract_futures = {}
+
+        for n, future in enumerate(as_completed(index_futures), 1):
+            book = index_futures[future]
+            try:
+                duree = future.result()
+                print(f"[indexation {n}/{total}] {book['titre']} — ok ({duree:.1f}s)")
+            except Exception as e:
+                print(f"[indexation {n}/{total}] {book['titre']} — ÉCHEC : {e}")
+                results[os.path.basename(book["fichier"])] = {"statut": "erreur", "etape": "indexation", "erreur": str(e)}
+                continue
+            debut = time.time()
+            f = book_pool.submit(extract_book, book, llm_pool, cache, full, resume)
+            extract_futures[f] = (book, debut)
+
+        for n, future in enumerate(as_completed(extract_futures), 1):
+            book, debut = extract_futures[future]
+            try:
+                out_file = future.result()
+                print(f"[extraction {n}/{len(extract_futures)}] {book['titre']} — ok → {out_file}")
+                results[os.path.basename(book["fichier"])] = {"statut": "ok", "fichier": out_file, "duree": time.time() - debut}
+            except Exception as e:
+                print(f"[extraction {n}/{len(extract_futures)}] {book['titre']} — ÉCHEC : {e}")
+                results[os.path.basename(book["fichier"])] = {"statut": "erreur", "etape": "extraction", "erreur": str(e)}
+    finally:
+        book_pool.shutdown(wait=True)
+        llm_pool.shutdown(wait=True)
+        index_pool.shutdown(wait=True)
+        cache.close()
+
+    ok = sum(1 for r in results.values() if r["statut"] == "ok")
+    print(f"\nTerminé : {ok}/{len(results)} livres traités avec succès")
+    for nom, r in sorted(results.items()):
+        if r["statut"] != "ok":
+            print(f"  - {nom} ({r['etape']}) : {r['erreur']}")
+    if main._llm_router is not None:
+        print(format_endpoint_stats(main._llm_router.stats()))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extraction des personnages pour tous les livres d'un dossier.")
+    parser.add_argument("dossier", nargs="?", default=DOSSIER_LIVRES, help="dossier contenant les livres")
+    parser.add_argument("--index-workers", type=int, default=INDEX_WORKERS,
+                        help="nombre de processus d'indexation")
+    parser.add_argument("--book-workers", type=int, default=BOOK_WORKERS,
+                        help="nombre de livres extraits simultanément")
+    parser.add_argument("--llm-concurrency", type=int,
+                        help="requêtes LLM simultanées, tous livres confondus (défaut : "
+                             f"{MAX_CONCURRENT_REQUESTS} par serveur)")
+    parser.add_argument("--llm-urls", help="serveurs LLM compatibles OpenAI, séparés par des virgules")
+    parser.add_argument("--full", action="store_true", help="analyse chaque livre en entier (avec préfiltre)")
+    parser.add_argument("--resume", action="store_true", help="reprend les extractions interrompues")
+    args = parser.parse_args()
+    if args.llm_urls:
+        main.OLLAMA_BASE_URLS = [u.strip() for u in args.llm_urls.split(",") if u.strip()]
+
+    results = run_batch(args.dossier, args.index_workers, args.book_workers,
+                        args.llm_concurrency, full=args.full, resume=args.resume)
+    sys.exit(0 if all(r["statut"] == "ok" for r in results.values()) else 1)
@@ -0,0 +1,87 @@
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+from run_journal import write_json_atomic
+from graph_binary import binary_path, read_binary_graph, read_json_graph, write_graph_binary
+
+TYPES = ["ami", "ennemi", "frère", "sœur", "père", "mère", "époux", "collègue", "maître", "rival"]
+
+
+def synthetic_characters(n_nodes, n_edges, seed=42):
+    """
+    Génère une liste de personnages au format exporté par main.py, avec n_edges relations au total.
+    """
+    rng = random.Random(seed)
+    characters = [
+        {"id": f"personnage_{i}", "nom_complet": f"Personnage {i}", "aliases": [f"P{i}"], "relations": []}
+        for i in range(n_nodes)
+    ]
+    for _ in range(n_edges):
+        src, dst = rng.randrange(n_nodes), rng.randrange(n_nodes)
+        characters[src]["relations"].append({
+            "id": f"personnage_{dst}",
+            "type_de_la_relation": rng.choice(TYPES),
+            "evidence": f"Extrait {rng.randrange(1000)} du chapitre {rng.randrange(40)}."
+        })
+    return characters
+
+
+def measure(func, repeat):
+    durees = []
+    for _ in range(repeat):
+        debut = time.perf_counter()
+        result = func()
+        durees.append(time.perf_counter() - debut)
+    return statistics.median(durees), result
+
+
+def run(n_nodes=20000, n_edges=100000, repeat=3):
+    """
+    Compare l'écriture, la taille et le chargement (lecture + construction du graphe)
+    des formats JSON et binaire sur un graphe synthétique.
+    """
+    characters = synthetic_characters(n_nodes, n_edges)
+    with tempfile.TemporaryDirectory() as dossier:
+        json_path = os.path.join(dossier, "graphe.json")
+        bin_path = binary_path(json_path)
+
+        write_json, _ = measure(lambda: write_json_atomic(json_path, characters), repeat)
+        write_bin, _ = measure(lambda: write_graph_binary(bin_path, characters), repeat)
+        load_json, g_json = measure(lambda: read_json_graph(json_path), repeat)
+        load_bin, g_bin = measure(lambda: read_binary_graph(bin_path), repeat)
+
+        assert g_json.number_of_nodes() == g_bin.number_of_nodes()
+        assert g_json.number_of_edges() == g_bin.number_of_edges()
+        results = {
+            "noeuds": g_json.number_of_nodes(),
+            "aretes": g_json.number_of_edges(),
+            "json": {"taille_octets": os.path.getsize(json_path), "ecriture_s": write_json, "chargement_s": load_json},
+            "binaire": {"taille_octets": os.path.getsize(bin_path), "ecriture_s": write_bin, "chargement_s": load_bin},
+        }
+
+    for fmt in ("json", "binaire"):
+        r = results[fmt]
+        print(f"{fmt:<8} {r['taille_octets'] / 1e6:7.1f} Mo  écriture {r['ecriture_s']:.3f}s  "
+              f"chargement {r['chargement_s']:.3f}s")
+    print(f"Chargement binaire {results['json']['chargement_s'] / results['binaire']['chargement_s']:.1f}× "
+          f"plus rapide, {results['json']['taille_octets'] / results['binaire']['taille_octets']:.1f}× plus petit")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare les exports JSON et binaire d'un graphe de relations.")
+    parser.add_argument("--nodes", type=int, default=20000, help="nombre de personnages")
+    parser.add_argument("--edges", type=int, default=100000, help="nombre de relations")
+    parser.add_argument("--repeat", type=int, default=3, help="nombre de mesures par opération")
+    parser.add_argument("--output", help="fichier JSON où écrire les résultats")
+    args = parser.parse_args()
+
+    results = run(args.nodes, args.edges, args.repeat)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,445 @@
+import os
+import re
+import sys
+import html
+import time
+import zlib
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import textwrap
+import threading
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+
+import numpy as np
+
+from fake_ollama import FakeOllama
+from constrained import ConstrainedExtractor
+from run_journal import write_json_atomic
+from telemetry import tracer
+
+# ===================== CONFIG =====================
+TITRE = "Le Livre de synthèse"
+AUTEUR = "Banc d'essai"
+FORMATS = ["txt", "epub", "pdf"]
+CAST_SIZE = 40
+CHAPTERS = 12
+PARAGRAPHS_PER_CHAPTER = 40
+SCENE_SIZE = 6           # personnages qui se croisent dans un même chapitre
+MENTION_RATE = 0.6       # proportion de paragraphes qui citent deux personnages
+LLM_LATENCY = 0.05       # secondes par appel au faux serveur
+SEARCH_QUERIES = 20
+SEARCH_K = 5
+HASH_DIM = 384           # dimension des vecteurs du moteur d'embeddings de substitution
+PDF_LINES_PER_PAGE = 60
+PDF_LINE_WIDTH = 95
+
+PRENOMS = [
+    "Adèle", "Albert", "Armand", "Blanche", "Camille", "Clément", "Delphine", "Édouard", "Élise",
+    "Émile", "Fanny", "Félix", "Gaston", "Hélène", "Honoré", "Irène", "Jules", "Laure", "Léon",
+    "Lucie", "Marcel", "Margot", "Mathilde", "Octave", "Pauline", "Raoul", "Rosalie", "Sidonie",
+    "Théodore", "Victor"
+]
+NOMS = [
+    "Aubert", "Bellanger", "Chauvin", "Delorme", "Duplessis", "Fournier", "Garnier", "Lambert",
+    "Lemaire", "Marchand", "Mercier", "Morel", "Perrin", "Renaud", "Rivière", "Roussel", "Tessier",
+    "Vasseur"
+]
+PHRASES_RELATION = [
+    "{a} retrouva {b} au bord du canal.",
+    "{a} écrivit une longue lettre à {b}.",
+    "{a} se méfiait de {b} depuis l'affaire du moulin.",
+    "{a} accompagna {b} jusqu'à la gare.",
+    "{a} et {b} se disputèrent au sujet de l'héritage.",
+    "{a} confia son secret à {b}.",
+]
+PHRASES = [
+    "La pluie tombait sur la ville depuis le matin.",
+    "Le vent faisait battre les volets de la vieille maison.",
+    "On entendait au loin les cloches de l'église.",
+    "La route montait entre les vignes jusqu'au plateau.",
+    "Le soir venu, les lampes s'allumaient une à une.",
+    "Personne ne savait ce que contenait la malle.",
+    "Les jours passaient sans apporter de nouvelles.",
+    "Le marché débordait de paniers et de cris.",
+]
+QUERY_GENERIQUE = "personnages principaux relations famille amis ennemis"
+
+
+# ===================== LIVRES SYNTHÉTIQUES =====================
+def make_cast(size, seed=0):
+    """
+    Tire `size` noms distincts "Prénom Nom".
+    """
+    combinaisons = [f"{p} {n}" for p in PRENOMS for n in NOMS]
+    if size > len(combinaisons):
+        raise ValueError(f"Distribution limitée à {len(combinaisons)} personnages")
+    return random.Random(seed).sample(combinaisons, size)
+
+
+def make_chapters(cast, chapters=CHAPTERS, paragraphs=PARAGRAPHS_PER_CHAPTER, seed=0):
+    """
+    Génère le texte d'un livre : une liste de (titre, [paragraphes]).
+
+    Chaque chapitre met en scène un petit groupe de personnages, ce qui donne au graphe extrait
+    une structure de communautés reliées entre elles, comme dans un vrai roman.
+    """
+    rng = random.Random(seed)
+    result = []
+    for n in range(1, chapters + 1):
+        scene = rng.sample(cast, min(SCENE_SIZE, len(cast)))
+        paras = []
+        for _ in range(paragraphs):
+            phrases = rng.sample(PHRASES, 4)
+            if len(scene) >= 2 and rng.random() < MENTION_RATE:
+                a, b = rng.sample(scene, 2)
+                phrases.insert(rng.randrange(len(phrases) + 1), rng.choice(PHRASES_RELATION).format(a=a, b=b))
+            paras.append(" ".join(phrases))
+        result.append((f"Chapitre {n}", paras))
+    return result
+
+
+def write_txt(path, titre, auteur, chapters):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{titre}\n{auteur}\n\n")
+        for titre_chapitre, paras in chapters:
+            f.write(f"{titre_chapitre}\n\n" + "\n\n".join(paras) + "\n\n")
+
+
+def write_epub(path, titre, auteur, chapters):
+    """
+    Écrit un epub d'un document par chapitre (comme la plupart des epub réels).
+    """
+    from ebooklib import epub
+
+    book = epub.EpubBook()
+    book.set_identifier(f"bench-{zlib.crc32(titre.encode('utf-8')):08x}")
+    book.set_title(titre)
+    book.set_language("fr")
+    book.add_author(auteur)
+    items = []
+    for n, (titre_chapitre, paras) in enumerate(chapters, 1):
+        item = epub.EpubHtml(title=titre_chapitre, file_name=f"chap_{n:03d}.xhtml", lang="fr")
+        item.content = f"<h1>{html.escape(titre_chapitre)}</h1>" + "".join(
+            f"<p>{html.escape(p)}</p>" for p in paras
+        )
+        book.add_item(item)
+        items.append(item)
+    book.toc = items
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+    book.spine = ["nav"] + items
+    epub.write_epub(path, book)
+
+
+def write_pdf(path, titre, auteur, chapters):
+    """
+    Écrit un pdf A4, avec une entrée de table des matières par chapitre (lue par file_converter).
+    """
+    import fitz
+
+    doc = fitz.open()
+    toc = []
+    for titre_chapitre, paras in chapters:
+        lignes = [titre_chapitre, ""]
+        for p in paras:
+            lignes += textwrap.wrap(p, PDF_LINE_WIDTH) + [""]
+        for debut in range(0, len(lignes), PDF_LINES_PER_PAGE):
+            page = doc.new_page()
+            if debut == 0:
+                toc.append([1, titre_chapitre, doc.page_count])
+            page.insert_text((50, 60), "\n".join(lignes[debut:debut + PDF_LINES_PER_PAGE]), fontsize=10)
+    doc.set_toc(toc)
+    doc.set_metadata({"title": titre, "author": auteur})
+    doc.save(path)
+    doc.close()
+
+
+WRITERS = {"txt": write_txt, "epub": write_epub, "pdf": write_pdf}
+
+
+# ===================== EMBEDDINGS DE SUBSTITUTION =====================
+class HashingEmbeddings:
+    """
+    Vecteurs de mots hachés (signe et case déterminés par CRC32), normalisés : même interface
+    que BatchedEmbeddings, sans modèle à charger. Suffisant pour mesurer Chroma et la recherche.
+    """
+
+    def __init__(self, dim=HASH_DIM):
+        self.dim = dim
+        self.reset_stats()
+
+    def _vector(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            h = zlib.crc32(word.encode("utf-8"))
+            vector[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        debut = time.perf_counter()
+        vectors = [self._vector(t) for t in texts]
+        self.stats["encode_seconds"] += time.perf_counter() - debut
+        self.stats["encoded"] += len(texts)
+        return vectors
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+    def embed_queries(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def reset_stats(self):
+        self.stats = {"encoded": 0, "cache_hits": 0, "encode_seconds": 0.0}
+
+    def throughput(self):
+        return self.stats["encoded"] / self.stats["encode_seconds"] if self.stats["encode_seconds"] else 0.0
+
+
+# ===================== MESURES =====================
+def summarize(durees):
+    """
+    Statistiques (secondes) d'une série de durées.
+    """
+    if not durees:
+        return {"count": 0}
+    return {
+        "count": len(durees),
+        "total_s": float(np.sum(durees)),
+        "mean_s": float(np.mean(durees)),
+        "p50_s": float(np.percentile(durees, 50)),
+        "p95_s": float(np.percentile(durees, 95)),
+        "max_s": float(np.max(durees))
+    }
+
+
+@contextmanager
+def stage(report, name, **info):
+    """
+    Chronomètre une étape et l'ajoute au rapport. Le dictionnaire produit peut être complété
+    (tailles, compteurs) pendant l'étape.
+    """
+    entry = {"stage": name, **info}
+    print(f"→ {name} {' '.join(str(v) for v in info.values())}".rstrip())
+    debut = time.perf_counter()
+    try:
+        yield entry
+    finally:
+        entry["seconds"] = time.perf_counter() - debut
+        report["stages"].append(entry)
+        print(f"  {entry['seconds']:.3f}s")
+
+
+@contextmanager
+def timing_calls(module, names):
+    """
+    Remplace temporairement des fonctions d'un module par des versions chronométrées
+    (appels éventuellement concurrents). Produit {nom: [durées]}.
+    """
+    durees = {name: [] for name in names}
+    lock = threading.Lock()
+    originals = {name: getattr(module, name) for name in names}
+
+    def wrap(name, fn):
+        def timed(*args, **kwargs):
+            debut = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with lock:
+                    durees[name].append(time.perf_counter() - debut)
+        return timed
+
+    for name, fn in originals.items():
+        setattr(module, name, wrap(name, fn))
+    try:
+        yield durees
+    finally:
+        for name, fn in originals.items():
+            setattr(module, name, fn)
+
+
+# ===================== SCÉNARIO =====================
+def run(dossier, formats=FORMATS, cast_size=CAST_SIZE, chapters=CHAPTERS, paragraphs=PARAGRAPHS_PER_CHAPTER,
+        latency=LLM_LATENCY, invalid_rate=0.0, index_format=None, full=False, queries=SEARCH_QUERIES,
+        real_embeddings=False, layout_iterations=None, seed=0, backend=None, constrained=True, servers=1):
+    """
+    Génère un livre synthétique, le fait passer par tout le pipeline (conversion, découpage,
+    indexation Chroma, recherche, extraction via le faux serveur, lecture du graphe et disposition)
+    et retourne le rapport : configuration, environnement et durée de chaque étape.
+
+    `backend` remplace main.EXTRACTION_BACKEND ; `constrained=False` simule un serveur qui refuse
+    les sorties contraintes (repli sur instructor). Avec `servers` > 1, les requêtes sont réparties
+    entre autant de faux serveurs (voir llm_router.py).
+    """
+    import main
+    if backend:
+        main.EXTRACTION_BACKEND = backend
+    from file_converter import convert
+    from graph_binary import read_graph
+    from graph_store import GraphStore
+    from layout import LAYOUT_ITERATIONS, force_layout
+
+    report = {
+        "date": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "formats": list(formats), "cast_size": cast_size, "chapters": chapters, "paragraphs": paragraphs,
+            "llm_latency_s": latency, "invalid_rate": invalid_rate, "full": full, "llm_servers": servers,
+            "extraction_backend": main.EXTRACTION_BACKEND, "server_constrained": constrained,
+            "chunk_size": main.CHUNK_SIZE, "max_concurrent_requests": main.MAX_CONCURRENT_REQUESTS,
+            "pack_chunks": main.PACK_CHUNKS, "context_window": main.CONTEXT_WINDOW,
+            "embeddings": main.EMBEDDING_MODEL if real_embeddings else f"hashing-{HASH_DIM}",
+            "seed": seed
+        },
+        "stages": []
+    }
+    tracer.start()
+
+    # ---------- livres ----------
+    cast = make_cast(cast_size, seed)
+    text = make_chapters(cast, chapters, paragraphs, seed)
+    books = {}
+    for fmt in formats:
+        path = os.path.join(dossier, f"livre.{fmt}")
+        with stage(report, "generate", format=fmt) as entry:
+            WRITERS[fmt](path, TITRE, AUTEUR, text)
+        entry["bytes"] = os.path.getsize(path)
+        books[fmt] = path
+
+    for fmt, path in books.items():
+        with stage(report, "convert", format=fmt) as entry:
+            entry["chars"] = len(convert(path))
+        with stage(report, "split", format=fmt) as entry:
+            entry["chunks"] = sum(1 for _ in main.split_book(path, TITRE, AUTEUR))
+
+    # ---------- indexation et recherche ----------
+    index_format = index_format or ("epub" if "epub" in books else formats[0])
+    livre = books[index_format]
+    embeddings = main.embeddings if real_embeddings else HashingEmbeddings()
+    main.embeddings = embeddings  # utilisé aussi par la résolution des entités à l'export
+    main.CHROMA_DIR = os.path.join(dossier, "chroma")
+    main.RUNS_DIR = os.path.join(dossier, "runs")
+    main.GRAPH_STORE_PATH = os.path.join(dossier, "graph.sqlite")  # jamais la base de l'utilisateur
+
+    with stage(report, "index", format=index_format) as entry:
+        vectordb = main.load_vectordb(livre, TITRE, AUTEUR, embeddings, reindex=True)
+        entry["chunks"] = embeddings.stats["encoded"] + embeddings.stats["cache_hits"]
+        entry["embed_seconds"] = embeddings.stats["encode_seconds"]
+
+    questions = ([QUERY_GENERIQUE] + cast)[:queries]
+    durees = []
+    with stage(report, "similarity_search", format=index_format, k=SEARCH_K) as entry:
+        for q in questions:
+            debut = time.perf_counter()
+            vectordb.similarity_search(q, k=SEARCH_K)
+            durees.append(time.perf_counter() - debut)
+        entry["queries"] = summarize(durees)
+
+    # ---------- extraction via les faux serveurs ----------
+    with ExitStack() as stack:
+        fakes = [stack.enter_context(FakeOllama(cast, latency=latency, invalid_rate=invalid_rate, seed=seed + n,
+                                                constrained=constrained))
+                 for n in range(servers)]
+        main.OLLAMA_BASE_URLS = [fake.base_url for fake in fakes]
+        main._llm_router = main._llm_instructor = main._llm_extractor = None
+        relations_dir = os.path.join(dossier, "relations")
+        chunks = (d["text"] for d in main.split_book(livre, TITRE, AUTEUR)) if full else None
+        with timing_calls(main, ["fetch_characters", "merge_characters", "export_characters",
+                                 "store_run"]) as calls, \
+                stage(report, "extract", format=index_format) as entry:
+            llm = main.get_llm_extractor()
+            out_file = main.extract_characters_progressively(
+                vectordb, llm, TITRE, AUTEUR, relations_dir, chunks=chunks
+            )
+        entry["llm_calls"] = summarize(calls["fetch_characters"])
+        entry["merge"] = summarize(calls["merge_characters"])
+        entry["export"] = summarize(calls["export_characters"])
+        # Écriture dans la base SQLite des graphes : étape à part, retirée de la durée de l'extraction
+        store_seconds = sum(calls["store_run"])
+        entry["seconds"] -= store_seconds
+        with GraphStore(main.GRAPH_STORE_PATH) as store:
+            stored = store.runs()
+        report["stages"].append({"stage": "graph_store", "format": index_format, "seconds": store_seconds,
+                                 "runs": len(stored), "characters": stored[0]["characters"] if stored else 0})
+        print(f"→ graph_store\n  {store_seconds:.3f}s")
+        entry["servers"] = [dict(fake.stats) for fake in fakes]
+        entry["endpoints"] = main.get_llm_router().stats()
+        main.get_llm_router().close()
+        if isinstance(llm, ConstrainedExtractor):
+            entry["constrained"] = dict(llm.stats, retry_rate=llm.retry_rate())
+
+    # ---------- visualisation ----------
+    # graph_viewer crée sa fenêtre Tk dès l'import : on mesure le même chemin de lecture
+    # (read_graph, utilisé par load_json_file) et le même calcul de disposition.
+    with stage(report, "viewer_load") as entry:
+        graph = read_graph(out_file)
+        entry["nodes"] = graph.number_of_nodes()
+        entry["edges"] = graph.number_of_edges()
+    with stage(report, "layout", iterations=layout_iterations or LAYOUT_ITERATIONS):
+        force_layout(list(graph.nodes), list(graph.edges), iterations=layout_iterations or LAYOUT_ITERATIONS)
+
+    report["total_seconds"] = sum(s["seconds"] for s in report["stages"])
+    # Mesures détaillées des modules instrumentés (appels LLM, tokens, fusion...), voir telemetry.py
+    report["telemetry"] = tracer.finish()
+    return report
+
+
+def print_report(report):
+    print(f"\n{'étape':<18}{'format':<8}{'durée':>10}")
+    for s in report["stages"]:
+        print(f"{s['stage']:<18}{s.get('format', ''):<8}{s['seconds']:>9.3f}s")
+    print(f"{'total':<26}{report['total_seconds']:>9.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mesure chaque étape du pipeline sur un livre synthétique, avec un faux serveur Ollama."
+    )
+    parser.add_argument("--formats", default=",".join(FORMATS), help="formats générés, séparés par des virgules")
+    parser.add_argument("--cast", type=int, default=CAST_SIZE, help="nombre de personnages")
+    parser.add_argument("--chapters", type=int, default=CHAPTERS, help="nombre de chapitres")
+    parser.add_argument("--paragraphs", type=int, default=PARAGRAPHS_PER_CHAPTER, help="paragraphes par chapitre")
+    parser.add_argument("--latency", type=float, default=LLM_LATENCY, help="latence du faux LLM (secondes)")
+    parser.add_argument("--invalid-rate", type=float, default=0.0,
+                        help="proportion de réponses invalides (nouvelles tentatives)")
+    parser.add_argument("--backend", choices=["schema", "instructor"],
+                        help="backend d'extraction (EXTRACTION_BACKEND de main.py par défaut)")
+    parser.add_argument("--servers", type=int, default=1, help="nombre de faux serveurs LLM")
+    parser.add_argument("--no-constraints", action="store_true",
+                        help="le faux serveur refuse les sorties contraintes (repli sur instructor)")
+    parser.add_argument("--index-format", help="format du livre indexé et analysé (epub par défaut)")
+    parser.add_argument("--full", action="store_true", help="extraction sur tout le livre (avec préfiltre)")
+    parser.add_argument("--queries", type=int, default=SEARCH_QUERIES, help="nombre de recherches mesurées")
+    parser.add_argument("--real-embeddings", action="store_true",
+                        help="utilise le vrai modèle d'embeddings au lieu de vecteurs hachés")
+    parser.add_argument("--layout-iterations", type=int, help="itérations de la disposition")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="dossier de travail (temporaire et supprimé par défaut)")
+    parser.add_argument("--output", default="bench_pipeline.json", help="fichier JSON du rapport")
+    args = parser.parse_args()
+
+    dossier = args.workdir or tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.makedirs(dossier, exist_ok=True)
+    try:
+        report = run(
+            dossier,
+            formats=[f.strip() for f in args.formats.split(",") if f.strip()],
+            cast_size=args.cast, chapters=args.chapters, paragraphs=args.paragraphs,
+            latency=args.latency, invalid_rate=args.invalid_rate, index_format=args.index_format,
+            full=args.full, queries=args.queries, real_embeddings=args.real_embeddings,
+            layout_iterations=args.layout_iterations, seed=args.seed,
+            backend=args.backend, constrained=not args.no_constraints, servers=args.servers
+        )
+    finally:
+        if not args.workdir:
+            shutil.rmtree(dossier, ignore_errors=True)
+    print_report(report)
+    write_json_atomic(args.output, report)
+    print(f"Rapport écrit dans {args.output}")
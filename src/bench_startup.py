@@ -0,0 +1,72 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+# Chaque scénario est exécuté dans un nouvel interpréteur (import à froid)
+SCENARIOS = {
+    # Coût actuel d'un simple import de main.py (bibliothèques lourdes chargées à la demande)
+    "import_main": "import main",
+    # Équivalent de l'ancien import de main.py, qui chargeait tout au démarrage
+    "import_main_eager": (
+        "import main\n"
+        "from langchain_community.vectorstores import Chroma\n"
+        "from langchain.text_splitter import RecursiveCharacterTextSplitter\n"
+        "main.embeddings.embed_query('warmup')\n"
+        "main.get_llm_instructor()\n"
+        "main.get_qa_llm()\n"
+    ),
+    # Chemin Q&A : ouverture d'une base existante sans la machinerie d'extraction
+    "qa_path": (
+        "import main\n"
+        "from langchain_community.vectorstores import Chroma\n"
+        "main.get_qa_llm()\n"
+    ),
+}
+
+
+def time_command(args, repeat):
+    """
+    Exécute une commande `repeat` fois et retourne les durées (secondes).
+    """
+    durees = []
+    for _ in range(repeat):
+        debut = time.perf_counter()
+        subprocess.run(args, cwd=os.path.dirname(os.path.abspath(__file__)),
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        durees.append(time.perf_counter() - debut)
+    return durees
+
+
+def run(repeat=5):
+    """
+    Mesure le temps de démarrage à froid de chaque scénario, ainsi que `main.py --help`.
+    """
+    results = {}
+    commands = {name: [sys.executable, "-c", code] for name, code in SCENARIOS.items()}
+    commands["main_help"] = [sys.executable, "main.py", "--help"]
+    for name, args in commands.items():
+        durees = time_command(args, repeat)
+        results[name] = {
+            "median_s": statistics.median(durees),
+            "min_s": min(durees),
+            "max_s": max(durees),
+            "repeat": repeat
+        }
+        print(f"{name:<20} médiane {results[name]['median_s']:.3f}s  (min {results[name]['min_s']:.3f}s)")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesure le temps de démarrage de main.py.")
+    parser.add_argument("--repeat", type=int, default=5, help="nombre d'exécutions par scénario")
+    parser.add_argument("--output", help="fichier JSON où écrire les résultats")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,171 @@
+import os
+import re
+import json
+import math
+import unicodedata
+from collections import Counter
+
+from indexing import chunk_id
+
+BM25_FILE = "bm25_index.json"
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """
+    Découpe un texte en termes : minuscules, sans accents ("Cunégonde" -> "cunegonde").
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [t for t in TOKEN_RE.findall(text) if len(t) > 1 or t.isdigit()]
+
+
+class BM25Index:
+    """
+    Index lexical inversé (BM25) des chunks d'un livre, persisté à côté de la base Chroma.
+
+    Les documents sont identifiés par le même hash de contenu que dans Chroma, ce qui permet
+    de fusionner les deux types de résultats et de relire les textes dans la base.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}   # terme -> {id: fréquence}
+        self.doc_len = {}    # id -> nombre de termes
+        self.positions = {}  # id -> position du chunk dans le livre (ordre de lecture)
+        self._total_len = 0
+
+    # ---------- construction ----------
+    def add(self, doc_id, text, position=None):
+        if doc_id in self.doc_len:
+            return
+        terms = Counter(tokenize(text))
+        self.doc_len[doc_id] = sum(terms.values())
+        self._total_len += self.doc_len[doc_id]
+        self.positions[doc_id] = position if position is not None else len(self.positions)
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+    def feed(self, docs):
+        """
+        Indexe un flux de chunks {"text", "metadata"} au passage, sans le consommer.
+        """
+        for doc in docs:
+            self.add(chunk_id(doc["text"]), doc["text"], doc["metadata"].get("position"))
+            yield doc
+
+    def save(self, db_path):
+        data = {"k1": self.k1, "b": self.b, "postings": self.postings,
+                "doc_len": self.doc_len, "positions": self.positions}
+        tmp_path = os.path.join(db_path, BM25_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(db_path, BM25_FILE))
+
+    @classmethod
+    def load(cls, db_path):
+        """
+        Charge l'index d'une base, ou retourne None s'il n'existe pas.
+        """
+        path = os.path.join(db_path, BM25_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(data["k1"], data["b"])
+        index.postings = data["postings"]
+        index.doc_len = data["doc_len"]
+        index.positions = data["positions"]
+        index._total_len = sum(index.doc_len.values())
+        return index
+
+    @classmethod
+    def from_vectordb(cls, vectordb):
+        """
+        Reconstruit l'index à partir des documents d'une base Chroma existante.
+        """
+        index = cls()
+        data = vectordb.get(include=["documents", "metadatas"])
+        for doc_id, text, meta in zip(data["ids"], data["documents"], data["metadatas"]):
+            index.add(doc_id, text, (meta or {}).get("position"))
+        return index
+
+    # ---------- recherche ----------
+    def search(self, query, k=10):
+        """
+        Retourne les k meilleurs (id, score) BM25 pour la requête.
+        """
+        n = len(self.doc_len)
+        if n == 0:
+            return []
+        avgdl = self._total_len / n
+        scores = Counter()
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avgdl)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / norm
+        return scores.most_common(k)
+
+    def mentions(self, name):
+        """
+        Retourne, dans l'ordre du livre, les ids de tous les chunks contenant tous les termes du nom.
+        """
+        terms = tokenize(name)
+        if not terms:
+            return []
+        ids = None
+        for term in sorted(terms, key=lambda t: len(self.postings.get(t, {}))):
+            found = self.postings.get(term, {}).keys()
+            ids = set(found) if ids is None else ids & found
+            if not ids:
+                return []
+        return sorted(ids, key=lambda i: self.positions.get(i, 0))
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fusionne plusieurs classements (listes d'ids) : score = somme de 1 / (k + rang).
+    """
+    scores = Counter()
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] += 1 / (k + rank)
+    return [doc_id for doc_id, _ in scores.most_common()]
+
+
+def fetch_documents(vectordb, ids):
+    """
+    Relit des chunks dans Chroma et retourne un dictionnaire id -> Document LangChain.
+    """
+    from langchain_core.documents import Document
+
+    if not ids:
+        return {}
+    data = vectordb.get(ids=list(ids), include=["documents", "metadatas"])
+    return {
+        doc_id: Document(page_content=text, metadata=meta or {})
+        for doc_id, text, meta in zip(data["ids"], data["documents"], data["metadatas"])
+    }
+
+
+def hybrid_search(vectordb, bm25, query, k=5, vector=None, depth=20):
+    """
+    Recherche hybride : fusionne (RRF) les `depth` meilleurs résultats vectoriels et BM25,
+    et retourne les k premiers Documents.
+    """
+    if vector is None:
+        vector_docs = vectordb.similarity_search(query, k=depth)
+    else:
+        vector_docs = vectordb.similarity_search_by_vector(vector, k=depth)
+    vector_ids = [d.metadata.get("chunk_hash") or chunk_id(d.page_content) for d in vector_docs]
+    lexical_ids = [doc_id for doc_id, _ in bm25.search(query, k=depth)]
+
+    fused = reciprocal_rank_fusion([vector_ids, lexical_ids])[:k]
+    known = dict(zip(vector_ids, vector_docs))
+    known.update(fetch_documents(vectordb, [i for i in fused if i not in known]))
+    return [known[i] for i in fused if i in known]
@@ -0,0 +1,158 @@
+import json
+import threading
+
+from pydantic import ValidationError
+
+# ===================== CONFIG =====================
+# Bornes du schéma : la grammaire générée côté serveur empêche le modèle de les dépasser
+MAX_NAME_LENGTH = 100
+MAX_TYPE_LENGTH = 40
+MAX_EVIDENCE_LENGTH = 200
+MAX_ALIASES = 5
+MAX_RELATIONS = 8
+MAX_INVALID = 3  # réponses contraintes invalides d'affilée avant de passer définitivement au repli
+ROOT_KEY = "personnages"
+
+
+def output_schema(character_model, max_characters):
+    """
+    Schéma JSON de la réponse d'extraction, dérivé du modèle pydantic des personnages.
+
+    Les champs remplis après coup (id du personnage, target_id des relations) sont retirés,
+    les définitions sont mises à plat (certains convertisseurs schéma → grammaire ignorent $ref)
+    et les longueurs sont bornées, ce qui raccourcit les réponses et garantit qu'elles tiennent
+    dans `max_tokens`. La liste est enveloppée dans un objet {"personnages": [...]} d'au plus
+    `max_characters` éléments.
+    """
+    schema = character_model.model_json_schema()
+    relation = schema.pop("$defs", {})["Relation"]
+    relation["properties"].pop("target_id", None)
+    relation["properties"]["target_name"]["maxLength"] = MAX_NAME_LENGTH
+    relation["properties"]["type"]["maxLength"] = MAX_TYPE_LENGTH
+    for variant in relation["properties"]["evidence"].get("anyOf", []):
+        if variant.get("type") == "string":
+            variant["maxLength"] = MAX_EVIDENCE_LENGTH
+    relation["required"] = ["target_name", "type"]
+
+    schema["properties"].pop("id", None)
+    schema["properties"]["name"]["maxLength"] = MAX_NAME_LENGTH
+    schema["properties"]["aliases"]["items"]["maxLength"] = MAX_NAME_LENGTH
+    schema["properties"]["aliases"]["maxItems"] = MAX_ALIASES
+    schema["properties"]["relations"] = {"type": "array", "items": relation, "maxItems": MAX_RELATIONS}
+    schema["required"] = ["name", "aliases", "relations"]
+    return {
+        "type": "object",
+        "properties": {ROOT_KEY: {"type": "array", "items": schema, "maxItems": max_characters}},
+        "required": [ROOT_KEY]
+    }
+
+
+class ConstrainedExtractor:
+    """
+    Extraction par sortie contrainte : le schéma JSON des personnages est envoyé au serveur
+    (`response_format` de type json_schema, traduit par Ollama en grammaire pour le modèle), qui
+    ne peut alors générer qu'une réponse conforme. Aucune génération n'est gaspillée en nouvelles
+    tentatives de validation, et `max_tokens` borne la longueur de la réponse.
+
+    Si le serveur refuse le schéma (erreur 400/404/422), ou si ses réponses restent invalides
+    MAX_INVALID fois d'affilée (modèle ou version d'Ollama qui ignore la contrainte), toutes les
+    extractions suivantes passent par `fallback` (instructor en mode JSON). Une réponse invalide
+    isolée est refaite par `fallback`.
+
+    Args:
+        client: Client OpenAI (synchrone).
+        model (str): Modèle à interroger.
+        character_model: Modèle pydantic d'un personnage (Character).
+        fallback (callable): fallback(prompt, max_tokens) -> liste de personnages.
+        temperature (float): Température de génération.
+    """
+
+    def __init__(self, client, model, character_model, fallback, temperature=0):
+        self.client = client
+        self.model = model
+        self.character_model = character_model
+        self.fallback = fallback
+        self.temperature = temperature
+        self.supported = True
+        self._invalid_streak = 0
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "constrained": 0, "invalid": 0, "truncated": 0, "fallback": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _disable(self, reason):
+        with self._lock:
+            if self.supported:
+                self.supported = False
+                print(f"Sortie contrainte indisponible ({reason}) → repli sur instructor (mode JSON)")
+
+    def extract(self, prompt, max_characters, max_tokens, attrs=None):
+        """
+        Extrait les personnages d'un prompt (au plus `max_characters`, réponse d'au plus
+        `max_tokens` tokens). `attrs` (mesure telemetry de l'appel) reçoit les tokens consommés.
+        """
+        self._count("calls")
+        if self.supported:
+            characters = self._constrained(prompt, max_characters, max_tokens, attrs)
+            if characters is not None:
+                return characters
+        self._count("fallback")
+        if attrs is not None:
+            attrs["backend"] = "instructor"
+        return self.fallback(prompt, max_tokens)
+
+    def _constrained(self, prompt, max_characters, max_tokens, attrs):
+        """
+        Retourne les personnages de la réponse contrainte, ou None si elle n'est pas exploitable.
+        """
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                response_format={"type": "json_schema", "json_schema": {
+                    "name": ROOT_KEY, "schema": output_schema(self.character_model, max_characters), "strict": True
+                }},
+                max_tokens=max_tokens,
+                temperature=self.temperature
+            )
+        except Exception as e:
+            if getattr(e, "status_code", None) in (400, 404, 422):
+                self._disable(e)
+                return None
+            raise
+
+        if attrs is not None:
+            attrs["backend"] = "schema"
+            attrs["completions"] = attrs.get("completions", 0) + 1
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                attrs["prompt_tokens"] = attrs.get("prompt_tokens", 0) + (usage.prompt_tokens or 0)
+                attrs["completion_tokens"] = attrs.get("completion_tokens", 0) + (usage.completion_tokens or 0)
+
+        choice = response.choices[0]
+        try:
+            data = json.loads(choice.message.content or "")
+            characters = [self.character_model.model_validate(c) for c in data[ROOT_KEY]]
+        except (ValueError, KeyError, TypeError, ValidationError):
+            self._count("truncated" if choice.finish_reason == "length" else "invalid")
+            with self._lock:
+                self._invalid_streak += 1
+                streak = self._invalid_streak
+            if streak >= MAX_INVALID:
+                self._disable(f"{streak} réponses invalides d'affilée")
+            return None
+
+        with self._lock:
+            self._invalid_streak = 0
+            self.stats["constrained"] += 1
+        return characters[:max_characters]
+
+    def retry_rate(self):
+        """
+        Part des appels qui ont nécessité une seconde génération (réponse contrainte inexploitable).
+        """
+        with self._lock:
+            retried = self.stats["invalid"] + self.stats["truncated"]
+            return retried / self.stats["calls"] if self.stats["calls"] else 0.0
@@ -0,0 +1,210 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+import numpy as np
+
+from telemetry import span
+
+
+def embedding_key(model_name, text):
+    """
+    Clé de cache d'un vecteur : hash SHA-256 de (modèle, texte).
+    """
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\0")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Cache disque de vecteurs, partagé entre les livres, les exécutions et les processus.
+
+    Les vecteurs sont stockés bout à bout dans un fichier float32 lu par memory-mapping ;
+    un index SQLite associe chaque clé à sa ligne dans ce fichier. Les ajouts se font dans
+    une transaction SQLite exclusive, qui sert aussi de verrou entre processus.
+    """
+
+    def __init__(self, dossier):
+        os.makedirs(dossier, exist_ok=True)
+        self._path = os.path.join(dossier, "vectors.f32")
+        self._lock = threading.Lock()
+        self._view = None
+        self._db = sqlite3.connect(os.path.join(dossier, "index.sqlite"), timeout=60,
+                                   check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        open(self._path, "ab").close()
+
+    def _dim(self):
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        return int(row[0]) if row else None
+
+    def _rows(self, needed, dim):
+        """
+        Retourne une vue memory-mappée contenant au moins `needed` lignes, en la rouvrant
+        si le fichier a grandi depuis la dernière lecture.
+        """
+        if self._view is None or self._view.shape[0] < needed:
+            rows = os.path.getsize(self._path) // (4 * dim)
+            self._view = np.memmap(self._path, dtype=np.float32, mode="r", shape=(rows, dim))
+        return self._view
+
+    def get_many(self, keys):
+        """
+        Retourne un dictionnaire clé -> vecteur (np.ndarray) pour les clés présentes dans le cache.
+        """
+        found = {}
+        with self._lock:
+            dim = self._dim()
+            if dim is None:
+                return found
+            rows = {}
+            unique = list(dict.fromkeys(keys))
+            for i in range(0, len(unique), 500):
+                part = unique[i:i + 500]
+                placeholders = ",".join("?" * len(part))
+                rows.update(self._db.execute(
+                    f"SELECT key, row FROM vectors WHERE key IN ({placeholders})", part
+                ).fetchall())
+            if rows:
+                view = self._rows(max(rows.values()) + 1, dim)
+                found = {key: np.array(view[row]) for key, row in rows.items()}
+        return found
+
+    def put_many(self, keys, vectors):
+        """
+        Ajoute des vecteurs au cache (les clés déjà présentes sont ignorées).
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                dim = self._dim()
+                if dim is None:
+                    dim = vectors.shape[1]
+                    self._db.execute("INSERT INTO meta (name, value) VALUES ('dim', ?)", (str(dim),))
+                elif dim != vectors.shape[1]:
+                    raise ValueError(f"Dimension {vectors.shape[1]} incompatible avec le cache ({dim})")
+
+                present = set(self._present(keys))
+                nouveaux = []
+                for i, key in enumerate(keys):
+                    if key not in present:
+                        present.add(key)  # une clé répétée dans le lot n'est écrite qu'une fois
+                        nouveaux.append(i)
+                if nouveaux:
+                    with open(self._path, "r+b") as f:
+                        # Une écriture interrompue peut laisser une ligne incomplète : on la retire
+                        start = os.path.getsize(self._path) // (4 * dim)
+                        f.truncate(start * 4 * dim)
+                        f.seek(0, os.SEEK_END)
+                        f.write(vectors[nouveaux].tobytes())
+                    self._db.executemany(
+                        "INSERT INTO vectors (key, row) VALUES (?, ?)",
+                        [(keys[i], start + n) for n, i in enumerate(nouveaux)]
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _present(self, keys):
+        for i in range(0, len(keys), 500):
+            part = keys[i:i + 500]
+            placeholders = ",".join("?" * len(part))
+            for (key,) in self._db.execute(f"SELECT key FROM vectors WHERE key IN ({placeholders})", part):
+                yield key
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class BatchedEmbeddings:
+    """
+    Moteur d'embeddings sentence-transformers, compatible avec l'interface LangChain
+    (`embed_documents`, `embed_query`).
+
+    Le modèle n'est chargé qu'au premier calcul. Les documents sont vectorisés par lots de
+    `batch_size` sur `threads` cœurs, et les vecteurs déjà calculés (même texte, même modèle)
+    sont relus dans le cache disque au lieu d'être recalculés.
+    """
+
+    def __init__(self, model_name, cache_dir=None, batch_size=64, threads=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.threads = threads or os.cpu_count()
+        self.cache_dir = cache_dir
+        self._cache = None
+        self._model = None
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                import torch
+                from sentence_transformers import SentenceTransformer
+                torch.set_num_threads(self.threads)
+                self._model = SentenceTransformer(f"sentence-transformers/{self.model_name}")
+        return self._model
+
+    @property
+    def cache(self):
+        if self._cache is None and self.cache_dir:
+            with self._lock:
+                if self._cache is None:
+                    self._cache = EmbeddingCache(self.cache_dir)
+        return self._cache
+
+    def _encode(self, texts):
+        # Même prétraitement que SentenceTransformerEmbeddings (LangChain), pour des vecteurs identiques
+        texts = [t.replace("\n", " ") for t in texts]
+        return self._load().encode(texts, batch_size=self.batch_size, convert_to_numpy=True,
+                                   show_progress_bar=False)
+
+    def embed_documents(self, texts):
+        with span("embed", texts=len(texts)) as attrs:
+            keys = [embedding_key(self.model_name, t) for t in texts]
+            vectors = self.cache.get_many(keys) if self.cache else {}
+            missing = [i for i, key in enumerate(keys) if key not in vectors]
+            attrs["encoded"] = len(missing)
+
+            if missing:
+                debut = time.perf_counter()
+                encoded = self._encode([texts[i] for i in missing])
+                self.stats["encode_seconds"] += time.perf_counter() - debut
+                if self.cache:
+                    self.cache.put_many([keys[i] for i in missing], encoded)
+                for i, vector in zip(missing, encoded):
+                    vectors[keys[i]] = vector
+
+        self.stats["encoded"] += len(missing)
+        self.stats["cache_hits"] += len(texts) - len(missing)
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+    def embed_queries(self, texts):
+        """
+        Vectorise plusieurs questions en un seul lot (sans passer par le cache disque).
+        """
+        return [vector.tolist() for vector in self._encode(texts)]
+
+    def reset_stats(self):
+        self.stats = {"encoded": 0, "cache_hits": 0, "encode_seconds": 0.0}
+
+    def throughput(self):
+        """
+        Débit de vectorisation en chunks par seconde (hors cache).
+        """
+        if self.stats["encode_seconds"] == 0:
+            return 0.0
+        return self.stats["encoded"] / self.stats["encode_seconds"]
@@ -0,0 +1,330 @@
+import re
+import hashlib
+import unicodedata
+from difflib import SequenceMatcher
+
+import numpy as np
+
+# ===================== CONFIG =====================
+MAX_BLOCK_SIZE = 64        # blocs plus grands ignorés (clé trop fréquente) : coût quasi linéaire
+FUZZY_THRESHOLD = 0.88     # similarité de caractères suffisante à elle seule
+EMBEDDING_THRESHOLD = 0.90  # similarité cosinus requise, avec une similarité de caractères minimale
+EMBEDDING_MIN_FUZZY = 0.6
+
+ARTICLES = {"le", "la", "les", "l", "de", "du", "des", "d", "un", "une", "the", "of"}
+TITRES = {
+    "m", "mr", "mme", "mlle", "monsieur", "madame", "mademoiselle", "monseigneur", "messire",
+    "sieur", "dame", "sir", "mrs", "miss", "dr", "docteur", "maitre", "me", "saint", "sainte"
+}
+# Titres qui indiquent le genre : "M. Thénardier" et "Mme Thénardier" sont deux personnages
+TITRES_MASCULINS = {"m", "mr", "monsieur", "monseigneur", "messire", "sieur", "sir"}
+TITRES_FEMININS = {"mme", "mlle", "madame", "mademoiselle", "dame", "mrs", "miss"}
+MASCULIN, FEMININ = "♂", "♀"  # marqueurs de genre (jamais produits par fold)
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def fold(text):
+    """
+    Minuscules, sans accents, ponctuation remplacée par des espaces.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    return " ".join(TOKEN_RE.findall("".join(c for c in text if not unicodedata.combining(c))))
+
+
+def core_tokens(name):
+    """
+    Tokens significatifs d'un nom : sans articles ni titres de civilité, sauf si le nom n'est
+    fait que de ceux-ci. Un titre masculin ou féminin est remplacé par un marqueur de genre en tête,
+    pour que les deux membres d'un couple restent distincts :
+
+    >>> core_tokens("le baron"), core_tokens("M. Thénardier"), core_tokens("Mme Thénardier")
+    (('baron',), ('♂', 'thenardier'), ('♀', 'thenardier'))
+    """
+    tokens = fold(name).split()
+    core = [t for t in tokens if t not in ARTICLES and t not in TITRES]
+    if not core:
+        return tuple(t for t in tokens if t not in ARTICLES) or tuple(tokens)
+    if any(t in TITRES_FEMININS for t in tokens):
+        core.insert(0, FEMININ)
+    elif any(t in TITRES_MASCULINS for t in tokens):
+        core.insert(0, MASCULIN)
+    return tuple(core)
+
+
+def gender(core):
+    """
+    Marqueur de genre d'un nom normalisé (voir core_tokens), ou None.
+    """
+    return core[0] if core and core[0] in (MASCULIN, FEMININ) else None
+
+
+def without_gender(core):
+    return core[1:] if gender(core) else core
+
+
+def similar(a, b, threshold):
+    """
+    Similarité de caractères (difflib) au moins égale à `threshold`, en écartant d'abord
+    les paires dont les bornes supérieures rapides sont déjà trop basses.
+    """
+    if 2 * min(len(a), len(b)) < threshold * (len(a) + len(b)):
+        return False
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    return (matcher.real_quick_ratio() >= threshold and matcher.quick_ratio() >= threshold
+            and matcher.ratio() >= threshold)
+
+
+def _token_matches(a, b):
+    """
+    Deux tokens désignent le même mot : identiques, initiale ("j" pour "jean"),
+    ou variante orthographique d'un mot d'au moins 5 lettres ("panglos" / "pangloss"),
+    à l'exception des formes masculin / féminin ("martin" / "martine").
+    """
+    if a == b or (len(a) == 1 and b.startswith(a)) or (len(b) == 1 and a.startswith(b)):
+        return True
+    if a + "e" == b or b + "e" == a:
+        return False
+    return min(len(a), len(b)) >= 5 and a[:3] == b[:3] and similar(a, b, FUZZY_THRESHOLD)
+
+
+def covers(small, large):
+    """
+    Vrai si les tokens de `small` se retrouvent, dans l'ordre, parmi ceux de `large`
+    ("baron" dans "baron thunder ten tronckh", "j valjean" dans "jean valjean"). Un titre d'un
+    seul côté est ignoré ; deux titres de genres opposés ne se couvrent jamais.
+    """
+    if gender(small) and gender(large) and gender(small) != gender(large):
+        return False
+    small, large = without_gender(small), without_gender(large)
+    i = 0
+    for token in large:
+        if i < len(small) and _token_matches(small[i], token):
+            i += 1
+    return i == len(small) and any(len(t) >= 3 for t in small)
+
+
+def compatible(a, b):
+    return covers(a, b) or covers(b, a)
+
+
+def consistent(names):
+    """
+    Vrai si des noms peuvent désigner un même personnage : pas de titres des deux genres, et
+    chaque paire est compatible ou couverte par un même nom plus complet ("baron" et
+    "thunder ten tronckh" par "baron thunder ten tronckh").
+
+    >>> consistent({("♂", "thenardier"), ("thenardier",), ("♀", "thenardier")})
+    False
+    """
+    names = list(names)
+    if len({gender(n) for n in names} - {None}) > 1:
+        return False
+    for n, x in enumerate(names):
+        for y in names[n + 1:]:
+            if not compatible(x, y) and not any(covers(x, z) and covers(y, z) for z in names):
+                return False
+    return True
+
+
+def blocking_keys(core):
+    """
+    Clés de blocage d'un nom : chaque token (hors initiales), son préfixe de 4 lettres
+    (variantes orthographiques) et la clé initiale + dernier token ("j|valjean").
+    """
+    keys = set()
+    core = without_gender(core)
+    for token in core:
+        if len(token) >= 3:
+            keys.add("t:" + token)
+        if len(token) >= 5:
+            keys.add("p:" + token[:4])
+    if len(core) >= 2:
+        keys.add(f"i:{core[0][0]}|{core[-1]}")
+    return keys
+
+
+class UnionFind:
+    """
+    Union-find (union par taille, compression de chemin) qui refuse de réunir deux groupes
+    dont les noms de personnages sont incohérents ("baron thunder" / "baronne thunder").
+    """
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.size = [1] * n
+        self.names = [set() for _ in range(n)]
+
+    def find(self, x):
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return True
+        if not consistent(self.names[ra] | self.names[rb]):
+            return False
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+        self.names[ra] |= self.names[rb]
+        self.names[rb] = set()
+        return True
+
+
+class Resolution:
+    """
+    Résultat de resolve_entities.
+
+    Attributs :
+        canonical (dict): id de personnage -> id canonique de son groupe.
+        members (dict): id canonique -> ids des personnages du groupe (ordre d'origine).
+        representative (dict): id canonique -> id du personnage dont le nom est retenu.
+    """
+
+    def __init__(self, canonical, members, representative, mention_ids):
+        self.canonical = canonical
+        self.members = members
+        self.representative = representative
+        self._mention_ids = mention_ids
+
+    def lookup(self, name):
+        """
+        Retourne l'id canonique du personnage désigné par un nom (variante comprise), ou None.
+        """
+        return self._mention_ids.get(core_tokens(name)) if name and name.strip() else None
+
+
+def _canonical_id(core, used):
+    base = "char_" + hashlib.sha256(" ".join(core).encode("utf-8")).hexdigest()[:8]
+    cid, n = base, 1
+    while cid in used:
+        n += 1
+        cid = f"{base}_{n}"
+    used.add(cid)
+    return cid
+
+
+def resolve_entities(characters, extra_names=(), embed=None):
+    """
+    Regroupe les personnages qui désignent la même entité sous des noms différents.
+
+    Args:
+        characters (dict): id -> personnage (attributs name, aliases, relations).
+        extra_names (iterable): Autres mentions à rattacher (noms cibles des relations).
+        embed (callable, optional): Vectorise une liste de textes (ex. embed_documents) ; si fourni,
+            la similarité sémantique complète la similarité de caractères.
+
+    Chaque mention distincte (nom normalisé) n'est comparée qu'aux mentions partageant une clé
+    de blocage ; les correspondances (nom identique après normalisation, inclusion non ambiguë,
+    similarité de caractères ou sémantique) sont ensuite regroupées par union-find. Les ids
+    canoniques dérivent du nom retenu : le même état produit toujours les mêmes ids.
+
+    Returns:
+        Resolution
+    """
+    # ---------- mentions ----------
+    index = {}
+
+    def mention(name):
+        core = core_tokens(name)
+        if core and core not in index:
+            index[core] = len(index)
+        return index.get(core)
+
+    char_mentions = {}
+    for cid, char in characters.items():
+        char_mentions[cid] = mention(char.name)
+        for alias in char.aliases:
+            mention(alias)
+    for name in extra_names:
+        mention(name)
+    cores = list(index)
+    uf = UnionFind(len(cores))
+    for m in char_mentions.values():
+        if m is not None:
+            uf.names[m].add(cores[m])
+
+    # ---------- blocage et paires candidates ----------
+    blocks = {}
+    for i, core in enumerate(cores):
+        for key in blocking_keys(core):
+            blocks.setdefault(key, []).append(i)
+    pairs = set()
+    for members in blocks.values():
+        if 1 < len(members) <= MAX_BLOCK_SIZE:
+            pairs.update((a, b) for n, a in enumerate(members) for b in members[n + 1:])
+
+    vectors = None
+    if embed is not None and pairs:
+        used = sorted({i for pair in pairs for i in pair})
+        embedded = np.asarray(embed([" ".join(without_gender(cores[i])) for i in used]), dtype=np.float32)
+        embedded /= np.maximum(np.linalg.norm(embedded, axis=1, keepdims=True), 1e-12)
+        vectors = dict(zip(used, embedded))
+
+    strong, contained = [], {}
+    for a, b in sorted(pairs):
+        ca, cb = cores[a], cores[b]
+        if gender(ca) != gender(cb):
+            # Genres opposés : jamais réunis. Titre d'un seul côté ("Thénardier" / "Mme Thénardier") :
+            # rattachement par inclusion uniquement, ambigu si les deux genres existent
+            if gender(ca) and gender(cb):
+                continue
+            titled, plain = (a, b) if gender(ca) else (b, a)
+            if covers(cores[plain], cores[titled]):
+                contained.setdefault(plain, []).append(titled)
+            elif covers(cores[titled], cores[plain]):
+                contained.setdefault(titled, []).append(plain)
+            continue
+        if len(ca) == len(cb) and all(_token_matches(x, y) for x, y in zip(ca, cb)):
+            strong.append((a, b))  # mêmes tokens, aux initiales et variantes près
+            continue
+        sa, sb = " ".join(ca), " ".join(cb)
+        if similar(sa, sb, FUZZY_THRESHOLD) or (
+            vectors is not None and float(vectors[a] @ vectors[b]) >= EMBEDDING_THRESHOLD
+            and similar(sa, sb, EMBEDDING_MIN_FUZZY)
+        ):
+            strong.append((a, b))
+        elif covers(ca, cb):
+            contained.setdefault(a, []).append(b)
+        elif covers(cb, ca):
+            contained.setdefault(b, []).append(a)
+
+    # ---------- regroupement ----------
+    for a, b in strong:
+        uf.union(a, b)
+    # Un nom court n'est rattaché par inclusion que s'il ne désigne qu'un seul groupe
+    # ("Jean" inclus dans "Jean Valjean" et "Jean Dupont" reste seul)
+    for small, larges in sorted(contained.items()):
+        roots = {uf.find(x) for x in larges}
+        if consistent(set().union(*(uf.names[r] for r in roots))):
+            for large in larges:
+                uf.union(small, large)
+
+    # ---------- ids canoniques ----------
+    groups = {}
+    for cid, m in char_mentions.items():
+        if m is not None:
+            groups.setdefault(uf.find(m), []).append(cid)
+
+    def weight(cid):
+        core = cores[char_mentions[cid]]
+        return (-len(core), -len(" ".join(core)), -len(characters[cid].relations), characters[cid].name)
+
+    canonical, members, representative, root_ids, used = {}, {}, {}, {}, set()
+    for root, cids in groups.items():
+        rep = min(cids, key=weight)
+        gid = _canonical_id(cores[char_mentions[rep]], used)
+        root_ids[root] = gid
+        members[gid] = cids
+        representative[gid] = rep
+        for cid in cids:
+            canonical[cid] = gid
+
+    mention_ids = {core: root_ids[uf.find(i)] for i, core in enumerate(cores) if uf.find(i) in root_ids}
+    return Resolution(canonical, members, representative, mention_ids)
@@ -0,0 +1,254 @@
+import re
+import json
+import time
+import random
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ===================== CONFIG =====================
+HOST = "127.0.0.1"
+MAX_CHARACTERS = 8  # si le prompt ne précise pas de limite
+RELATION_TYPES = ["ami", "frère", "rival", "maître", "amoureux", "voisin"]
+CONTEXT_RE = re.compile(r'"""(.*)"""', re.DOTALL)
+LIMIT_RE = re.compile(r"plus de (\d+) personnages")
+
+
+def qa_answer(prompt, cast):
+    """
+    Réponse plausible à une question du Q&A : les membres de `cast` cités dans le prompt.
+    """
+    names = [name for name in cast if name in prompt]
+    return f"D'après le contexte : {', '.join(names)}." if names else "Je ne sais pas."
+
+
+def canned_characters(text, cast, limit=MAX_CHARACTERS):
+    """
+    Réponse d'extraction plausible pour un texte : les membres de `cast` cités (au plus `limit`,
+    dans l'ordre d'apparition), chacun lié au suivant par une relation dont le type dépend de la paire.
+    """
+    positions = sorted((text.find(name), name) for name in cast if name in text)
+    names = [name for _, name in positions][:limit]
+    characters = []
+    for i, name in enumerate(names):
+        relations = []
+        if i + 1 < len(names):
+            target = names[i + 1]
+            relations.append({
+                "target_name": target,
+                "type": RELATION_TYPES[(len(name) + len(target)) % len(RELATION_TYPES)],
+                "evidence": None
+            })
+        characters.append({"name": name, "aliases": [], "relations": relations})
+    return characters
+
+
+def schema_of(request):
+    """
+    Schéma JSON imposé à la réponse par une requête (response_format de type json_schema), ou None.
+    """
+    response_format = request.get("response_format") or {}
+    if response_format.get("type") != "json_schema":
+        return None
+    return (response_format.get("json_schema") or {}).get("schema")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, comme Ollama
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, chunks):
+        # Server-sent events, comme l'API OpenAI ; la connexion est fermée à la fin du flux
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for chunk in chunks:
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            chunks.close()  # client parti avant la fin du flux
+
+    def do_GET(self):
+        if self.server.fake.failing:
+            self._send(503, {"error": "unavailable"})
+        elif self.path in ("/v1/models", "/api/tags"):
+            self._send(200, {"object": "list", "data": [{"id": self.server.fake.model, "object": "model"}],
+                             "models": [{"name": self.server.fake.model}]})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send(400, {"error": "invalid json"})
+            return
+        if self.path != "/v1/chat/completions":
+            self._send(404, {"error": "not found"})
+            return
+        if self.server.fake.failing:
+            self._send(503, {"error": {"message": "serveur indisponible", "type": "server_error"}})
+            return
+        if schema_of(request) is not None and not self.server.fake.constrained:
+            self._send(400, {"error": {"message": "response_format json_schema non pris en charge",
+                                       "type": "invalid_request_error"}})
+            return
+        if request.get("stream"):
+            self._send_stream(self.server.fake.stream(request))
+        else:
+            self._send(200, self.server.fake.complete(request))
+
+
+class FakeOllama:
+    """
+    Remplaçant local de l'API OpenAI d'Ollama (/v1/chat/completions), pour les essais et
+    les mesures sans GPU ni modèle.
+
+    Chaque requête attend `latency` secondes (plus `token_delay` par mot de la réponse) puis
+    renvoie, au format attendu par instructor en mode JSON, les personnages de `cast` cités dans
+    le texte du prompt. Une proportion `invalid_rate` de réponses est volontairement invalide,
+    pour exercer les nouvelles tentatives. Le serveur tourne dans un thread : `start()` retourne
+    l'URL à ajouter à OLLAMA_BASE_URLS.
+
+    Une requête qui impose un schéma JSON (`response_format`) reçoit, comme avec la génération
+    contrainte d'Ollama, une réponse toujours conforme : liste enveloppée dans la clé racine du
+    schéma, au plus `maxItems` personnages. Avec `constrained=False`, ces requêtes sont refusées
+    (erreur 400), comme par un serveur qui ne prend pas en charge les sorties contraintes.
+
+    Les requêtes sans texte à analyser (questions du Q&A) reçoivent une réponse en texte libre,
+    en flux si elles le demandent. Tant que `failing` vaut True, le serveur répond 503 à tout,
+    y compris aux vérifications d'état, comme une machine en panne.
+    """
+
+    def __init__(self, cast, latency=0.05, token_delay=0.0, invalid_rate=0.0, model="fake", seed=0,
+                 host=HOST, port=0, constrained=True):
+        self.cast = list(cast)
+        self.latency = latency
+        self.token_delay = token_delay
+        self.invalid_rate = invalid_rate
+        self.model = model
+        self.constrained = constrained
+        self.failing = False
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = None
+        self.stats = {"requests": 0, "invalid": 0, "in_flight": 0, "max_in_flight": 0}
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextmanager
+    def _request(self, request):
+        """
+        Compte une requête (en cours, invalide) pendant sa durée et fournit son prompt et sa réponse.
+        """
+        prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+        schema = schema_of(request)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+            invalid = schema is None and self._rng.random() < self.invalid_rate
+            if invalid:
+                self.stats["invalid"] += 1
+        try:
+            match = CONTEXT_RE.search(prompt)
+            if match is None and schema is None:
+                # Pas de texte à analyser : question du Q&A
+                yield prompt, qa_answer(prompt, self.cast)
+                return
+            limit = LIMIT_RE.search(prompt)
+            limit = int(limit.group(1)) if limit else MAX_CHARACTERS
+            if schema is not None:
+                # Clé racine et nombre maximal d'éléments imposés par le schéma
+                root, items = next(iter(schema["properties"].items()))
+                limit = min(limit, items.get("maxItems", limit))
+            else:
+                # Liste enveloppée dans "tasks" : forme attendue par instructor pour List[Character]
+                root = "tasks"
+            characters = canned_characters(match.group(1) if match else prompt, self.cast, limit)
+            yield prompt, '{"tasks": [' if invalid else json.dumps({root: characters}, ensure_ascii=False)
+        finally:
+            with self._lock:
+                self.stats["in_flight"] -= 1
+
+    def complete(self, request):
+        """
+        Construit la réponse (format OpenAI chat.completion) à une requête décodée.
+        """
+        with self._request(request) as (prompt, content):
+            time.sleep(self.latency + self.token_delay * len(content.split()))
+
+        prompt_tokens, completion_tokens = len(prompt.split()), len(content.split())
+        return {
+            "id": f"chatcmpl-{self.stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", self.model),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    def stream(self, request):
+        """
+        Réponse en flux (requête avec "stream": true) : morceaux chat.completion.chunk, un par mot,
+        le premier après `latency` secondes puis un toutes les `token_delay` secondes.
+        """
+        with self._request(request) as (prompt, content):
+            chunk = {
+                "id": f"chatcmpl-{self.stats['requests']}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", self.model)
+            }
+            time.sleep(self.latency)
+            for i, word in enumerate(content.split(" ")):
+                if i:
+                    time.sleep(self.token_delay)
+                yield dict(chunk, choices=[{"index": 0, "delta": {"content": word if i == 0 else " " + word},
+                                            "finish_reason": None}])
+            yield dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
@@ -1,43 +1,178 @@
 import os
+import re
+import time
 import fitz  # PyMuPDF
 from ebooklib import epub
 from bs4 import BeautifulSoup
 import ebooklib
 
-def pdf_to_txt(pdf_path):
+from telemetry import record, span
+
+# Titres de chapitres reconnus dans les fichiers texte
+CHAPITRE_RE = re.compile(r"^\s*(chapitre|chapter|livre|partie)\b", re.IGNORECASE)
+TAILLE_SEGMENT_TXT = 64 * 1024  # caractères par segment pour les fichiers texte
+
+
+def iter_pdf_pages(pdf_path):
     """
-    Convertit un texte au format pdf en chaine de caractères.
+    Parcourt un pdf page par page.
+
+    Génère un dictionnaire par page : {"text": ..., "metadata": {"chapitre", "page_debut", "page_fin"}}.
+    Le chapitre est déduit des entrées de premier niveau de la table des matières, si elle existe.
     """
-    texte = ""
     with fitz.open(pdf_path) as doc:
-        for page in doc:
-            texte += page.get_text("text")
-    return texte
+        debuts_chapitres = sorted(page for niveau, _, page in doc.get_toc() if niveau == 1)
+        chapitre = 0
+        for numero, page in enumerate(doc, 1):
+            while chapitre < len(debuts_chapitres) and debuts_chapitres[chapitre] <= numero:
+                chapitre += 1
+            yield {
+                "text": page.get_text("text"),
+                "metadata": {"chapitre": chapitre, "page_debut": numero, "page_fin": numero}
+            }
 
-def epub_to_txt(epub_path):
+
+def iter_epub_items(epub_path):
     """
-    Convertit un texte au format epub en chaine de caractères.
+    Parcourt un epub document par document (un document correspond en général à un chapitre).
+
+    Génère un dictionnaire par document : {"text": ..., "metadata": {"chapitre", "section"}}.
     """
     book = epub.read_epub(epub_path)
-    texte = ""
+    chapitre = 0
     for item in book.get_items():
         if item.get_type() == ebooklib.ITEM_DOCUMENT:
             soup = BeautifulSoup(item.get_body_content(), "html.parser")
-            texte += soup.get_text()
-    return texte
+            chapitre += 1
+            yield {
+                "text": soup.get_text(),
+                "metadata": {"chapitre": chapitre, "section": item.get_name()}
+            }
 
-def convert(chemin_entree):
+
+def iter_txt_segments(txt_path):
     """
-    Convertit un texte au format pdf, txt ou epub en chaine de caractères.
+    Parcourt un fichier texte par segments de taille bornée, sans le charger entièrement.
+
+    Un nouveau segment commence à chaque titre de chapitre reconnu ou lorsque le segment
+    courant dépasse TAILLE_SEGMENT_TXT caractères.
+    """
+    chapitre = 0
+    lignes = []
+    taille = 0
+    with open(txt_path, "r", encoding="utf-8") as f:
+        for ligne in f:
+            nouveau_chapitre = CHAPITRE_RE.match(ligne) is not None
+            if nouveau_chapitre or taille >= TAILLE_SEGMENT_TXT:
+                if lignes:
+                    yield {"text": "".join(lignes), "metadata": {"chapitre": chapitre}}
+                    lignes, taille = [], 0
+                if nouveau_chapitre:
+                    chapitre += 1
+            lignes.append(ligne)
+            taille += len(ligne)
+    if lignes:
+        yield {"text": "".join(lignes), "metadata": {"chapitre": chapitre}}
+
+
+def iter_segments(chemin_entree):
+    """
+    Parcourt un texte au format pdf, txt ou epub segment par segment (page, document ou bloc).
+
+    Chaque segment est un dictionnaire {"text": ..., "metadata": {...}} dont les métadonnées
+    contiennent au moins le numéro de chapitre et "offset", la position du segment dans le texte
+    complet tel que le retournerait `convert`.
+
+    Le temps passé à lire les segments (hors traitement par l'appelant entre deux segments) est
+    mesuré comme une opération "convert", enregistrée lorsque le parcours se termine.
     """
     ext = os.path.splitext(chemin_entree)[1].lower()
 
     if ext == ".pdf":
-        return pdf_to_txt(chemin_entree)
+        segments = iter_pdf_pages(chemin_entree)
     elif ext == ".epub":
-        return epub_to_txt(chemin_entree)
+        segments = iter_epub_items(chemin_entree)
     elif ext == ".txt":
-        with open(chemin_entree, "r", encoding="utf-8") as f:
-            return f.read()
+        segments = iter_txt_segments(chemin_entree)
     else:
         raise ValueError(f"Format non pris en charge : {ext}")
+
+    offset = 0
+    duree = 0.0
+    error = None
+    try:
+        while True:
+            debut = time.perf_counter()
+            try:
+                segment = next(segments, None)
+            finally:
+                duree += time.perf_counter() - debut
+            if segment is None:
+                break
+            segment["metadata"]["offset"] = offset
+            offset += len(segment["text"])
+            yield segment
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        attrs = {"format": ext.lstrip("."), "chars": offset}
+        if error is not None:
+            attrs["error"] = f"{type(error).__name__}: {error}"
+        record("convert", duree, **attrs)
+
+
+def book_metadata(chemin_entree):
+    """
+    Lit le titre et l'auteur déclarés dans un pdf ou un epub.
+
+    Retourne un dictionnaire {"titre": ..., "auteur": ...} dont les valeurs sont None
+    lorsque l'information est absente (toujours le cas pour un fichier texte).
+    """
+    ext = os.path.splitext(chemin_entree)[1].lower()
+    titre = auteur = None
+
+    if ext == ".pdf":
+        with fitz.open(chemin_entree) as doc:
+            titre = (doc.metadata or {}).get("title") or None
+            auteur = (doc.metadata or {}).get("author") or None
+    elif ext == ".epub":
+        book = epub.read_epub(chemin_entree)
+        titres = book.get_metadata("DC", "title")
+        auteurs = book.get_metadata("DC", "creator")
+        titre = titres[0][0] if titres else None
+        auteur = auteurs[0][0] if auteurs else None
+
+    return {"titre": titre, "auteur": auteur}
+
+
+def pdf_to_txt(pdf_path):
+    """
+    Convertit un texte au format pdf en chaine de caractères.
+    """
+    return "".join(segment["text"] for segment in iter_pdf_pages(pdf_path))
+
+def epub_to_txt(epub_path):
+    """
+    Convertit un texte au format epub en chaine de caractères.
+    """
+    return "".join(segment["text"] for segment in iter_epub_items(epub_path))
+
+def convert(chemin_entree):
+    """
+    Convertit un texte au format pdf, txt ou epub en chaine de caractères.
+    """
+    ext = os.path.splitext(chemin_entree)[1].lower()
+
+    with span("convert", format=ext.lstrip(".")) as attrs:
+        if ext == ".pdf":
+            texte = pdf_to_txt(chemin_entree)
+        elif ext == ".epub":
+            texte = epub_to_txt(chemin_entree)
+        elif ext == ".txt":
+            with open(chemin_entree, "r", encoding="utf-8") as f:
+                texte = f.read()
+        else:
+            raise ValueError(f"Format non pris en charge : {ext}")
+        attrs["chars"] = len(texte)
+    return texte
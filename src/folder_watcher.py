@@ -0,0 +1,177 @@
+import os
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+# Masques inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_inotify():
+    """
+    Retourne la libc si elle expose inotify (Linux), sinon None.
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+class FolderWatcher:
+    """
+    Surveille les fichiers d'un dossier (ajouts, suppressions, modifications).
+
+    Sous Linux, le thread dort sur un descripteur inotify et ne se réveille que lorsque le dossier
+    change ; ailleurs (ou si inotify est indisponible), le dossier est relu toutes les
+    `poll_interval` secondes. Dans les deux cas, une rafale d'écritures n'est signalée qu'une
+    fois le dossier resté calme pendant `debounce` secondes, et les changements sont déterminés
+    en comparant (date de modification, taille) de chaque fichier.
+    """
+
+    def __init__(self, dossier, suffix=".json", debounce=0.3, poll_interval=2.0):
+        self.dossier = dossier
+        self.suffix = suffix
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._closed = False
+        self._wake_r, self._wake_w = os.pipe()
+        self._libc = _load_inotify()
+        self.backend = "inotify" if self._libc is not None else "polling"
+
+    def snapshot(self):
+        """
+        Retourne {nom: (mtime_ns, taille)} des fichiers surveillés, ou {} si le dossier n'existe pas.
+        """
+        state = {}
+        try:
+            with os.scandir(self.dossier) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(self.suffix):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue  # supprimé entre la lecture du dossier et celle du fichier
+                    state[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            pass
+        return state
+
+    @staticmethod
+    def diff(before, after):
+        """
+        Compare deux instantanés. Retourne {"ajoutes", "supprimes", "modifies"} (ensembles de noms).
+        """
+        return {
+            "ajoutes": set(after) - set(before),
+            "supprimes": set(before) - set(after),
+            "modifies": {name for name in set(before) & set(after) if before[name] != after[name]}
+        }
+
+    def watch(self, callback):
+        """
+        Boucle de surveillance (bloquante, à lancer dans un thread) jusqu'à l'appel de close().
+        `callback` reçoit le résultat de diff() après chaque rafale de changements.
+        """
+        state = self.snapshot()
+        fd = self._inotify_init()
+        watching = False
+        try:
+            while not self._closed:
+                if fd is not None and not watching and os.path.isdir(self.dossier):
+                    watching = self._libc.inotify_add_watch(fd, os.fsencode(self.dossier), WATCH_MASK) >= 0
+                if watching:
+                    readable, _, _ = select.select([fd, self._wake_r], [], [])
+                    if self._wake_r in readable:
+                        break
+                    if any(mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED) for mask in self._read_events(fd)):
+                        # Dossier supprimé ou déplacé : nouveau descripteur, surveillé dès qu'il réapparaît
+                        os.close(fd)
+                        fd, watching = self._inotify_init(), False
+                elif self._wait(self.poll_interval):
+                    break
+
+                # Les événements inotify ne servent qu'à réveiller le thread : l'instantané fait foi
+                if self.snapshot() == state:
+                    continue
+                new_state = self._settle()
+                changes = self.diff(state, new_state)
+                state = new_state
+                if any(changes.values()):
+                    callback(changes)
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def _inotify_init(self):
+        """
+        Retourne un descripteur inotify, ou None (surveillance par relecture périodique).
+        """
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC) if self._libc is not None else -1
+        self.backend = "inotify" if fd >= 0 else "polling"
+        return fd if fd >= 0 else None
+
+    def _wait(self, timeout):
+        """
+        Attend `timeout` secondes ou un appel à close(). Retourne True si close() a été appelé.
+        """
+        readable, _, _ = select.select([self._wake_r], [], [], timeout)
+        return bool(readable)
+
+    @staticmethod
+    def _read_events(fd):
+        try:
+            data = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                return
+            raise
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size + name_len
+            yield mask
+
+    def _settle(self):
+        """
+        Attend que le dossier ne change plus pendant `debounce` secondes et retourne son instantané.
+        """
+        state = self.snapshot()
+        while not self._closed:
+            if self._wait(self.debounce):
+                break
+            new_state = self.snapshot()
+            if new_state == state:
+                break
+            state = new_state
+        return state
+
+    def close(self):
+        """
+        Arrête la surveillance (réveille le thread bloqué dans watch()).
+        """
+        if not self._closed:
+            self._closed = True
+            os.write(self._wake_w, b"x")
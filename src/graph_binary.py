@@ -0,0 +1,208 @@
+import os
+import json
+import struct
+
+import numpy as np
+
+# Fichier binaire écrit à côté de chaque JSON de relations
+GRAPH_BINARY_EXT = ".cgraph"
+
+MAGIC = b"CGRAPH\x00\x01"
+HEADER_SIZE = struct.Struct("<Q")
+ALIGNMENT = 64
+
+
+def binary_path(json_path):
+    """
+    Chemin du fichier binaire correspondant à un fichier JSON de relations.
+    """
+    return os.path.splitext(json_path)[0] + GRAPH_BINARY_EXT
+
+
+class StringTable:
+    """
+    Table de chaînes internées : chaque chaîne distincte n'est stockée qu'une fois,
+    les tableaux ne contiennent que son indice.
+    """
+
+    def __init__(self):
+        self.index = {}
+
+    def add(self, text):
+        text = text or ""
+        if text not in self.index:
+            self.index[text] = len(self.index)
+        return self.index[text]
+
+    def arrays(self):
+        encoded = [s.encode("utf-8") for s in self.index]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def write_graph_binary(path, characters):
+    """
+    Écrit un graphe de relations (liste exportée en JSON par main.py) dans un conteneur binaire.
+
+    Le fichier contient un en-tête JSON décrivant des tableaux NumPy alignés, lisibles sans copie
+    par memory-mapping : table de chaînes (octets UTF-8 + décalages), puis nœuds (id, nom),
+    alias et arêtes (source, cible, type, preuve) sous forme d'indices. Les cibles de relations
+    qui ne sont pas des personnages exportés sont ajoutées après ceux-ci, avec leur id pour nom.
+    L'écriture est atomique (fichier temporaire puis remplacement).
+    """
+    strings = StringTable()
+    node_index = {}
+    node_id, node_name = [], []
+
+    def add_node(nid, name):
+        node_index[nid] = len(node_id)
+        node_id.append(strings.add(nid))
+        node_name.append(strings.add(name))
+
+    for person in characters:
+        if person["id"] not in node_index:
+            add_node(person["id"], person.get("nom_complet", person["id"]))
+    n_persons = len(node_id)
+
+    alias_node, alias_name = [], []
+    edge_src, edge_dst, edge_type, edge_evidence = [], [], [], []
+    for person in characters:
+        src = node_index[person["id"]]
+        for alias in person.get("aliases", []):
+            alias_node.append(src)
+            alias_name.append(strings.add(alias))
+        for rel in person.get("relations", []):
+            if rel["id"] not in node_index:
+                add_node(rel["id"], rel["id"])
+            edge_src.append(src)
+            edge_dst.append(node_index[rel["id"]])
+            edge_type.append(strings.add(rel.get("type_de_la_relation", "")))
+            edge_evidence.append(strings.add(rel.get("evidence", "")))
+
+    blob, offsets = strings.arrays()
+    arrays = {
+        "string_data": blob,
+        "string_offsets": offsets,
+        "node_id": np.array(node_id, dtype=np.int32),
+        "node_name": np.array(node_name, dtype=np.int32),
+        "alias_node": np.array(alias_node, dtype=np.int32),
+        "alias_name": np.array(alias_name, dtype=np.int32),
+        "edge_src": np.array(edge_src, dtype=np.int32),
+        "edge_dst": np.array(edge_dst, dtype=np.int32),
+        "edge_type": np.array(edge_type, dtype=np.int32),
+        "edge_evidence": np.array(edge_evidence, dtype=np.int32),
+    }
+
+    # Décalages calculés sur un en-tête de taille fixe, pour pouvoir l'écrire avant les données
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = {"version": 1, "n_persons": n_persons, "arrays": layout}
+    header_bytes = json.dumps(header).encode("utf-8")
+    start = -(-(len(MAGIC) + HEADER_SIZE.size + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+    header_bytes = header_bytes.ljust(start - len(MAGIC) - HEADER_SIZE.size)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + HEADER_SIZE.pack(len(header_bytes)) + header_bytes)
+        for name, array in arrays.items():
+            f.seek(start + layout[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(start + offset)
+    os.replace(tmp_path, path)
+
+
+class GraphBinary:
+    """
+    Lecture d'un fichier écrit par write_graph_binary : les tableaux sont des vues sur le fichier
+    memory-mappé, et seules les chaînes effectivement demandées sont décodées.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} n'est pas un graphe binaire")
+            (length,) = HEADER_SIZE.unpack(f.read(HEADER_SIZE.size))
+            self.header = json.loads(f.read(length))
+        start = len(MAGIC) + HEADER_SIZE.size + length
+        self._mmap = np.memmap(path, dtype=np.uint8, mode="r")
+        self.arrays = {}
+        for name, spec in self.header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            self.arrays[name] = np.frombuffer(self._mmap, dtype=dtype, count=count,
+                                              offset=start + spec["offset"]).reshape(spec["shape"])
+        self.n_persons = self.header["n_persons"]
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def strings(self, indices):
+        """
+        Décode les chaînes d'indices donnés. Retourne une liste alignée sur `indices`.
+        """
+        indices = np.asarray(indices)
+        unique, inverse = np.unique(indices, return_inverse=True)
+        data, offsets = self.arrays["string_data"], self.arrays["string_offsets"]
+        decoded = [data[offsets[i]:offsets[i + 1]].tobytes().decode("utf-8") for i in unique.tolist()]
+        return [decoded[i] for i in inverse.ravel().tolist()]
+
+
+def read_json_graph(path):
+    """
+    Construit le graphe NetworkX d'un fichier JSON de relations, nœud par nœud.
+
+    Returns:
+        nx.Graph: Graphe dont les nœuds portent l'attribut "label" (nom complet)
+        et les arêtes l'attribut "label" (type de la relation).
+    """
+    import networkx as nx
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    graph = nx.Graph()
+    for person in data:
+        node_id = person["id"]
+        label = person.get("nom_complet", node_id)
+        graph.add_node(node_id, label=label)
+        for rel in person.get("relations", []):
+            graph.add_edge(node_id, rel["id"], label=rel.get("type_de_la_relation", ""))
+    return graph
+
+
+def read_binary_graph(path):
+    """
+    Construit le même graphe que read_json_graph à partir du fichier binaire, en un seul
+    ajout groupé de nœuds puis d'arêtes.
+    """
+    import networkx as nx
+
+    data = GraphBinary(path)
+    ids = data.strings(data["node_id"])
+    names = data.strings(data["node_name"][:data.n_persons])
+    types = data.strings(data["edge_type"])
+
+    graph = nx.Graph()
+    graph.add_nodes_from((nid, {"label": name}) for nid, name in zip(ids, names))
+    graph.add_nodes_from(ids[data.n_persons:])
+    src = data["edge_src"].tolist()
+    dst = data["edge_dst"].tolist()
+    graph.add_edges_from((ids[u], ids[v], {"label": t}) for u, v, t in zip(src, dst, types))
+    return graph
+
+
+def read_graph(json_path):
+    """
+    Lit un graphe de relations, depuis son fichier binaire s'il existe et n'est pas plus ancien
+    que le JSON (les instantanés partiels d'une extraction en cours ne réécrivent que le JSON).
+    """
+    path = binary_path(json_path)
+    try:
+        if os.path.getmtime(path) >= os.path.getmtime(json_path):
+            return read_binary_graph(path)
+    except (OSError, ValueError):
+        pass
+    return read_json_graph(json_path)
@@ -0,0 +1,317 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+
+from slugify import slugify
+
+from entity_resolution import core_tokens, fold
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    slug TEXT NOT NULL UNIQUE,
+    titre TEXT,
+    auteur TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    book_id INTEGER NOT NULL REFERENCES books(id),
+    out_file TEXT UNIQUE,
+    model TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS characters (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    book_id INTEGER NOT NULL REFERENCES books(id),
+    char_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (run_id, char_id)
+);
+-- Noms normalisés d'un personnage : nom complet, aliases et tokens significatifs ("pangloss")
+CREATE TABLE IF NOT EXISTS names (
+    norm TEXT NOT NULL,
+    character_id INTEGER NOT NULL REFERENCES characters(id),
+    PRIMARY KEY (norm, character_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS relations (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    book_id INTEGER NOT NULL REFERENCES books(id),
+    source INTEGER NOT NULL REFERENCES characters(id),
+    target INTEGER NOT NULL REFERENCES characters(id),
+    type TEXT NOT NULL,
+    evidence TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_book ON runs(book_id);
+CREATE INDEX IF NOT EXISTS idx_characters_book ON characters(book_id);
+CREATE INDEX IF NOT EXISTS idx_names_character ON names(character_id);
+CREATE INDEX IF NOT EXISTS idx_relations_source ON relations(source);
+CREATE INDEX IF NOT EXISTS idx_relations_target ON relations(target);
+CREATE INDEX IF NOT EXISTS idx_relations_type ON relations(type, book_id);
+CREATE INDEX IF NOT EXISTS idx_relations_run ON relations(run_id);
+CREATE INDEX IF NOT EXISTS idx_relations_book ON relations(book_id);
+"""
+
+# Fichiers écrits par main.py : <slug>_<jjmmaaaahhmm>.json
+RELATIONS_FILE_RE = re.compile(r"^(?P<slug>.+)_(?P<timestamp>\d{12})\.json$")
+
+RELATION_COLUMNS = """
+    s.id AS source_id, s.name AS source, t.id AS target_id, t.name AS target, r.type, r.evidence,
+    b.slug AS book, r.run_id, ru.created_at
+"""
+
+
+def name_keys(name):
+    """
+    Clés de recherche d'un nom : le nom normalisé et ses tokens significatifs.
+    """
+    keys = {fold(name)}
+    keys.update(t for t in core_tokens(name) if len(t) >= 3)
+    keys.discard("")
+    return keys
+
+
+class GraphStore:
+    """
+    Base SQLite des graphes de relations de tous les livres et de toutes les extractions.
+
+    Chaque extraction (run) y ajoute ses personnages et ses relations ; les index sur les noms
+    normalisés, les livres, les runs et les types de relation permettent de répondre en quelques
+    millisecondes à "toutes les relations de Pangloss, toutes extractions confondues", ou de
+    charger le voisinage d'un personnage sans lire le reste du graphe.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # ---------- écriture ----------
+    def add_run(self, titre, auteur, characters, out_file=None, model=None, created_at=None, slug=None):
+        """
+        Enregistre le résultat d'une extraction (liste exportée en JSON par main.py).
+
+        Une extraction déjà enregistrée pour le même `out_file` est remplacée. Les cibles de
+        relations absentes de la liste sont ajoutées avec leur id pour nom (comme graph_binary).
+
+        Returns:
+            int: Id du run.
+        """
+        slug = slug or slugify(titre)
+        out_file = os.path.abspath(out_file) if out_file is not None else None
+        created_at = created_at or datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT INTO books (slug, titre, auteur) VALUES (?, ?, ?) "
+                    "ON CONFLICT(slug) DO UPDATE SET titre = excluded.titre, auteur = excluded.auteur",
+                    (slug, titre, auteur)
+                )
+                book_id = self._db.execute("SELECT id FROM books WHERE slug = ?", (slug,)).fetchone()[0]
+                if out_file is not None:
+                    old = self._db.execute("SELECT id FROM runs WHERE out_file = ?", (out_file,)).fetchone()
+                    if old is not None:
+                        self._delete_run(old[0])
+                run_id = self._db.execute(
+                    "INSERT INTO runs (book_id, out_file, model, created_at) VALUES (?, ?, ?, ?)",
+                    (book_id, out_file, model, created_at)
+                ).lastrowid
+
+                rows = {}
+
+                def add_character(char_id, name, aliases=()):
+                    rows[char_id] = self._db.execute(
+                        "INSERT INTO characters (run_id, book_id, char_id, name) VALUES (?, ?, ?, ?)",
+                        (run_id, book_id, char_id, name)
+                    ).lastrowid
+                    keys = set(name_keys(name))
+                    for alias in aliases:
+                        keys |= name_keys(alias)
+                    self._db.executemany("INSERT OR IGNORE INTO names (norm, character_id) VALUES (?, ?)",
+                                         [(key, rows[char_id]) for key in keys])
+
+                for person in characters:
+                    if person["id"] not in rows:
+                        add_character(person["id"], person.get("nom_complet", person["id"]), person.get("aliases", []))
+                relations = []
+                for person in characters:
+                    for rel in person.get("relations", []):
+                        if rel["id"] not in rows:
+                            add_character(rel["id"], rel["id"])
+                        relations.append((run_id, book_id, rows[person["id"]], rows[rel["id"]],
+                                          rel.get("type_de_la_relation", ""), rel.get("evidence")))
+                self._db.executemany(
+                    "INSERT INTO relations (run_id, book_id, source, target, type, evidence) VALUES (?, ?, ?, ?, ?, ?)",
+                    relations
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return run_id
+
+    def _delete_run(self, run_id):
+        self._db.execute("DELETE FROM relations WHERE run_id = ?", (run_id,))
+        self._db.execute("DELETE FROM names WHERE character_id IN (SELECT id FROM characters WHERE run_id = ?)",
+                         (run_id,))
+        self._db.execute("DELETE FROM characters WHERE run_id = ?", (run_id,))
+        self._db.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+
+    def import_file(self, path):
+        """
+        Importe un fichier de relations écrit par main.py (le livre est déduit du nom du fichier).
+
+        Returns:
+            int: Id du run.
+        """
+        match = RELATIONS_FILE_RE.match(os.path.basename(path))
+        slug = match.group("slug") if match else os.path.splitext(os.path.basename(path))[0]
+        created_at = (datetime.strptime(match.group("timestamp"), "%d%m%Y%H%M").isoformat(timespec="seconds")
+                      if match else None)
+        with open(path, "r", encoding="utf-8") as f:
+            characters = json.load(f)
+        return self.add_run(slug, None, characters, out_file=path, created_at=created_at, slug=slug)
+
+    # ---------- lecture ----------
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def _filters(self, book=None, run=None, alias="c"):
+        clauses, params = [], []
+        if book is not None:
+            clauses.append(f"{alias}.book_id = (SELECT id FROM books WHERE slug = ?)")
+            params.append(book)
+        if run is not None:
+            clauses.append(f"{alias}.run_id = ?")
+            params.append(run)
+        return "".join(f" AND {c}" for c in clauses), params
+
+    def find(self, name, book=None, run=None):
+        """
+        Personnages désignés par un nom (nom complet, alias ou token significatif, sans tenir
+        compte de la casse ni des accents), de l'extraction la plus récente à la plus ancienne.
+        """
+        where, params = self._filters(book, run)
+        return self._query(
+            "SELECT c.id, c.char_id, c.name, c.run_id, b.slug AS book, ru.created_at "
+            "FROM names n JOIN characters c ON c.id = n.character_id "
+            "JOIN runs ru ON ru.id = c.run_id JOIN books b ON b.id = c.book_id "
+            f"WHERE n.norm = ?{where} GROUP BY c.id ORDER BY ru.created_at DESC, c.id",
+            [fold(name)] + params
+        )
+
+    def relations(self, name, book=None, run=None, type=None):
+        """
+        Relations (dans les deux sens) des personnages désignés par un nom, toutes extractions
+        confondues sauf filtre par livre (slug), run ou type de relation.
+        """
+        where, params = self._filters(book, run, alias="r")
+        if type is not None:
+            where += " AND r.type = ?"
+            params.append(type)
+        return self._query(
+            "WITH matched AS (SELECT DISTINCT character_id FROM names WHERE norm = ?) "
+            f"SELECT {RELATION_COLUMNS} FROM relations r "
+            "JOIN characters s ON s.id = r.source JOIN characters t ON t.id = r.target "
+            "JOIN books b ON b.id = r.book_id JOIN runs ru ON ru.id = r.run_id "
+            f"WHERE r.id IN (SELECT id FROM relations WHERE source IN matched "
+            f"UNION SELECT id FROM relations WHERE target IN matched){where} "
+            "ORDER BY ru.created_at DESC, r.id",
+            [fold(name)] + params
+        )
+
+    def neighborhood(self, character_ids):
+        """
+        Voisinage immédiat de personnages (ids de la table characters) : toutes leurs relations,
+        avec le nom des deux extrémités. Sert au chargement progressif du graphe dans graph_viewer.
+        """
+        ids = list(character_ids)
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        return self._query(
+            f"SELECT {RELATION_COLUMNS} FROM relations r "
+            "JOIN characters s ON s.id = r.source JOIN characters t ON t.id = r.target "
+            "JOIN books b ON b.id = r.book_id JOIN runs ru ON ru.id = r.run_id "
+            f"WHERE r.id IN (SELECT id FROM relations WHERE source IN ({placeholders}) "
+            f"UNION SELECT id FROM relations WHERE target IN ({placeholders}))",
+            ids + ids
+        )
+
+    def run_for_file(self, out_file):
+        """
+        Id du run enregistré pour un fichier de relations, ou None.
+        """
+        rows = self._query("SELECT id FROM runs WHERE out_file = ?", (os.path.abspath(out_file),))
+        return rows[0]["id"] if rows else None
+
+    def runs(self, book=None):
+        where, params = ("WHERE b.slug = ?", [book]) if book else ("", [])
+        return self._query(
+            "SELECT ru.id, b.slug AS book, ru.out_file, ru.model, ru.created_at, "
+            "(SELECT COUNT(*) FROM characters c WHERE c.run_id = ru.id) AS characters "
+            f"FROM runs ru JOIN books b ON b.id = ru.book_id {where} ORDER BY ru.created_at DESC",
+            params
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Base SQLite des graphes de relations.")
+    parser.add_argument("--db", default="graph.sqlite", help="fichier de la base")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import", help="importe des fichiers (ou dossiers) de relations JSON")
+    p_import.add_argument("paths", nargs="+")
+    p_rel = sub.add_parser("relations", help="relations d'un personnage, toutes extractions confondues")
+    p_rel.add_argument("name")
+    p_rel.add_argument("--book", help="slug du livre")
+    p_rel.add_argument("--type", help="type de relation")
+    sub.add_parser("runs", help="liste des extractions enregistrées")
+    args = parser.parse_args()
+
+    with GraphStore(args.db) as store:
+        if args.command == "import":
+            files = []
+            for path in args.paths:
+                if os.path.isdir(path):
+                    files += sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".json"))
+                else:
+                    files.append(path)
+            for path in files:
+                try:
+                    print(f"{path} → run {store.import_file(path)}")
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    print(f"{path} ignoré : {e}", file=sys.stderr)
+        elif args.command == "relations":
+            debut = time.perf_counter()
+            rows = store.relations(args.name, book=args.book, type=args.type)
+            duree = time.perf_counter() - debut
+            for r in rows:
+                print(f"[{r['book']} #{r['run_id']}] {r['source']} —{r['type']}→ {r['target']}")
+            print(f"{len(rows)} relations en {duree * 1000:.1f} ms")
+        else:
+            for r in store.runs():
+                print(f"#{r['id']:<5} {r['created_at']}  {r['book']:<30} {r['characters']:>5} personnages  {r['out_file']}")
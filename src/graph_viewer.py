@@ -1,8 +1,15 @@
-import json
 import os
+import math
+import numpy as np
 import networkx as nx
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.collections import LineCollection
+from spatial_index import SpatialGrid
+from layout import force_layout, layout_path, load_layout, save_layout
+from folder_watcher import FolderWatcher
+from graph_binary import read_graph
+from graph_store import GraphStore
 import tkinter as tk
 from tkinter import ttk
 import threading
@@ -14,12 +21,24 @@ import signal
 # Dossier contenant les JSON
 DOSSIER_JSON = "relations"
 
+# Dossier des dispositions enregistrées (une par contenu de fichier JSON)
+DOSSIER_LAYOUTS = "layouts"
+
+# Base des graphes écrite par main.py, pour l'exploration progressive à partir d'un personnage
+GRAPH_STORE_PATH = "graph.sqlite"
+
+# Intervalle minimal entre deux rafraîchissements pendant un déplacement de nœud (60 images/s)
+FRAME_INTERVAL = 1 / 60
+
+# Facteur de zoom par cran de molette
+ZOOM_FACTOR = 1.2
+
 # Création de la fenêtre principale
 root = tk.Tk()
 root.title("Explorateur de Graphes JSON")
 root.state('zoomed')  # Plein écran
 
-stop_monitor = False
+watcher = FolderWatcher(DOSSIER_JSON, suffix=".json")
 
 # Frame principale
 main_frame = ttk.Frame(root)
@@ -29,6 +48,15 @@ main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 list_frame = ttk.LabelFrame(main_frame, text=" Fichiers JSON ", padding=10)
 list_frame.pack(side=tk.LEFT, fill=tk.Y, padx=(0, 10))
 
+# Exploration progressive : un personnage et ses voisins, développés par double-clic
+search_frame = ttk.Frame(list_frame)
+search_frame.pack(side=tk.TOP, fill=tk.X, pady=(0, 5))
+search_var = tk.StringVar()
+search_entry = ttk.Entry(search_frame, textvariable=search_var)
+search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+search_button = ttk.Button(search_frame, text="Explorer", command=lambda: explore_character())
+search_button.pack(side=tk.RIGHT, padx=(5, 0))
+
 listbox = tk.Listbox(list_frame, font=("Consolas", 10), width=40)
 listbox.pack(fill=tk.BOTH, expand=True)
 
@@ -36,6 +64,12 @@ scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=listbox.yview)
 scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 listbox.config(yscrollcommand=scrollbar.set)
 
+# Progression du calcul de la disposition
+layout_status = ttk.Label(list_frame, text="")
+layout_status.pack(side=tk.BOTTOM, fill=tk.X, before=listbox)
+layout_progress = ttk.Progressbar(list_frame, mode='determinate', maximum=100)
+layout_progress.pack(side=tk.BOTTOM, fill=tk.X, pady=(5, 0), before=layout_status)
+
 # Zone du graphe
 canvas_frame = ttk.Frame(main_frame)
 canvas_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
@@ -51,46 +85,417 @@ selected_node = None
 node_labels = {}
 edge_labels = {}
 current_file = None
+current_layout_path = None  # fichier où sont enregistrées les positions du graphe courant
+layout_job = 0              # numéro du dernier calcul de disposition lancé
+store = None                # GraphStore, ouvert à la première exploration
+ego_center = None           # personnage de départ de l'exploration progressive (None : fichier JSON)
+expanded = set()            # nœuds dont les relations ont déjà été chargées
+
+# Artistes matplotlib persistants, créés par update_graph et modifiés en place ensuite
+node_order = []          # ordre des nœuds dans node_collection
+node_index = {}          # nœud -> indice dans node_order
+node_xy = None           # tableau (nb_nœuds, 2) des positions, dans l'ordre de node_order
+node_sizes = None        # tailles des nœuds (points²)
+node_collection = None   # PathCollection des nœuds visibles
+edge_order = []          # ordre des arêtes dans edge_collection
+edge_segments = None     # tableau (nb_arêtes, 2, 2) des segments affichés
+edge_collection = None   # LineCollection des arêtes
+incident_edges = {}      # nœud -> indices des arêtes incidentes
+label_artists = {}       # nœud -> Text
+edge_label_artists = {}  # indice d'arête -> Text
+drag = None              # état du déplacement en cours (voir start_drag)
+pan = None               # état du déplacement de la vue en cours (voir on_press)
+
+# Vue : éléments dans la fenêtre visible et index spatial pour la sélection à la souris
+visible_nodes = None     # masque booléen sur node_order
+visible_edges = None     # masque booléen sur edge_order
+layout_version = 0       # incrémenté à chaque modification de node_xy
+hit_index = None         # SpatialGrid des nœuds en pixels, reconstruit à la demande
+hit_index_key = None
+view_refresh_pending = False
+
+def edge_label_geometry(u, v):
+    """
+    Calcule la position (milieu de l'arête) et l'angle à l'écran de l'étiquette d'une arête.
 
-def update_graph():
+    Args:
+        u: Premier nœud de l'arête.
+        v: Second nœud de l'arête.
+
+    Returns:
+        tuple: (x, y, angle en degrés), l'angle étant ramené entre -90 et 90 pour rester lisible.
+    """
+    (x1, y1), (x2, y2) = pos[u], pos[v]
+    x, y = (x1 + x2) / 2, (y1 + y2) / 2
+    angle = math.degrees(math.atan2(y2 - y1, x2 - x1))
+    if angle > 90:
+        angle -= 180
+    elif angle < -90:
+        angle += 180
+    angle = ax.transData.transform_angles(np.array([angle]), np.array([[x, y]]))[0]
+    return x, y, angle
+
+def update_graph(view=None):
     """
     Met à jour l'affichage du graphe dans la fenêtre.
 
+    Args:
+        view (tuple, optional): Limites (xlim, ylim) à conserver ; par défaut, la vue englobe tout le graphe.
+
     Cette fonction efface la zone de dessin, vérifie si le graphe est vide, et si ce n'est pas le cas,
     dessine les nœuds, les arêtes, les étiquettes des nœuds et des arêtes en utilisant les positions
     calculées. Si le graphe est vide, affiche un message indiquant qu'aucun graphe n'est chargé.
+    Les artistes créés sont conservés pour être modifiés en place lors des déplacements de nœuds.
 
     Variables globales modifiées :
         pos (dict): Positions des nœuds pour l'affichage.
         node_labels (dict): Étiquettes des nœuds.
         edge_labels (dict): Étiquettes des arêtes.
+        node_collection, edge_collection, label_artists, edge_label_artists: Artistes persistants.
 
     Returns:
         None
     """
 
     global pos, node_labels, edge_labels
+    global node_order, node_index, node_sizes, node_collection
+    global edge_order, edge_segments, edge_collection, incident_edges, label_artists, edge_label_artists
+    global drag, pan, node_xy, layout_version
     ax.clear()
+    drag = None
+    pan = None
+    node_collection = None
 
     if len(G.nodes) == 0:
         ax.text(0.5, 0.5, "Aucun graphe chargé", ha='center', va='center', transform=ax.transAxes, fontsize=16)
         canvas.draw()
         return
 
-    # Layout fixe ou réutilisé
-    if not pos or len(pos) != len(G.nodes):
-        pos = nx.spring_layout(G, k=10.0/len(G)**0.5, iterations=50, seed=42)
+    # Layout enregistré ou réutilisé ; sinon, calcul en arrière-plan puis nouvel appel
+    if any(n not in pos for n in G.nodes):
+        start_layout()
+        return
 
     degrees = dict(G.degree())
-    node_sizes = [500 * (1 + degrees[n]**0.8) for n in G.nodes()]
+    node_order = list(G.nodes())
+    node_index = {n: i for i, n in enumerate(node_order)}
+    node_sizes = np.array([500 * (1 + degrees[n]**0.8) for n in node_order], dtype=float)
+    node_xy = np.array([pos[n] for n in node_order], dtype=float)
+    layout_version += 1
+    edge_order = list(G.edges())
+    incident_edges = {n: [] for n in node_order}
+    for i, (u, v) in enumerate(edge_order):
+        incident_edges[u].append(i)
+        if v != u:
+            incident_edges[v].append(i)
+    edge_segments = np.array([(pos[u], pos[v]) for u, v in edge_order], dtype=float).reshape(-1, 2, 2)
+
+    node_collection = nx.draw_networkx_nodes(G, pos, ax=ax, nodelist=node_order, node_color='lightblue',
+                                             node_size=node_sizes, alpha=0.9)
+    edge_collection = LineCollection(edge_segments, colors='k', alpha=0.6, linewidths=1.5, zorder=1)
+    ax.add_collection(edge_collection)
+    label_artists = nx.draw_networkx_labels(G, pos, labels=node_labels, ax=ax, font_size=9, font_weight='bold')
+
+    edge_label_artists = {}
+    for i, (u, v) in enumerate(edge_order):
+        label = edge_labels.get((u, v), edge_labels.get((v, u)))
+        if not label:
+            continue
+        x, y, angle = edge_label_geometry(u, v)
+        edge_label_artists[i] = ax.text(
+            x, y, label, color='red', fontsize=7, ha='center', va='center', rotation=angle,
+            bbox=dict(boxstyle="round", ec=(1.0, 1.0, 1.0), fc=(1.0, 1.0, 1.0)), zorder=1, clip_on=True
+        )
+
+    if ego_center is not None:
+        title = f"{ego_center['name']} — {ego_center['book']} (double-clic sur un nœud : ses relations)"
+    else:
+        title = os.path.basename(current_file) if current_file else "Graphe"
+    ax.set_title(title, fontsize=14)
+    # Limites figées : le zoom et le déplacement de nœuds ne recalculent plus l'échelle
+    xlim, ylim = view if view else (ax.get_xlim(), ax.get_ylim())
+    ax.set_xlim(xlim)
+    ax.set_ylim(ylim)
+    apply_viewport()
+    canvas.draw()
+
+def start_layout():
+    """
+    Lance le calcul de la disposition du graphe courant dans un thread, sans bloquer l'interface.
+
+    Les positions déjà connues servent de point de départ. La progression est affichée dans la
+    barre latérale ; un calcul rendu obsolète par le chargement d'un autre fichier est abandonné.
+
+    Variables globales modifiées :
+        layout_job (int): Numéro du calcul lancé.
+
+    Returns:
+        None
+    """
+    global layout_job
+    layout_job += 1
+    job = layout_job
+    nodes, edges, initial = list(G.nodes()), list(G.edges()), dict(pos)
+
+    ax.clear()
+    ax.text(0.5, 0.5, f"Calcul de la disposition ({len(nodes)} nœuds)...", ha='center', va='center',
+            transform=ax.transAxes, fontsize=14)
+    canvas.draw()
+    layout_progress['value'] = 0
+    layout_status.config(text="Calcul de la disposition...")
+
+    def progress(iteration, total):
+        if iteration % 5 == 0 or iteration == total:
+            root.after(0, show_layout_progress, job, iteration, total)
+
+    def worker():
+        debut = time.perf_counter()
+        result = force_layout(nodes, edges, initial=initial, progress=progress,
+                              cancelled=lambda: job != layout_job)
+        if result is not None:
+            root.after(0, finish_layout, job, result, time.perf_counter() - debut)
+
+    threading.Thread(target=worker, daemon=True).start()
+
+def show_layout_progress(job, iteration, total):
+    if job == layout_job:
+        layout_progress['value'] = 100 * iteration / total
+
+def finish_layout(job, result, duree):
+    """
+    Applique une disposition calculée en arrière-plan, l'enregistre et redessine le graphe.
+
+    Args:
+        job (int): Numéro du calcul (ignoré s'il n'est plus le dernier lancé).
+        result (dict): Positions calculées.
+        duree (float): Durée du calcul en secondes.
+
+    Variables globales modifiées :
+        pos (dict): Positions des nœuds.
+
+    Returns:
+        None
+    """
+    global pos
+    if job != layout_job:
+        return
+    pos = result
+    layout_progress['value'] = 100
+    layout_status.config(text=f"Disposition calculée en {duree:.1f} s")
+    if current_layout_path:
+        save_layout(current_layout_path, pos)
+    update_graph()
+
+def node_radii_px():
+    """
+    Rayons affichés des nœuds, en pixels (la taille d'un nœud est une aire en points²).
+    """
+    return np.sqrt(node_sizes) / 2 * fig.dpi / 72
+
+def get_hit_index():
+    """
+    Retourne l'index spatial des nœuds en coordonnées écran, reconstruit seulement si
+    les positions, le zoom ou la taille de la fenêtre ont changé depuis le dernier clic.
+
+    Variables globales modifiées :
+        hit_index (SpatialGrid): Index spatial des nœuds.
+        hit_index_key (tuple): État de la vue pour lequel l'index a été construit.
+
+    Returns:
+        SpatialGrid: Index des nœuds, dans l'ordre de node_order.
+    """
+    global hit_index, hit_index_key
+    key = (layout_version, ax.get_xlim(), ax.get_ylim(), tuple(ax.bbox.bounds))
+    if hit_index is None or key != hit_index_key:
+        hit_index = SpatialGrid(ax.transData.transform(node_xy), node_radii_px())
+        hit_index_key = key
+    return hit_index
+
+def refresh_static_artists():
+    """
+    Recopie dans les artistes statiques les nœuds et arêtes visibles, sans le nœud
+    en cours de déplacement ni ses arêtes (dessinés à part par blitting).
 
-    nx.draw_networkx_nodes(G, pos, ax=ax, node_color='lightblue', node_size=node_sizes, alpha=0.9)
-    nx.draw_networkx_edges(G, pos, ax=ax, alpha=0.6, width=1.5)
-    nx.draw_networkx_labels(G, pos, labels=node_labels, ax=ax, font_size=9, font_weight='bold')
-    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, ax=ax, font_color='red', font_size=7)
+    Returns:
+        None
+    """
+    sizes = node_sizes.copy()
+    segments = edge_segments.copy()
+    if drag is not None:
+        sizes[node_index[drag["node"]]] = 0
+        segments[drag["edges"]] = np.nan
+    node_collection.set_offsets(node_xy[visible_nodes])
+    node_collection.set_sizes(sizes[visible_nodes])
+    edge_collection.set_segments(segments[visible_edges])
+
+def apply_viewport():
+    """
+    Ne garde dans les artistes que les nœuds, arêtes et étiquettes de la zone visible.
+
+    Variables globales modifiées :
+        visible_nodes (np.ndarray): Masque des nœuds visibles (marge d'un rayon de nœud).
+        visible_edges (np.ndarray): Masque des arêtes dont la boîte englobante coupe la vue.
+
+    Returns:
+        None
+    """
+    global visible_nodes, visible_edges
+    x0, x1 = sorted(ax.get_xlim())
+    y0, y1 = sorted(ax.get_ylim())
+    rayon = node_radii_px().max() if len(node_sizes) else 0.0
+    mx = rayon * (x1 - x0) / max(ax.bbox.width, 1)
+    my = rayon * (y1 - y0) / max(ax.bbox.height, 1)
+
+    xs, ys = node_xy[:, 0], node_xy[:, 1]
+    visible_nodes = (xs >= x0 - mx) & (xs <= x1 + mx) & (ys >= y0 - my) & (ys <= y1 + my)
+    lo, hi = edge_segments.min(axis=1), edge_segments.max(axis=1)
+    visible_edges = (hi[:, 0] >= x0) & (lo[:, 0] <= x1) & (hi[:, 1] >= y0) & (lo[:, 1] <= y1)
+
+    for node, text in label_artists.items():
+        text.set_visible(bool(visible_nodes[node_index[node]]))
+    for e, text in edge_label_artists.items():
+        x, y = text.get_position()
+        text.set_visible(x0 <= x <= x1 and y0 <= y <= y1)
+    refresh_static_artists()
+
+def refresh_view():
+    """
+    Applique le découpage à la vue courante et redessine (appelé au plus une fois par image).
+
+    Variables globales modifiées :
+        view_refresh_pending (bool): Réinitialisé à False.
+
+    Returns:
+        None
+    """
+    global view_refresh_pending
+    view_refresh_pending = False
+    if node_collection is None:
+        return
+    apply_viewport()
+    canvas.draw_idle()
 
-    ax.set_title(os.path.basename(current_file) if current_file else "Graphe", fontsize=14)
+def schedule_view_refresh():
+    """
+    Programme un rafraîchissement de la vue après un zoom ou un déplacement, en regroupant
+    les événements reçus pendant un même intervalle FRAME_INTERVAL.
+
+    Variables globales modifiées :
+        view_refresh_pending (bool): Vrai tant qu'un rafraîchissement est programmé.
+
+    Returns:
+        None
+    """
+    global view_refresh_pending
+    if not view_refresh_pending:
+        view_refresh_pending = True
+        root.after(int(FRAME_INTERVAL * 1000), refresh_view)
+
+def start_drag(node):
+    """
+    Prépare le déplacement d'un nœud par blitting.
+
+    Args:
+        node: Nœud saisi à la souris.
+
+    Le nœud, ses arêtes incidentes et leurs étiquettes sont retirés des artistes statiques et
+    redessinés par des artistes animés. Le reste du graphe est dessiné une seule fois puis
+    mémorisé comme fond : chaque mouvement ne redessine ensuite que les éléments déplacés.
+
+    Variables globales modifiées :
+        drag (dict): État du déplacement (artistes animés, fond mémorisé, dernier rafraîchissement).
+
+    Returns:
+        None
+    """
+    global drag
+    i = node_index[node]
+    edges = incident_edges[node]
+
+    x, y = pos[node]
+    moving_node = ax.scatter([x], [y], s=[node_sizes[i]], c='lightblue', alpha=0.9, zorder=2, animated=True)
+    moving_edges = LineCollection(edge_segments[edges], colors='k', alpha=0.6, linewidths=1.5,
+                                  zorder=1, animated=True)
+    ax.add_collection(moving_edges, autolim=False)
+    texts = [label_artists[node]] + [edge_label_artists[e] for e in edges if e in edge_label_artists]
+    for text in texts:
+        text.set_animated(True)
+        text.set_visible(True)
+
+    drag = {
+        "node": node,
+        "edges": edges,
+        "moving_node": moving_node,
+        "moving_edges": moving_edges,
+        "texts": texts,
+        "background": None,
+        "last_frame": 0.0,
+        "scheduled": False
+    }
+    refresh_static_artists()
     canvas.draw()
+    drag["background"] = canvas.copy_from_bbox(ax.bbox)
+    render_drag()
+
+def render_drag():
+    """
+    Redessine uniquement le nœud déplacé, ses arêtes et leurs étiquettes sur le fond mémorisé.
+
+    Returns:
+        None
+    """
+    if drag is None:
+        return
+    drag["scheduled"] = False
+    drag["last_frame"] = time.perf_counter()
+    node = drag["node"]
+    x, y = pos[node]
+
+    for e in drag["edges"]:
+        u, v = edge_order[e]
+        edge_segments[e] = (pos[u], pos[v])
+        if e in edge_label_artists:
+            lx, ly, angle = edge_label_geometry(u, v)
+            edge_label_artists[e].set_position((lx, ly))
+            edge_label_artists[e].set_rotation(angle)
+    drag["moving_node"].set_offsets([[x, y]])
+    drag["moving_edges"].set_segments(edge_segments[drag["edges"]])
+    label_artists[node].set_position((x, y))
+
+    canvas.restore_region(drag["background"])
+    ax.draw_artist(drag["moving_edges"])
+    ax.draw_artist(drag["moving_node"])
+    for text in drag["texts"]:
+        ax.draw_artist(text)
+    canvas.blit(ax.bbox)
+
+def end_drag():
+    """
+    Termine un déplacement : reporte la nouvelle position dans les artistes statiques,
+    supprime les artistes animés et enregistre la disposition modifiée.
+
+    Variables globales modifiées :
+        drag (dict): Réinitialisé à None.
+        node_xy (np.ndarray): Nouvelle position du nœud déplacé.
+
+    Returns:
+        None
+    """
+    global drag, layout_version
+    if drag is None:
+        return
+    render_drag()
+    node_xy[node_index[drag["node"]]] = pos[drag["node"]]
+    layout_version += 1
+    for text in drag["texts"]:
+        text.set_animated(False)
+    drag["moving_node"].remove()
+    drag["moving_edges"].remove()
+    drag = None
+    apply_viewport()
+    canvas.draw_idle()
+    if current_layout_path:
+        save_layout(current_layout_path, pos)
 
 def load_json_file(filepath):
     """
@@ -101,6 +506,8 @@ def load_json_file(filepath):
 
     Cette fonction lit un fichier JSON contenant des données de personnes et leurs relations,
     construit un graphe NetworkX avec ces données, et met à jour les étiquettes des noeuds et des arêtes.
+    Si l'extraction a aussi écrit le graphe au format binaire (.cgraph), celui-ci est lu à la place
+    du JSON (memory-mapping et construction groupée, voir graph_binary.py).
     En cas d'erreur, affiche un message d'erreur dans la zone de dessin.
 
     Variables globales modifiées :
@@ -109,6 +516,8 @@ def load_json_file(filepath):
         node_labels (dict): Étiquettes des nœuds.
         edge_labels (dict): Étiquettes des arêtes.
         current_file (str): Chemin du fichier JSON actuellement chargé.
+        current_layout_path (str): Fichier de la disposition enregistrée pour ce contenu.
+        ego_center (dict): Réinitialisé à None (fin de l'exploration progressive).
 
     Returns:
         None
@@ -117,29 +526,222 @@ def load_json_file(filepath):
         Exception: Si une erreur survient lors de la lecture ou du traitement du fichier JSON.
     """
 
-    global G, pos, node_labels, edge_labels, current_file
+    global G, pos, node_labels, edge_labels, current_file, current_layout_path, ego_center
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        G = nx.Graph()
-        for person in data:
-            node_id = person["id"]
-            label = person.get("nom_complet", node_id)
-            G.add_node(node_id, label=label)
-            for rel in person.get("relations", []):
-                G.add_edge(node_id, rel["id"], label=rel.get("type_de_la_relation", ""))
-
+        G = read_graph(filepath)
+        ego_center = None
         node_labels = {n: G.nodes[n].get('label', n) for n in G.nodes}
         edge_labels = nx.get_edge_attributes(G, 'label')
         current_file = filepath
-        pos = {}  # Forcer recalcul du layout
+        # Disposition enregistrée pour ce contenu, sinon recalcul en arrière-plan
+        current_layout_path = layout_path(DOSSIER_LAYOUTS, filepath)
+        saved = load_layout(current_layout_path) or {}
+        pos = {n: saved[n] for n in G.nodes if n in saved}
         update_graph()
     except Exception as e:
         ax.clear()
         ax.text(0.5, 0.5, f"Erreur:\n{e}", ha='center', va='center', transform=ax.transAxes, fontsize=12, color='red')
         canvas.draw()
 
+def apply_graph_diff(new_graph):
+    """
+    Met à jour G pour qu'il corresponde à `new_graph`, sans le reconstruire.
+
+    Args:
+        new_graph (nx.Graph): Graphe relu depuis le fichier.
+
+    Les nœuds et arêtes disparus sont retirés, les nouveaux ajoutés et les étiquettes mises à jour.
+    Les nœuds existants gardent leur position ; un nouveau nœud est placé près de ses voisins
+    déjà positionnés (ou au hasard dans l'emprise du graphe s'il n'en a pas).
+
+    Variables globales modifiées :
+        G (nx.Graph): Le graphe NetworkX.
+        pos (dict): Positions des nœuds.
+        node_labels (dict): Étiquettes des nœuds.
+        edge_labels (dict): Étiquettes des arêtes.
+
+    Returns:
+        dict: Nombre de nœuds et d'arêtes ajoutés et supprimés.
+    """
+    global node_labels, edge_labels
+    removed_nodes = [n for n in G.nodes if n not in new_graph]
+    added_nodes = [n for n in new_graph.nodes if n not in G]
+    removed_edges = [(u, v) for u, v in G.edges if not new_graph.has_edge(u, v)]
+    G.remove_edges_from(removed_edges)
+    G.remove_nodes_from(removed_nodes)
+    added_edges = sum(1 for u, v in new_graph.edges if not G.has_edge(u, v))
+    G.add_nodes_from(new_graph.nodes(data=True))
+    G.add_edges_from(new_graph.edges(data=True))
+
+    for n in removed_nodes:
+        pos.pop(n, None)
+    if pos:
+        xy = np.array(list(pos.values()), dtype=float)
+        lo, hi = xy.min(axis=0), xy.max(axis=0)
+    else:
+        lo, hi = np.array([-1.0, -1.0]), np.array([1.0, 1.0])
+    rng = np.random.default_rng()
+    spread = 0.05 * max(float((hi - lo).max()), 1e-3)
+    for n in added_nodes:
+        voisins = [pos[m] for m in G.neighbors(n) if m in pos]
+        if voisins:
+            pos[n] = tuple(np.mean(voisins, axis=0) + rng.normal(0, spread, 2))
+        else:
+            pos[n] = tuple(rng.uniform(lo, hi))
+
+    node_labels = {n: G.nodes[n].get('label', n) for n in G.nodes}
+    edge_labels = nx.get_edge_attributes(G, 'label')
+    return {"noeuds_ajoutes": len(added_nodes), "noeuds_supprimes": len(removed_nodes),
+            "aretes_ajoutees": added_edges, "aretes_supprimees": len(removed_edges)}
+
+def get_store():
+    """
+    Retourne la base des graphes (ouverte au premier appel), ou None si elle n'existe pas encore.
+
+    Variables globales modifiées :
+        store (GraphStore): Base ouverte.
+    """
+    global store
+    if store is None and os.path.exists(GRAPH_STORE_PATH):
+        store = GraphStore(GRAPH_STORE_PATH)
+    return store
+
+def neighborhood_graph(nodes):
+    """
+    Retourne une copie de G complétée par les relations des nœuds donnés, lues dans la base.
+
+    Args:
+        nodes (list): Nœuds à développer (ids de personnages dans la base).
+
+    Variables globales modifiées :
+        expanded (set): Les nœuds développés y sont ajoutés.
+
+    Returns:
+        nx.Graph: Nouveau graphe, à appliquer avec apply_graph_diff.
+    """
+    new_graph = G.copy()
+    for r in get_store().neighborhood(nodes):
+        new_graph.add_node(r["source_id"], label=r["source"])
+        new_graph.add_node(r["target_id"], label=r["target"])
+        new_graph.add_edge(r["source_id"], r["target_id"], label=r["type"])
+    expanded.update(nodes)
+    return new_graph
+
+def explore_character(event=None):
+    """
+    Affiche le voisinage d'un personnage, lu dans la base sans charger le reste du graphe.
+
+    Args:
+        event: Événement clavier (touche Entrée dans le champ de recherche), ignoré.
+
+    Le personnage est cherché dans l'extraction du fichier affiché s'il y figure, sinon dans
+    l'extraction la plus récente qui le contient. Seuls lui et ses voisins sont chargés et disposés ;
+    un double-clic sur un nœud ajoute ensuite ses propres relations (voir expand_ego_node).
+
+    Variables globales modifiées :
+        G (nx.Graph): Le graphe NetworkX.
+        pos (dict): Positions des nœuds (réinitialisées).
+        node_labels (dict): Étiquettes des nœuds.
+        edge_labels (dict): Étiquettes des arêtes.
+        current_file (str): Réinitialisé à None.
+        current_layout_path (str): Réinitialisé à None (disposition non enregistrée).
+        ego_center (dict): Personnage de départ.
+        expanded (set): Nœuds développés.
+
+    Returns:
+        None
+    """
+    global G, pos, node_labels, edge_labels, current_file, current_layout_path, ego_center, expanded
+    name = search_var.get().strip()
+    if not name:
+        return
+    matches = []
+    if get_store() is not None:
+        run = store.run_for_file(current_file) if current_file else None
+        matches = (store.find(name, run=run) if run is not None else []) or store.find(name)
+    if not matches:
+        layout_status.config(text=f"« {name} » introuvable dans {GRAPH_STORE_PATH}")
+        return
+
+    ego_center = matches[0]
+    current_file = None
+    current_layout_path = None
+    expanded = set()
+    G = nx.Graph()
+    G.add_node(ego_center["id"], label=ego_center["name"])
+    G = neighborhood_graph([ego_center["id"]])
+    node_labels = {n: G.nodes[n].get('label', n) for n in G.nodes}
+    edge_labels = nx.get_edge_attributes(G, 'label')
+    pos = {}
+    listbox.selection_clear(0, tk.END)
+    layout_status.config(text=f"{ego_center['name']} : {G.number_of_nodes() - 1} voisins")
+    update_graph()
+
+def expand_ego_node(node):
+    """
+    Ajoute au graphe affiché les relations d'un nœud (exploration progressive), en conservant
+    les positions et la vue ; les nouveaux nœuds sont placés près de leurs voisins.
+
+    Args:
+        node: Nœud à développer.
+
+    Returns:
+        None
+    """
+    if node in expanded:
+        return
+    view = (ax.get_xlim(), ax.get_ylim())
+    changes = apply_graph_diff(neighborhood_graph([node]))
+    layout_status.config(text=f"{node_labels.get(node, node)} : +{changes['noeuds_ajoutes']} nœuds, "
+                              f"+{changes['aretes_ajoutees']} arêtes")
+    update_graph(view)
+
+search_entry.bind('<Return>', explore_character)
+
+def reload_current_file():
+    """
+    Recharge le fichier affiché après une modification sur disque, en conservant les positions
+    et la vue (zoom). Si un nœud est en cours de déplacement, le rechargement est reporté.
+
+    Variables globales modifiées :
+        current_layout_path (str): Disposition associée au nouveau contenu du fichier.
+
+    Returns:
+        None
+    """
+    global current_layout_path
+    if current_file is None or not os.path.exists(current_file):
+        return
+    if drag is not None or pan is not None or any(n not in pos for n in G.nodes):
+        root.after(500, reload_current_file)
+        return
+    try:
+        new_graph = read_graph(current_file)
+    except (OSError, ValueError, KeyError, TypeError):
+        return  # fichier en cours d'écriture ou invalide : la prochaine modification le rechargera
+    view = (ax.get_xlim(), ax.get_ylim()) if node_collection is not None else None
+    changes = apply_graph_diff(new_graph)
+    current_layout_path = layout_path(DOSSIER_LAYOUTS, current_file)
+    save_layout(current_layout_path, pos)
+    layout_status.config(text=(f"Rechargé : +{changes['noeuds_ajoutes']}/-{changes['noeuds_supprimes']} nœuds, "
+                               f"+{changes['aretes_ajoutees']}/-{changes['aretes_supprimees']} arêtes"))
+    update_graph(view)
+
+def on_folder_change(changes):
+    """
+    Réagit aux changements du dossier signalés par le FolderWatcher (dans le thread Tk).
+
+    Args:
+        changes (dict): Noms des fichiers "ajoutes", "supprimes" et "modifies".
+
+    Returns:
+        None
+    """
+    if changes["ajoutes"] or changes["supprimes"]:
+        update_file_list()
+    if current_file and os.path.basename(current_file) in changes["modifies"]:
+        reload_current_file()
+
 def update_file_list():
     """
     Met à jour la liste des fichiers JSON dans la barre latérale.
@@ -167,8 +769,8 @@ def update_file_list():
         if current_file and os.path.basename(current_file) == files[current_selection[0]]:
             return  # déjà chargé
 
-    # Charger le premier fichier au démarrage
-    if files and listbox.size() > 0:
+    # Charger le premier fichier au démarrage (sauf pendant l'exploration d'un personnage)
+    if files and listbox.size() > 0 and ego_center is None:
         listbox.selection_set(0)
         first_file = os.path.join(DOSSIER_JSON, files[0])
         if current_file != first_file:
@@ -199,29 +801,38 @@ listbox.bind('<<ListboxSelect>>', on_file_select)
 
 def on_press(event):
     """
-    Gère l'événement de clic sur un nœud du graphe.
+    Gère l'événement de clic dans la zone du graphe.
 
     Args:
         event: Événement de clic de la souris (matplotlib).
 
-    Identifie si un nœud a été cliqué en fonction de la position de la souris et met à jour
-    la variable globale `selected_node` si un nœud est trouvé.
+    Un clic gauche sur un nœud (dans le disque effectivement dessiné, quel que soit le zoom)
+    le sélectionne et prépare son déplacement ; pendant l'exploration d'un personnage, un
+    double-clic charge ses relations. Un clic gauche dans le vide, ou un clic
+    molette, commence un déplacement de la vue.
 
     Variables globales modifiées :
         selected_node: Identifiant du nœud sélectionné.
+        pan (dict): Point de départ du déplacement de la vue.
 
     Returns:
         None
     """
 
-    global selected_node
-    if event.inaxes != ax or not pos:
+    global selected_node, pan
+    if event.inaxes != ax or node_collection is None:
         return
-    for node, (x, y) in pos.items():
-        dist = (event.xdata - x)**2 + (event.ydata - y)**2
-        if dist < 0.02:
-            selected_node = node
-            break
+    if event.button == 1:
+        i = get_hit_index().hit(event.x, event.y)
+        if i is not None and event.dblclick and ego_center is not None:
+            expand_ego_node(node_order[i])
+            return
+        if i is not None:
+            selected_node = node_order[i]
+            start_drag(selected_node)
+            return
+    if event.button in (1, 2):
+        pan = {"x": event.x, "y": event.y, "xlim": ax.get_xlim(), "ylim": ax.get_ylim()}
 
 def on_release(event):
     """
@@ -230,27 +841,33 @@ def on_release(event):
     Args:
         event: Événement de relâchement de la souris (matplotlib).
 
-    Réinitialise la variable globale `selected_node` à None, indiquant qu'aucun nœud n'est sélectionné.
+    Termine le déplacement éventuel (nœud ou vue) et réinitialise la variable globale
+    `selected_node` à None, indiquant qu'aucun nœud n'est sélectionné.
 
     Variables globales modifiées :
         selected_node: Identifiant du nœud sélectionné (réinitialisé à None).
+        pan (dict): Réinitialisé à None.
 
     Returns:
         None
     """
 
-    global selected_node
+    global selected_node, pan
+    end_drag()
     selected_node = None
+    pan = None
 
 def on_motion(event):
     """
-    Gère le déplacement de la souris pour déplacer un nœud.
+    Gère le déplacement de la souris pour déplacer un nœud ou la vue.
 
     Args:
         event: Événement de mouvement de la souris (matplotlib).
 
-    Si un nœud est sélectionné, met à jour sa position en fonction des coordonnées de la souris
-    et redessine le graphe.
+    Si un nœud est sélectionné, met à jour sa position en fonction des coordonnées de la souris.
+    Le rafraîchissement est limité à FRAME_INTERVAL : les mouvements plus rapprochés ne font que
+    programmer un dernier rafraîchissement, pour que la position finale soit toujours affichée.
+    Pendant un déplacement de la vue, décale les limites des axes du déplacement de la souris.
 
     Variables globales modifiées :
         pos (dict): Positions des nœuds (mise à jour pour le nœud sélectionné).
@@ -258,44 +875,60 @@ def on_motion(event):
     Returns:
         None
     """
-    global selected_node
-    if selected_node is None or event.inaxes != ax or not pos:
+    if pan is not None:
+        (x0, x1), (y0, y1) = pan["xlim"], pan["ylim"]
+        dx = (event.x - pan["x"]) * (x1 - x0) / ax.bbox.width
+        dy = (event.y - pan["y"]) * (y1 - y0) / ax.bbox.height
+        ax.set_xlim(x0 - dx, x1 - dx)
+        ax.set_ylim(y0 - dy, y1 - dy)
+        schedule_view_refresh()
+        return
+    if selected_node is None or drag is None or event.inaxes != ax or not pos:
         return
     pos[selected_node] = (event.xdata, event.ydata)
-    update_graph()
+    attente = FRAME_INTERVAL - (time.perf_counter() - drag["last_frame"])
+    if attente <= 0:
+        render_drag()
+    elif not drag["scheduled"]:
+        drag["scheduled"] = True
+        root.after(max(int(attente * 1000), 1), render_drag)
+
+def on_scroll(event):
+    """
+    Zoome ou dézoome (molette) autour du point situé sous la souris.
+
+    Args:
+        event: Événement de molette (matplotlib).
+
+    Returns:
+        None
+    """
+    if event.inaxes != ax or node_collection is None or drag is not None:
+        return
+    factor = 1 / ZOOM_FACTOR if event.button == 'up' else ZOOM_FACTOR
+    x0, x1 = ax.get_xlim()
+    y0, y1 = ax.get_ylim()
+    ax.set_xlim(event.xdata - (event.xdata - x0) * factor, event.xdata + (x1 - event.xdata) * factor)
+    ax.set_ylim(event.ydata - (event.ydata - y0) * factor, event.ydata + (y1 - event.ydata) * factor)
+    schedule_view_refresh()
 
 fig.canvas.mpl_connect('button_press_event', on_press)
 fig.canvas.mpl_connect('button_release_event', on_release)
 fig.canvas.mpl_connect('motion_notify_event', on_motion)
+fig.canvas.mpl_connect('scroll_event', on_scroll)
 
 def monitor_folder():
     """
     Surveille les modifications dans le dossier contenant les fichiers JSON.
 
-    Cette fonction s'exécute dans un thread séparé et vérifie périodiquement si la liste des fichiers
-    JSON dans le dossier a changé. Si un changement est détecté, elle déclenche une mise à jour de
-    la liste des fichiers dans l'interface graphique.
-
-    Variables globales modifiées :
-        stop_monitor (bool): Indicateur pour arrêter la surveillance.
+    Cette fonction s'exécute dans un thread séparé et attend les changements du dossier
+    (inotify sous Linux, relecture périodique ailleurs). Les rafales d'écritures sont regroupées,
+    puis les changements sont transmis à l'interface graphique par on_folder_change.
 
     Returns:
         None
     """
-    global stop_monitor
-    last_files = set()
-    while not stop_monitor:
-        if not os.path.exists(DOSSIER_JSON):
-            time.sleep(2)
-            continue
-        try:
-            current_files = set(f for f in os.listdir(DOSSIER_JSON) if f.endswith(".json"))
-            if current_files != last_files:
-                last_files = current_files
-                root.after(0, update_file_list)
-        except Exception as e:
-            pass  # ignore erreurs temporaires
-        time.sleep(2)
+    watcher.watch(lambda changes: root.after(0, on_folder_change, changes))
 
 def on_closing():
     """
@@ -304,14 +937,12 @@ def on_closing():
     Cette fonction arrête le thread de surveillance, ferme la boucle principale de l'interface graphique,
     détruit la fenêtre et quitte l'application proprement.
 
-    Variables globales modifiées :
-        stop_monitor (bool): Indicateur pour arrêter la surveillance.
-
     Returns:
         None
     """
-    global stop_monitor
-    stop_monitor = True
+    watcher.close()
+    if store is not None:
+        store.close()
     time.sleep(0.1)  # attendre que le thread s'arrête
     root.quit()      # arrête mainloop
     root.destroy()   # détruit la fenêtre
@@ -0,0 +1,136 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+MANIFEST_FILE = "index_manifest.json"
+
+
+class IncompatibleIndexError(ValueError):
+    """
+    Levée lorsqu'une base Chroma a été construite avec d'autres paramètres
+    (modèle d'embeddings, découpage) que ceux demandés.
+    """
+
+
+def chunk_id(text):
+    """
+    Identifiant d'un chunk : hash SHA-256 de son contenu.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_sha256(path, block_size=1 << 20):
+    """
+    Hash SHA-256 d'un fichier, lu par blocs.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_manifest(db_path):
+    """
+    Retourne le manifeste d'une base (paramètres d'indexation et hash du livre), ou None.
+    """
+    path = os.path.join(db_path, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(db_path, params, source_sha256, n_chunks):
+    manifest = {
+        "params": params,
+        "source_sha256": source_sha256,
+        "n_chunks": n_chunks,
+        "updated_at": datetime.now().isoformat()
+    }
+    with open(os.path.join(db_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+
+def check_compatible(manifest, params):
+    """
+    Vérifie que la base a été construite avec les mêmes paramètres d'indexation.
+    Lève IncompatibleIndexError dans le cas contraire.
+    """
+    if manifest is None:
+        return
+    differences = {
+        k: (manifest["params"].get(k), v)
+        for k, v in params.items()
+        if manifest["params"].get(k) != v
+    }
+    if differences:
+        detail = ", ".join(f"{k}: {old!r} → {new!r}" for k, (old, new) in differences.items())
+        raise IncompatibleIndexError(
+            f"Base construite avec d'autres paramètres ({detail}). "
+            f"Relancez avec --reindex pour la reconstruire."
+        )
+
+
+def sync_chunks(vectordb, docs, batch_size=256):
+    """
+    Met à jour une base Chroma pour qu'elle contienne exactement les chunks de `docs`.
+
+    Chaque chunk est identifié par le hash de son contenu : seuls les chunks absents de la base
+    sont vectorisés et ajoutés, ceux qui n'existent plus sont supprimés. Un chunk inchangé mais
+    déplacé par une modification du livre (position, chapitre, pages) ne voit que ses métadonnées
+    mises à jour, sans être revectorisé. Retourne un dictionnaire {"ajoutes", "supprimes",
+    "inchanges", "deplaces"} (les chunks déplacés sont aussi comptés comme inchangés).
+    """
+    stored = vectordb.get(include=["metadatas"])
+    existing = dict(zip(stored["ids"], stored["metadatas"]))
+    seen = set()
+    added = moved = 0
+    batch = []
+    updates = []
+
+    def flush():
+        vectordb.add_texts(
+            [d["text"] for d in batch],
+            metadatas=[d["metadata"] for d in batch],
+            ids=[d["metadata"]["chunk_hash"] for d in batch]
+        )
+
+    def flush_updates():
+        # Métadonnées seules : la collection Chroma ne recalcule pas les vecteurs
+        vectordb._collection.update(ids=[cid for cid, _ in updates], metadatas=[m for _, m in updates])
+
+    for doc in docs:
+        cid = chunk_id(doc["text"])
+        if cid in seen:
+            continue  # chunk identique déjà rencontré dans ce livre
+        seen.add(cid)
+        doc["metadata"]["chunk_hash"] = cid
+        if cid in existing:
+            old = existing[cid] or {}
+            if any(old.get(k) != v for k, v in doc["metadata"].items()):
+                updates.append((cid, doc["metadata"]))
+                if len(updates) >= batch_size:
+                    flush_updates()
+                    moved += len(updates)
+                    updates = []
+            continue
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            flush()
+            added += len(batch)
+            batch = []
+    if batch:
+        flush()
+        added += len(batch)
+    if updates:
+        flush_updates()
+        moved += len(updates)
+
+    stale = list(set(existing) - seen)
+    for i in range(0, len(stale), batch_size):
+        vectordb.delete(ids=stale[i:i + batch_size])
+
+    return {"ajoutes": added, "supprimes": len(stale), "inchanges": len(seen.intersection(existing)),
+            "deplaces": moved}
@@ -0,0 +1,182 @@
+import os
+import json
+import math
+
+import numpy as np
+
+from indexing import file_sha256
+from run_journal import write_json_atomic
+
+# ===================== CONFIG =====================
+LAYOUT_ITERATIONS = 100
+LAYOUT_K = 10.0          # distance idéale entre nœuds : LAYOUT_K / sqrt(nb_nœuds), comme avant
+EXACT_MAX_NODES = 1500   # au-delà, la répulsion lointaine est approchée par une grille
+BLOCK_SIZE = 2048        # lignes traitées à la fois, pour borner la mémoire des calculs N × M
+
+
+def _squared_distances(a, b):
+    return (a[:, 0, None] - b[None, :, 0]) ** 2 + (a[:, 1, None] - b[None, :, 1]) ** 2
+
+
+def _weighted_push(a, b, weight):
+    """
+    Somme, pour chaque point de a, des vecteurs (a_i - b_j) pondérés par weight[i, j],
+    calculée comme a_i · Σ_j w_ij - Σ_j w_ij b_j pour éviter un tableau N × M × 2.
+    """
+    return a * weight.sum(axis=1)[:, None] - weight @ b
+
+
+def _exact_repulsion(xy, k2):
+    """
+    Répulsion exacte entre toutes les paires de nœuds : k² / d, dirigée de l'autre nœud vers le nœud.
+    """
+    disp = np.zeros_like(xy)
+    for start in range(0, len(xy), BLOCK_SIZE):
+        block = xy[start:start + BLOCK_SIZE]
+        weight = k2 / np.maximum(_squared_distances(block, xy), 1e-4)
+        disp[start:start + BLOCK_SIZE] = _weighted_push(block, xy, weight)
+    return disp
+
+
+def _grid_repulsion(xy, k2):
+    """
+    Répulsion approchée sur une grille d'environ 3·√N cellules : exacte avec les nœuds des
+    cellules voisines, et, pour les cellules plus lointaines, exercée par leur centre de masse
+    pondéré par leur nombre de nœuds. Coût en O(N^1.5) au lieu de O(N²).
+    """
+    n = len(xy)
+    side = max(int(math.ceil(math.sqrt(3 * math.sqrt(n)))), 1)
+    lo = xy.min(axis=0)
+    size = np.maximum(xy.max(axis=0) - lo, 1e-9) / side
+    cxy = np.clip(((xy - lo) / size).astype(int), 0, side - 1)
+    cell = cxy[:, 0] * side + cxy[:, 1]
+
+    order = np.argsort(cell, kind="stable")
+    counts = np.bincount(cell, minlength=side * side)
+    starts = np.cumsum(counts) - counts
+    disp = np.zeros_like(xy)
+
+    # Champ proche : paires exactes avec les 3 × 3 cellules voisines
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            nx_, ny_ = cxy[:, 0] + dx, cxy[:, 1] + dy
+            valid = np.flatnonzero((nx_ >= 0) & (nx_ < side) & (ny_ >= 0) & (ny_ < side))
+            neighbour = nx_[valid] * side + ny_[valid]
+            cnt = counts[neighbour]
+            total = int(cnt.sum())
+            if total == 0:
+                continue
+            src = np.repeat(valid, cnt)
+            offsets = np.arange(total) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+            dst = order[np.repeat(starts[neighbour], cnt) + offsets]
+            keep = src != dst
+            src, dst = src[keep], dst[keep]
+            delta = xy[src] - xy[dst]
+            factor = k2 / np.maximum((delta ** 2).sum(axis=1), 1e-4)
+            disp[:, 0] += np.bincount(src, weights=delta[:, 0] * factor, minlength=n)
+            disp[:, 1] += np.bincount(src, weights=delta[:, 1] * factor, minlength=n)
+
+    # Champ lointain : centres de masse des cellules non voisines
+    occupied = np.flatnonzero(counts)
+    mass = counts[occupied].astype(float)
+    centres = np.stack([
+        np.bincount(cell, weights=xy[:, 0], minlength=side * side)[occupied],
+        np.bincount(cell, weights=xy[:, 1], minlength=side * side)[occupied]
+    ], axis=1) / mass[:, None]
+    ox, oy = occupied // side, occupied % side
+    for start in range(0, n, BLOCK_SIZE):
+        block = slice(start, start + BLOCK_SIZE)
+        far = ((np.abs(cxy[block, 0, None] - ox[None, :]) > 1) |
+               (np.abs(cxy[block, 1, None] - oy[None, :]) > 1))
+        weight = (mass * k2) / np.maximum(_squared_distances(xy[block], centres), 1e-4)
+        weight[~far] = 0.0
+        disp[block] += _weighted_push(xy[block], centres, weight)
+    return disp
+
+
+def force_layout(nodes, edges, initial=None, iterations=LAYOUT_ITERATIONS, seed=42, progress=None,
+                 cancelled=None):
+    """
+    Disposition force-dirigée (Fruchterman-Reingold) vectorisée avec NumPy.
+
+    Args:
+        nodes (list): Nœuds du graphe.
+        edges (list): Arêtes (u, v).
+        initial (dict, optional): Positions de départ connues (les autres nœuds sont placés au hasard).
+        iterations (int): Nombre d'itérations.
+        seed (int): Graine du placement aléatoire initial.
+        progress (callable, optional): Appelée avec (itération, iterations) après chaque itération.
+        cancelled (callable, optional): Si elle retourne vrai, le calcul est abandonné.
+
+    Returns:
+        dict: Positions {nœud: (x, y)} ramenées dans [-1, 1], ou None si le calcul a été abandonné.
+    """
+    n = len(nodes)
+    if n == 0:
+        return {}
+    if n == 1:
+        return {nodes[0]: (0.0, 0.0)}
+
+    index = {node: i for i, node in enumerate(nodes)}
+    rng = np.random.default_rng(seed)
+    xy = rng.random((n, 2))
+    if initial:
+        known = [(index[node], p) for node, p in initial.items() if node in index]
+        if known:
+            rows, points = zip(*known)
+            xy[list(rows)] = np.asarray(points, dtype=float)
+    pairs = np.array([(index[u], index[v]) for u, v in edges if u != v and u in index and v in index],
+                     dtype=int).reshape(-1, 2)
+
+    k = LAYOUT_K / math.sqrt(n)
+    repulsion = _exact_repulsion if n <= EXACT_MAX_NODES else _grid_repulsion
+    t = 0.1 * max(float(np.ptp(xy[:, 0])), float(np.ptp(xy[:, 1])), 1e-3)
+    dt = t / (iterations + 1)
+
+    for iteration in range(iterations):
+        if cancelled is not None and cancelled():
+            return None
+        disp = repulsion(xy, k * k)
+        if len(pairs):
+            delta = xy[pairs[:, 0]] - xy[pairs[:, 1]]
+            force = delta * (np.sqrt((delta ** 2).sum(axis=1)) / k)[:, None]
+            for axis in (0, 1):
+                disp[:, axis] -= np.bincount(pairs[:, 0], weights=force[:, axis], minlength=n)
+                disp[:, axis] += np.bincount(pairs[:, 1], weights=force[:, axis], minlength=n)
+        length = np.maximum(np.sqrt((disp ** 2).sum(axis=1)), 1e-2)
+        xy += disp * (np.minimum(length, t) / length)[:, None]
+        t -= dt
+        if progress is not None:
+            progress(iteration + 1, iterations)
+
+    xy -= xy.mean(axis=0)
+    scale = np.abs(xy).max()
+    if scale > 0:
+        xy /= scale
+    return {node: (float(x), float(y)) for node, (x, y) in zip(nodes, xy)}
+
+
+def layout_path(dossier, relations_path):
+    """
+    Chemin de la disposition enregistrée pour un fichier de relations, identifié par le hash
+    de son contenu : un fichier modifié n'hérite pas d'une disposition obsolète.
+    """
+    return os.path.join(dossier, f"{file_sha256(relations_path)}.json")
+
+
+def load_layout(path):
+    """
+    Retourne les positions enregistrées {nœud: (x, y)}, ou None si le fichier n'existe pas.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {node: tuple(p) for node, p in json.load(f).items()}
+    except (OSError, ValueError):
+        return None
+
+
+def save_layout(path, pos):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    write_json_atomic(path, {str(node): [float(x), float(y)] for node, (x, y) in pos.items()})
@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+class ExtractionCache:
+    """
+    Cache disque (SQLite) des réponses validées du LLM d'extraction.
+
+    Chaque entrée est indexée par un hash SHA-256 de (modèle, température, prompt complet) :
+    le prompt contenant à la fois le gabarit et le texte du chunk, toute modification de l'un
+    ou de l'autre produit une nouvelle clé. Lorsque le nombre d'entrées dépasse `max_entries`,
+    les entrées les moins récemment utilisées sont supprimées.
+    """
+
+    def __init__(self, path, max_entries=50000):
+        dossier = os.path.dirname(path)
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Partagé entre les threads d'extraction, les accès sont sérialisés par le verrou
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model, prompt, temperature):
+        """
+        Calcule la clé de cache d'une requête d'extraction.
+        """
+        h = hashlib.sha256()
+        for part in (model, repr(float(temperature)), prompt):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def get(self, key):
+        """
+        Retourne la liste de dictionnaires stockée pour `key`, ou None si absente.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, model, items):
+        """
+        Enregistre une réponse validée (liste de dictionnaires) puis applique l'éviction.
+        """
+        now = time.time()
+        payload = json.dumps(items, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, payload, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, model, payload, now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (excess,)
+            )
+
+    def stats(self):
+        """
+        Retourne les statistiques de la session : succès, échecs, taux de succès et taille du cache.
+        """
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": size
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,263 @@
+import time
+import threading
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from telemetry import PERCENTILES
+
+# ===================== CONFIG =====================
+HEALTH_INTERVAL = 10.0  # secondes entre deux vérifications de l'état des serveurs
+HEALTH_TIMEOUT = 2.0
+MAX_FAILURES = 3        # échecs d'affilée avant de retirer un serveur de la rotation
+LATENCY_WINDOW = 1000   # dernières durées conservées par serveur
+
+
+def is_node_failure(error):
+    """
+    Indique si une erreur met en cause le serveur (connexion impossible, délai dépassé, erreur 5xx)
+    plutôt que la requête (erreur 4xx, réponse invalide), y compris lorsqu'elle est enveloppée.
+    """
+    while error is not None:
+        status = getattr(error, "status_code", None)
+        if status is not None:
+            return status >= 500
+        name = type(error).__name__
+        if isinstance(error, (ConnectionError, TimeoutError)) or "Connection" in name or "Timeout" in name:
+            return True
+        error = error.__cause__
+    return False
+
+
+class Endpoint:
+    """
+    Un serveur compatible OpenAI (Ollama, vLLM...) et ses clients, créés par le routeur.
+    """
+
+    def __init__(self, url, clients):
+        self.url = url
+        self.clients = clients
+        self.healthy = True
+        self.outstanding = 0
+        self.failures = 0
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def stats(self):
+        stats = {
+            "url": self.url, "healthy": self.healthy, "outstanding": self.outstanding,
+            "requests": self.requests, "errors": self.errors, "ejections": self.ejections
+        }
+        if self.latencies:
+            values = np.asarray(self.latencies)
+            for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                stats[f"p{p}_s"] = float(v)
+            stats["mean_s"] = float(values.mean())
+        return stats
+
+
+class LLMRouter:
+    """
+    Répartit les requêtes LLM entre plusieurs serveurs compatibles OpenAI.
+
+    Chaque requête va au serveur en service qui a le moins de requêtes en cours (à égalité, celui
+    qui en a reçu le moins). Un serveur est retiré de la rotation après `max_failures` échecs
+    d'affilée qui le mettent en cause (voir is_node_failure), ou dès qu'il ne répond plus à la
+    vérification périodique (GET <url>/models, toutes les `health_interval` secondes, dans un
+    thread) ; il y revient dès qu'il y répond à nouveau. Si aucun serveur n'est en service, tous
+    sont essayés plutôt que d'échouer sans tenter.
+
+    Args:
+        urls (list): URL de base des serveurs (ex. "http://localhost:11434/v1").
+        client_factory (callable): client_factory(url) -> clients d'un serveur (dict), créés une fois.
+        health_interval (float): Intervalle des vérifications (0 pour les désactiver).
+        max_failures (int): Échecs d'affilée avant retrait.
+    """
+
+    def __init__(self, urls, client_factory, health_interval=HEALTH_INTERVAL, max_failures=MAX_FAILURES):
+        if not urls:
+            raise ValueError("Aucun serveur LLM configuré")
+        self.endpoints = [Endpoint(url.rstrip("/"), client_factory(url.rstrip("/"))) for url in urls]
+        self.health_interval = health_interval
+        self.max_failures = max_failures
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.health_interval and self._thread is None:
+            self._thread = threading.Thread(target=self._run_health_checks, daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=HEALTH_TIMEOUT + 1)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- répartition ----------
+    def acquire(self):
+        """
+        Choisit le serveur de la prochaine requête et la compte comme en cours.
+        """
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.healthy] or self.endpoints
+            endpoint = min(candidates, key=lambda e: (e.outstanding, e.requests))
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def release(self, endpoint, seconds, error=None):
+        """
+        Termine une requête : durée enregistrée si elle a réussi, serveur retiré de la rotation
+        après trop d'échecs d'affilée.
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            if error is None:
+                endpoint.failures = 0
+                endpoint.latencies.append(seconds)
+                return
+            endpoint.errors += 1
+            if not is_node_failure(error):
+                return
+            endpoint.failures += 1
+            if endpoint.failures >= self.max_failures:
+                self._eject(endpoint, f"{endpoint.failures} échecs d'affilée ({error})")
+
+    @contextmanager
+    def endpoint(self):
+        """
+        Serveur à utiliser pour une requête (ou un flux) exécutée dans le bloc `with`.
+        """
+        endpoint = self.acquire()
+        debut = time.perf_counter()
+        error = None
+        try:
+            yield endpoint
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.release(endpoint, time.perf_counter() - debut, error)
+
+    def client(self, key):
+        """
+        Client qui s'utilise comme ceux d'un serveur (clients[key]) et envoie chaque appel au serveur choisi.
+        """
+        return RoutedClient(self, key)
+
+    # ---------- état des serveurs ----------
+    def _eject(self, endpoint, reason):
+        if endpoint.healthy:
+            endpoint.healthy = False
+            endpoint.ejections += 1
+            print(f"Serveur LLM {endpoint.url} retiré de la rotation : {reason}")
+
+    def check_health(self):
+        """
+        Interroge chaque serveur (GET <url>/models) : retire ceux qui ne répondent pas,
+        remet en rotation ceux qui répondent de nouveau.
+        """
+        for endpoint in self.endpoints:
+            try:
+                with urllib.request.urlopen(f"{endpoint.url}/models", timeout=HEALTH_TIMEOUT) as response:
+                    ok = response.status == 200
+                reason = f"statut {response.status}"
+            except Exception as e:
+                ok, reason = False, str(e)
+            with self._lock:
+                if ok:
+                    endpoint.failures = 0
+                    if not endpoint.healthy:
+                        endpoint.healthy = True
+                        print(f"Serveur LLM {endpoint.url} de nouveau en service")
+                else:
+                    self._eject(endpoint, reason)
+
+    def _run_health_checks(self):
+        while not self._stop.wait(self.health_interval):
+            self.check_health()
+
+    def stats(self):
+        with self._lock:
+            return [e.stats() for e in self.endpoints]
+
+
+class RoutedClient:
+    """
+    Client d'un routeur : `router.client("openai").chat.completions.create(...)` appelle
+    `clients["openai"].chat.completions.create(...)` du serveur choisi pour cette requête.
+    """
+
+    def __init__(self, router, key, path=()):
+        self._router = router
+        self._key = key
+        self._path = path
+
+    def __getattr__(self, name):
+        return RoutedClient(self._router, self._key, self._path + (name,))
+
+    def __call__(self, *args, **kwargs):
+        with self._router.endpoint() as endpoint:
+            target = endpoint.clients[self._key]
+            for name in self._path:
+                target = getattr(target, name)
+            return target(*args, **kwargs)
+
+
+class ChatLLM:
+    """
+    LLM du Q&A (mêmes méthodes `stream` et `invoke` que les LLM LangChain) servi par les serveurs
+    du routeur, via l'API chat en flux. Le serveur reste compté comme occupé jusqu'à la fin du flux
+    (ou sa fermeture, qui ferme aussi la réponse HTTP).
+    """
+
+    def __init__(self, router, model, temperature=0, key="openai"):
+        self.router = router
+        self.model = model
+        self.temperature = temperature
+        self.key = key
+
+    def stream(self, prompt):
+        with self.router.endpoint() as endpoint:
+            chunks = endpoint.clients[self.key].chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=self.temperature,
+                stream=True
+            )
+            try:
+                for chunk in chunks:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                # Arrêt anticipé (client déconnecté) : la réponse HTTP est fermée tout de suite, ce qui
+                # interrompt la génération côté serveur et rend la connexion, avant de libérer le serveur
+                chunks.close()
+
+    def invoke(self, prompt):
+        return "".join(self.stream(prompt))
+
+
+def format_endpoint_stats(stats):
+    """
+    Tableau lisible de l'activité de chaque serveur (durées en millisecondes).
+    """
+    lignes = [f"{'serveur LLM':<36}{'état':>10}{'req.':>7}{'err':>5}{'retraits':>9}{'p50':>9}{'p90':>9}{'p99':>9}"]
+    for s in stats:
+        latences = "".join(f"{s[f'p{p}_s'] * 1000:>7.0f}ms" if f"p{p}_s" in s else f"{'-':>9}" for p in PERCENTILES)
+        lignes.append(f"{s['url']:<36}{'actif' if s['healthy'] else 'retiré':>10}{s['requests']:>7}"
+                      f"{s['errors']:>5}{s['ejections']:>9}{latences}")
+    return "\n".join(lignes)
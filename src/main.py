@@ -1,20 +1,39 @@
 import os
 import re
-import json
+import argparse
+import time
 import uuid
+import random
+import shutil
+import threading
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from itertools import chain
 from datetime import datetime
 
 from slugify import slugify
-from file_converter import convert
-from instructor import Mode
-import instructor
-from pydantic import BaseModel, Field
+from file_converter import iter_segments
+from llm_cache import ExtractionCache
+from run_journal import RunJournal, chunks_fingerprint, write_json_atomic
+from graph_binary import binary_path, write_graph_binary
+from graph_store import GraphStore
+from prefilter import prefilter_chunks
+from packing import TokenCounter, pack_chunks
+from constrained import ConstrainedExtractor
+from llm_router import ChatLLM, LLMRouter, format_endpoint_stats
+from name_matcher import NameMatcher
+from entity_resolution import resolve_entities
+from embedding_store import BatchedEmbeddings
+from qa import QAEngine, format_timings
+from telemetry import format_summary, record, span, tracer
+from bm25_index import BM25Index, fetch_documents
+from indexing import check_compatible, file_sha256, read_manifest, sync_chunks, write_manifest
+from pydantic import BaseModel, Field, PrivateAttr
 from typing import List, Optional
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_community.llms import Ollama
-from langchain_community.vectorstores import Chroma
+# Les bibliothèques lourdes (langchain, sentence-transformers, chromadb, openai, instructor)
+# ne sont importées qu'au premier usage : afficher l'aide ou le menu reste instantané.
 
 # ===================== CONFIG =====================
 FICHIER_LIVRE = "../livres/candide.epub"
@@ -22,9 +41,53 @@ TITRE = "Candide"
 AUTEUR = "Voltaire"
 CHROMA_DIR = "chroma_db"
 RELATIONS_DIR = "relations"
+RUNS_DIR = "runs"  # journaux d'extraction (reprise avec --resume)
+GRAPH_STORE_PATH = "graph.sqlite"  # base de tous les graphes extraits (voir graph_store.py)
 
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+CHUNK_SIZE = 2000
+CHUNK_OVERLAP = 200
+SEPARATORS = ["\n\n", "\n", ".", "!", "?"]
+# Cache des vecteurs partagé entre livres et exécutions, indexé par hash de chunk
+EMBEDDING_CACHE_DIR = os.path.join("cache", "embeddings", EMBEDDING_MODEL)
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_THREADS = os.cpu_count()
+SPLIT_BUFFER_SIZE = 50000  # caractères découpés à la fois (mémoire bornée sur les gros livres)
+INDEX_BATCH_SIZE = 256     # chunks ajoutés à Chroma par appel
 OLLAMA_MODEL = "llama3:8b"  # ou "llama3", "phi3", etc.
+# Serveurs compatibles OpenAI (Ollama, vLLM...) : avec plusieurs URL, extraction et Q&A sont
+# répartis entre eux (voir llm_router.py). Modifiable avec --llm-urls.
+OLLAMA_BASE_URLS = ["http://localhost:11434/v1"]
+
+# Extraction concurrente : requêtes simultanées par serveur, à aligner sur OLLAMA_NUM_PARALLEL
+MAX_CONCURRENT_REQUESTS = 4
+MAX_RETRIES = 3
+RETRY_BACKOFF = 2.0  # secondes, doublé à chaque nouvelle tentative
+LLM_TEMPERATURE = 0
+# "schema" : le schéma JSON des personnages contraint la génération (voir constrained.py), avec repli
+# sur instructor si le modèle ou le serveur ne le prend pas en charge ; "instructor" : mode JSON seul
+EXTRACTION_BACKEND = "schema"
+TOKENS_PER_CHARACTER = 100  # tokens de réponse prévus par personnage (nom, aliases, relations)
+
+# Cache disque des réponses d'extraction
+CACHE_PATH = os.path.join("cache", "extraction_cache.sqlite")
+CACHE_MAX_ENTRIES = 50000
+
+SNAPSHOT_INTERVAL = 5  # écrit un JSON partiel tous les N lots fusionnés
+
+# Regroupement des chunks consécutifs en prompts qui remplissent la fenêtre de contexte du modèle.
+# CONTEXT_WINDOW doit correspondre au num_ctx du modèle côté Ollama (ex. OLLAMA_CONTEXT_LENGTH=8192).
+PACK_CHUNKS = True
+CONTEXT_WINDOW = 8192
+PACK_FILL = 0.7  # part de la fenêtre occupée par le prompt, le reste étant laissé à la réponse
+TOKENIZER_NAME = "NousResearch/Meta-Llama-3-8B"  # tokenizer du modèle (Hub Hugging Face)
+MAX_CHARACTERS_PER_CHUNK = 8
+
+# Mode livre complet : un chunk n'est envoyé au LLM que s'il contient au moins N noms propres candidats
+PREFILTER_MIN_NAMES = 2
+
+# Résolution finale des entités : compare aussi les noms par embeddings (en plus des caractères)
+ENTITY_EMBEDDINGS = True
 
 # ===================== SCHÉMAS PYDANTIC =====================
 class Relation(BaseModel):
@@ -39,48 +102,257 @@ class Character(BaseModel):
     aliases: List[str] = Field(default_factory=list)
     relations: List[Relation] = Field(default_factory=list)
 
+    # Clés (cible normalisée, type) des relations connues, pour un dédoublonnage en O(1)
+    _relation_keys: Optional[set] = PrivateAttr(default=None)
+
+    def relation_keys(self) -> set:
+        if self._relation_keys is None:
+            self._relation_keys = {(r.target_name.lower(), r.type) for r in self.relations}
+        return self._relation_keys
+
 # ===================== INITIALISATION =====================
-embeddings = SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
-slug = slugify(TITRE)
-db_path = os.path.join(CHROMA_DIR, slug)
-os.makedirs(db_path, exist_ok=True)
-os.makedirs(RELATIONS_DIR, exist_ok=True)
-
-# --- Indexation ---
-if not os.listdir(db_path):
-    print(f"Indexation du livre '{TITRE}'...")
-    texte = convert(FICHIER_LIVRE)
-    texte = f"Titre: {TITRE}\nAuteur: {AUTEUR}\n\n{texte}"
-    texte = texte.replace("\n\n", "\n").replace("\r", "")
+# Le modèle n'est chargé qu'au premier calcul : ouvrir une base Chroma existante
+# (ou lister ses documents) ne nécessite pas de charger sentence-transformers.
+embeddings = BatchedEmbeddings(
+    EMBEDDING_MODEL,
+    cache_dir=EMBEDDING_CACHE_DIR,
+    batch_size=EMBEDDING_BATCH_SIZE,
+    threads=EMBEDDING_THREADS
+)
+
+def split_book(fichier, titre, auteur):
+    """
+    Convertit un livre et le découpe en chunks, en flux et dans l'ordre de lecture.
+
+    Génère des dictionnaires {"text": ..., "metadata": ...} dont les métadonnées indiquent le
+    chapitre, les pages (pdf) ou la section (epub) et la position du chunk dans le livre.
+    Seul un tampon d'environ SPLIT_BUFFER_SIZE caractères est gardé en mémoire.
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
 
     splitter = RecursiveCharacterTextSplitter(
-        chunk_size=2000,
-        chunk_overlap=200,
-        separators=["\n\n", "\n", ".", "!", "?"]
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=SEPARATORS,
+        add_start_index=True
     )
-    chunks = splitter.split_text(texte)
-    docs = [{"text": c, "metadata": {"titre": TITRE, "auteur": AUTEUR}} for c in chunks]
+    entete = {"text": f"Titre: {titre}\nAuteur: {auteur}\n\n", "metadata": {"chapitre": 0}}
+
+    tampon = []        # morceaux de texte en attente de découpage
+    tampon_taille = 0
+    tampon_debut = 0   # position du tampon dans le livre
+    debuts = []        # position de début de chaque segment encore dans le tampon
+    segments_meta = []
+
+    def metadata_at(debut, fin):
+        premier = segments_meta[max(bisect_right(debuts, debut) - 1, 0)]
+        dernier = segments_meta[max(bisect_right(debuts, fin - 1) - 1, 0)]
+        meta = {"titre": titre, "auteur": auteur, "chapitre": premier["chapitre"], "position": debut}
+        if "page_debut" in premier:
+            meta["page_debut"] = premier["page_debut"]
+            meta["page_fin"] = dernier["page_fin"]
+        if "section" in premier:
+            meta["section"] = premier["section"]
+        return meta
+
+    def decouper(final):
+        nonlocal tampon, tampon_taille, tampon_debut
+        texte = "".join(tampon)
+        docs = splitter.create_documents([texte])
+        # Le dernier chunk peut être coupé par la fin du tampon : il est redécoupé avec la suite
+        garder = docs if final else docs[:-1]
+        for doc in garder:
+            debut = tampon_debut + doc.metadata["start_index"]
+            yield {"text": doc.page_content, "metadata": metadata_at(debut, debut + len(doc.page_content))}
+        if not final and docs:
+            reste = docs[-1].metadata["start_index"]
+            tampon = [texte[reste:]]
+            tampon_taille = len(texte) - reste
+            tampon_debut += reste
+            # Oublie les segments entièrement consommés
+            premier = max(bisect_right(debuts, tampon_debut) - 1, 0)
+            del debuts[:premier], segments_meta[:premier]
+
+    segments = chain([entete], iter_segments(fichier))
+    for segment in segments:
+        texte = segment["text"].replace("\n\n", "\n").replace("\r", "")
+        debuts.append(tampon_debut + tampon_taille)
+        segments_meta.append(segment["metadata"])
+        tampon.append(texte)
+        tampon_taille += len(texte)
+        if tampon_taille >= SPLIT_BUFFER_SIZE:
+            yield from decouper(final=False)
+    if tampon:
+        yield from decouper(final=True)
+
+def index_params():
+    """
+    Paramètres qui déterminent le contenu d'une base : une base construite avec d'autres
+    paramètres ne peut pas être mise à jour incrémentalement.
+    """
+    return {
+        "embedding_model": EMBEDDING_MODEL,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "separators": SEPARATORS
+    }
+
+def load_vectordb(fichier, titre, auteur, embeddings, reindex=False):
+    """
+    Ouvre la base Chroma d'un livre, en la mettant à jour si le fichier du livre a changé.
+
+    Les chunks sont identifiés par le hash de leur contenu : seuls les nouveaux chunks sont
+    vectorisés, les chunks disparus sont supprimés. Lève IncompatibleIndexError si la base a été
+    construite avec un autre modèle d'embeddings ou un autre découpage, sauf avec `reindex=True`
+    qui reconstruit la base.
+    """
+    from langchain_community.vectorstores import Chroma
+
+    slug = slugify(titre)
+    db_path = os.path.join(CHROMA_DIR, slug)
+    if reindex and os.path.exists(db_path):
+        shutil.rmtree(db_path)
+    os.makedirs(db_path, exist_ok=True)
+
+    params = index_params()
+    manifest = read_manifest(db_path)
+    check_compatible(manifest, params)
 
     vectordb = Chroma(persist_directory=db_path, embedding_function=embeddings)
-    vectordb.add_texts([d["text"] for d in docs], metadatas=[d["metadata"] for d in docs])
-    vectordb.persist()
-    print("Indexation terminée.")
-else:
-    print(f"Base '{slug}' trouvée.")
-    vectordb = Chroma(persist_directory=db_path, embedding_function=embeddings)
+    source_sha256 = file_sha256(fichier) if os.path.exists(fichier) else None
+    if manifest is not None and (source_sha256 is None or manifest["source_sha256"] == source_sha256):
+        print(f"Base '{slug}' trouvée.")
+        return vectordb
+
+    print(f"Indexation du livre '{titre}'...")
+    embeddings.reset_stats()
+    # L'index lexical (BM25) est reconstruit au passage, à partir du même flux de chunks
+    bm25 = BM25Index()
+    with span("index", titre=titre) as attrs:
+        stats = sync_chunks(vectordb, bm25.feed(split_book(fichier, titre, auteur)), batch_size=INDEX_BATCH_SIZE)
+        vectordb.persist()
+        bm25.save(db_path)
+        attrs["chunks"] = stats["ajoutes"] + stats["inchanges"]
+        attrs["encoded"] = embeddings.stats["encoded"]
+    write_manifest(db_path, params, source_sha256, stats["ajoutes"] + stats["inchanges"])
+    print(f"Indexation terminée : {stats['ajoutes']} chunks ajoutés, {stats['supprimes']} supprimés, "
+          f"{stats['inchanges']} inchangés (dont {stats['deplaces']} déplacés).")
+    print(f"Embeddings : {embeddings.stats['encoded']} chunks vectorisés ({embeddings.throughput():.1f} chunks/s), "
+          f"{embeddings.stats['cache_hits']} relus dans le cache.")
+    return vectordb
+
+def load_lexical_index(titre, vectordb):
+    """
+    Charge l'index BM25 d'un livre, en le reconstruisant depuis Chroma s'il est absent.
+    """
+    db_path = os.path.join(CHROMA_DIR, slugify(titre))
+    bm25 = BM25Index.load(db_path)
+    if bm25 is None:
+        print("Construction de l'index lexical (BM25)...")
+        bm25 = BM25Index.from_vectordb(vectordb)
+        bm25.save(db_path)
+    return bm25
+
+def chunks_mentioning(vectordb, bm25, names):
+    """
+    Retourne, dans l'ordre du livre, le texte de tous les chunks qui mentionnent au moins un des noms.
+    """
+    ids = sorted({i for name in names for i in bm25.mentions(name)},
+                 key=lambda i: bm25.positions.get(i, 0))
+    docs = fetch_documents(vectordb, ids)
+    return [docs[i].page_content for i in ids if i in docs]
 
 # ===================== LLM =====================
-from openai import OpenAI
-import instructor
-from langchain_community.llms import Ollama
+_llm_lock = threading.RLock()
+_llm_router = None
+_llm_instructor = None
+_llm_extractor = None
+_llm = None
+_token_counter = TokenCounter(TOKENIZER_NAME)
+_llm_call = threading.local()  # mesure de l'appel LLM en cours dans ce thread (voir request_characters)
+
+def _on_completion(response):
+    attrs = getattr(_llm_call, "attrs", None)
+    if attrs is None:
+        return
+    attrs["completions"] += 1
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        attrs["prompt_tokens"] += usage.prompt_tokens or 0
+        attrs["completion_tokens"] += usage.completion_tokens or 0
+
+def _make_llm_clients(base_url):
+    """
+    Clients d'un serveur LLM : OpenAI (sorties contraintes, Q&A) et instructor (mode JSON).
+    """
+    import httpx
+    import instructor
+    from openai import OpenAI
+
+    # Connexions HTTP réutilisées entre les requêtes concurrentes (keep-alive)
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=MAX_CONCURRENT_REQUESTS,
+            max_keepalive_connections=MAX_CONCURRENT_REQUESTS
+        ),
+        timeout=httpx.Timeout(600.0, connect=10.0)
+    )
+    # Les nouvelles tentatives sont gérées par request_characters (backoff), sur le serveur le moins chargé
+    client = OpenAI(base_url=base_url, api_key="ollama", http_client=http_client, max_retries=0)
+    llm_instructor = instructor.from_openai(client, mode=instructor.Mode.JSON)
+    # Chaque réponse brute (y compris celles rejetées par la validation) alimente la mesure
+    # de l'appel en cours : les hooks sont exécutés dans le thread qui a fait l'appel
+    if hasattr(llm_instructor, "on"):
+        llm_instructor.on("completion:response", _on_completion)
+    return {"openai": client, "instructor": llm_instructor}
+
+def get_llm_router():
+    """
+    Retourne le routeur des serveurs LLM (OLLAMA_BASE_URLS), créé au premier appel.
+    """
+    global _llm_router
+    with _llm_lock:
+        if _llm_router is None:
+            _llm_router = LLMRouter(OLLAMA_BASE_URLS, _make_llm_clients).start()
+    return _llm_router
 
-# Ollama via OpenAI API
-client = OpenAI(base_url="http://localhost:11434/v1", api_key="ollama")
-llm_instructor = instructor.from_openai(client, mode=Mode.JSON)
+def get_llm_instructor():
+    """
+    Retourne le client instructor, dont chaque appel est envoyé au serveur le moins chargé.
+    """
+    global _llm_instructor
+    with _llm_lock:
+        if _llm_instructor is None:
+            _llm_instructor = get_llm_router().client("instructor")
+    return _llm_instructor
 
+def get_llm_extractor():
+    """
+    Retourne le client d'extraction selon EXTRACTION_BACKEND : sortie contrainte par le schéma
+    (ConstrainedExtractor, avec repli sur instructor) ou client instructor seul.
+    """
+    global _llm_extractor
+    llm_instructor = get_llm_instructor()
+    if EXTRACTION_BACKEND != "schema":
+        return llm_instructor
+    with _llm_lock:
+        if _llm_extractor is None:
+            _llm_extractor = ConstrainedExtractor(
+                get_llm_router().client("openai"), OLLAMA_MODEL, Character,
+                fallback=lambda prompt, max_tokens: instructor_characters(llm_instructor, prompt, max_tokens),
+                temperature=LLM_TEMPERATURE
+            )
+    return _llm_extractor
 
-# Pour Q&A (garde LangChain)
-llm = Ollama(model=OLLAMA_MODEL, temperature=0)
+def get_qa_llm():
+    """
+    Retourne le LLM utilisé pour le Q&A (réponses en flux, réparties entre les serveurs), créé au premier appel.
+    """
+    global _llm
+    with _llm_lock:
+        if _llm is None:
+            _llm = ChatLLM(get_llm_router(), OLLAMA_MODEL, temperature=0)
+    return _llm
 
 # ===================== FONCTIONS =====================
 def is_name_in_text(name: str, text: str) -> bool:
@@ -94,30 +366,18 @@ def is_name_in_text(name: str, text: str) -> bool:
     pattern = re.escape(name.strip())
     return bool(re.search(rf'\b{pattern}\b', text, re.IGNORECASE))
 
-def extract_characters_progressively(vectordb, llm_instructor, titre, auteur, save_path):
-    slug = slugify(titre)
-    timestamp = datetime.now().strftime("%d%m%Y%H%M")
-    out_file = os.path.join(save_path, f"{slug}_{timestamp}.json")
-
-    all_characters = {}
-    character_names = {}
-
-    query = "personnages principaux relations famille amis ennemis couple travail braque sophie greg"
-    docs = vectordb.similarity_search(query, k=40)
-
-    print(f"Début de l'extraction sur {len(docs)} chunks...")
-
-    for i, doc in enumerate(docs, 1):
-        context = doc.page_content.strip()
-
-        prompt = f"""
+def build_extraction_prompt(context: str, max_characters: int = MAX_CHARACTERS_PER_CHUNK) -> str:
+    """
+    Construit le prompt d'extraction des personnages pour un chunk (ou un lot de chunks).
+    """
+    return f"""
         EXTRACTION ULTRA-STRICTE DES PERSONNAGES — ZÉRO HALLUCINATION
 
         RÈGLES ABSOLUES :
         1. Tu NE DOIS EXTRAIRE QUE les noms qui APPARAISSENT MOT POUR MOT dans le texte.
         2. Si un nom n'est PAS écrit EXACTEMENT (même casse différente), IGNORE-LE.
         3. Tu NE DOIS RIEN INVENTER, NI DÉDUIRE, NI GÉNÉRALISER.
-        4. Tu NE DOIS PAS proposer plus de 8 personnages par chunk.
+        4. Tu NE DOIS PAS proposer plus de {max_characters} personnages.
         5. Si tu doutes → IGNORE.
         6. Si aucun personnage clair → retourne []
 
@@ -134,130 +394,417 @@ def extract_characters_progressively(vectordb, llm_instructor, titre, auteur, sa
         \"\"\"{context}\"\"\"
         """
 
-        try:
-            new_chars: List[Character] = llm_instructor.messages.create(
-                model=OLLAMA_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                response_model=List[Character],
-                max_tokens=2048,
-                temperature=0
-            )
+def max_output_tokens(max_characters: int) -> int:
+    """
+    Longueur maximale de la réponse pour `max_characters` personnages, dans la limite de la part
+    de la fenêtre de contexte laissée libre par le prompt.
+    """
+    return min(32 + TOKENS_PER_CHARACTER * max_characters, CONTEXT_WINDOW - int(CONTEXT_WINDOW * PACK_FILL))
 
-            # === FUSION ===
-            for char in new_chars:
-                # VALIDER QUE LE NOM PRINCIPAL EXISTE DANS LE TEXTE
-                if not is_name_in_text(char.name, context):
-                    continue  # IGNORER CE PERSONNAGE
-
-                norm_name = char.name.strip().lower()
-                existing_id = character_names.get(norm_name)
-
-                if existing_id:
-                    existing = all_characters[existing_id]
-                    # Valider chaque relation
-                    valid_relations = []
-                    for rel in char.relations:
-                        if is_name_in_text(rel.target_name, context):
-                            if not any(r.target_name.lower() == rel.target_name.lower() and r.type == rel.type for r in existing.relations):
-                                valid_relations.append(rel)
-                    existing.relations.extend(valid_relations)
-                    existing.aliases = list(set(existing.aliases + char.aliases))
-                else:
-                    # Valider les relations du nouveau personnage
-                    valid_relations = [
-                        rel for rel in char.relations
-                        if is_name_in_text(rel.target_name, context)
-                    ]
-                    char.relations = valid_relations
-                    if not char.relations and len(char.aliases) == 0 and not is_name_in_text(char.name, context):
-                        continue  # Ignorer les personnages isolés sans preuve
-
-                    new_id = char.id
-                    all_characters[new_id] = char
-                    character_names[norm_name] = new_id
-                    for alias in char.aliases:
-                        if is_name_in_text(alias, context):
-                            character_names[alias.strip().lower()] = new_id
-
-            print(f"Chunk {i}/{len(docs)} → {len(all_characters)} personnages")
+def pack_max_characters(n_chunks: int) -> int:
+    """
+    Nombre maximal de personnages demandés pour un lot de `n_chunks` chunks (MAX_CHARACTERS_PER_CHUNK
+    par chunk), borné pour que la réponse tienne dans max_output_tokens.
+    """
+    room = (CONTEXT_WINDOW - int(CONTEXT_WINDOW * PACK_FILL) - 32) // TOKENS_PER_CHARACTER
+    return max(1, min(MAX_CHARACTERS_PER_CHUNK * n_chunks, room))
 
+def instructor_characters(llm_instructor, prompt: str, max_tokens: int) -> List[Character]:
+    """
+    Extraction par instructor (mode JSON) : la réponse est validée après coup et redemandée
+    tant qu'elle n'est pas conforme.
+    """
+    return llm_instructor.messages.create(
+        model=OLLAMA_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        response_model=List[Character],
+        max_tokens=max_tokens,
+        temperature=LLM_TEMPERATURE
+    )
+
+def request_characters(llm, prompt: str, retries: int = MAX_RETRIES, backoff: float = RETRY_BACKOFF,
+                       max_characters: int = MAX_CHARACTERS_PER_CHUNK) -> List[Character]:
+    """
+    Envoie un prompt d'extraction au LLM (ConstrainedExtractor ou client instructor), avec nouvelles
+    tentatives et backoff exponentiel. La réponse est limitée à max_output_tokens(max_characters).
+    Lève la dernière exception si toutes les tentatives échouent.
+    """
+    max_tokens = max_output_tokens(max_characters)
+    for attempt in range(retries + 1):
+        try:
+            with span("llm", model=OLLAMA_MODEL, attempt=attempt + 1, prompt_chars=len(prompt),
+                      prompt_tokens=0, completion_tokens=0, completions=0) as attrs:
+                _llm_call.attrs = attrs
+                try:
+                    if isinstance(llm, ConstrainedExtractor):
+                        return llm.extract(prompt, max_characters, max_tokens, attrs)
+                    return instructor_characters(llm, prompt, max_tokens)
+                finally:
+                    _llm_call.attrs = None
+                    # Générations refaites : validations instructor échouées, réponse contrainte inexploitable
+                    attrs["validation_retries"] = max(attrs["completions"] - 1, 0)
         except Exception as e:
-            print(f"Erreur chunk {i} : {e}")
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt) + random.uniform(0, backoff / 2)
+            print(f"Tentative {attempt + 1}/{retries + 1} échouée ({e}) → nouvel essai dans {delay:.1f}s")
+            time.sleep(delay)
+
+def fetch_characters(llm, prompt: str, cache: Optional[ExtractionCache] = None,
+                     max_characters: int = MAX_CHARACTERS_PER_CHUNK) -> List[Character]:
+    """
+    Retourne les personnages extraits pour un prompt, depuis le cache si possible.
+    Les réponses obtenues du LLM sont enregistrées dans le cache une fois validées.
+    """
+    key = None
+    if cache is not None:
+        key = ExtractionCache.make_key(OLLAMA_MODEL, prompt, LLM_TEMPERATURE)
+        cached = cache.get(key)
+        if cached is not None:
+            record("llm_cache_hit", 0.0, prompt_chars=len(prompt))
+            return [Character.model_validate(c) for c in cached]
+
+    new_chars = request_characters(llm, prompt, max_characters=max_characters)
+    if cache is not None:
+        cache.put(key, OLLAMA_MODEL, [c.model_dump() for c in new_chars])
+    return new_chars
+
+def merge_characters(new_chars: List[Character], context: str, all_characters: dict, character_names: dict):
+    """
+    Fusionne les personnages extraits d'un chunk dans l'état global.
+    Seuls les noms et relations présents littéralement dans le chunk sont retenus.
+    """
+    # Tous les noms du chunk (personnages, aliases, cibles) sont cherchés en une seule passe
+    matcher = NameMatcher(
+        [c.name for c in new_chars]
+        + [a for c in new_chars for a in c.aliases]
+        + [r.target_name for c in new_chars for r in c.relations]
+    )
+    found = matcher.find_all(context)
+
+    def in_text(name):
+        return name.strip().lower() in found
+
+    for char in new_chars:
+        # VALIDER QUE LE NOM PRINCIPAL EXISTE DANS LE TEXTE
+        if not in_text(char.name):
+            continue  # IGNORER CE PERSONNAGE
+
+        norm_name = char.name.strip().lower()
+        existing_id = character_names.get(norm_name)
+
+        if existing_id:
+            existing = all_characters[existing_id]
+            keys = existing.relation_keys()
+            # Valider chaque relation
+            for rel in char.relations:
+                key = (rel.target_name.lower(), rel.type)
+                if in_text(rel.target_name) and key not in keys:
+                    existing.relations.append(rel)
+                    keys.add(key)
+            existing.aliases = list(set(existing.aliases + char.aliases))
+        else:
+            # Valider les relations du nouveau personnage
+            valid_relations = [
+                rel for rel in char.relations
+                if in_text(rel.target_name)
+            ]
+            char.relations = valid_relations
+            if not char.relations and len(char.aliases) == 0 and not in_text(char.name):
+                continue  # Ignorer les personnages isolés sans preuve
+
+            new_id = char.id
+            all_characters[new_id] = char
+            character_names[norm_name] = new_id
+            for alias in char.aliases:
+                if in_text(alias):
+                    character_names[alias.strip().lower()] = new_id
+
+def export_characters(all_characters: dict, character_names: dict, embed=None) -> list:
+    """
+    Construit la liste JSON exportée à partir de l'état de fusion, sans le modifier.
+
+    Les personnages désignant la même entité sous des noms différents ("M. le baron",
+    "le baron de Thunder-ten-tronckh") sont d'abord regroupés par resolve_entities : chaque
+    groupe devient un seul personnage, d'id déterministe, dont les autres noms deviennent des
+    aliases. Les target_id sont résolus vers ces groupes (variantes de noms comprises), les
+    personnages sans relations sont ignorés, ainsi que les relations dont la cible est inconnue
+    et celles d'un groupe vers lui-même.
+    """
+    resolution = resolve_entities(
+        all_characters,
+        [r.target_name for c in all_characters.values() for r in c.relations],
+        embed=embed
+    )
+
+    def resolve_target(r):
+        if r.target_id and r.target_id in resolution.canonical:
+            return resolution.canonical[r.target_id]
+        return resolution.lookup(r.target_name) or resolution.canonical.get(
+            character_names.get(r.target_name.strip().lower())
+        )
+
+    result = []
+    for gid, members in resolution.members.items():
+        chars = [all_characters[m] for m in members]
+        if not any(c.relations for c in chars):
             continue
+        relations, seen = [], set()
+        for c in chars:
+            for r in c.relations:
+                target_id = resolve_target(r)
+                if target_id and target_id != gid and (target_id, r.type) not in seen:
+                    seen.add((target_id, r.type))
+                    relations.append({
+                        "id": target_id,
+                        "type_de_la_relation": r.type,
+                        "evidence": r.evidence
+                    })
+        name = all_characters[resolution.representative[gid]].name
+        aliases = [a for a in dict.fromkeys([c.name for c in chars] + [a for c in chars for a in c.aliases]) if a != name]
+        result.append({
+            "id": gid,
+            "nom_complet": name,
+            "aliases": aliases,
+            "relations": relations
+        })
+    return result
+
+def pack_contexts(contexts):
+    """
+    Regroupe les chunks en lots (voir packing.py) dont le prompt occupe au plus PACK_FILL de la
+    fenêtre de contexte, ou un lot par chunk si PACK_CHUNKS est désactivé.
+    """
+    if not PACK_CHUNKS:
+        return [{"chunks": [i], "text": c, "tokens": None} for i, c in enumerate(contexts)]
+    preamble = _token_counter.count(build_extraction_prompt(""))
+    budget = int(CONTEXT_WINDOW * PACK_FILL) - preamble
+    return pack_chunks(contexts, _token_counter.count_many, budget, max_overlap=2 * CHUNK_OVERLAP)
 
-    # === RÉSOLUTION FINALE DES target_id ===
-    print("Résolution finale des relations...")
-    for char in all_characters.values():
-        for rel in char.relations:
-            if rel.target_id is None:
-                target_norm = rel.target_name.strip().lower()
-                target_id = character_names.get(target_norm)
-                if target_id:
-                    rel.target_id = target_id
-
-    # === SUPPRESSION DES PERSONNAGES SANS RELATIONS ===
-    filtered_characters = {
-        cid: c for cid, c in all_characters.items() if len(c.relations) > 0
-    }
+def store_run(titre, auteur, result, out_file, created_at=None):
+    """
+    Enregistre une extraction dans la base commune à tous les livres (GRAPH_STORE_PATH) :
+    requêtes croisées, chargement progressif dans graph_viewer.
+    """
+    with span("graph_store", characters=len(result)):
+        with GraphStore(GRAPH_STORE_PATH) as store:
+            store.add_run(titre, auteur, result, out_file=out_file, model=OLLAMA_MODEL, created_at=created_at)
 
-    print(f"Personnages initiaux : {len(all_characters)} → après filtrage : {len(filtered_characters)}")
+def extract_characters_progressively(vectordb, llm, titre, auteur, save_path, max_workers=None, cache=None, resume=False, chunks=None, pool=None):
+    """
+    Extrait les personnages et leurs relations puis les sauvegarde en JSON
+    (et au format binaire .cgraph, voir graph_binary.py).
+
+    Par défaut, seuls les chunks retournés par une recherche sémantique sont analysés.
+    Les chunks consécutifs sont regroupés en lots (un appel LLM par lot, voir pack_contexts) ;
+    les personnages extraits d'un lot sont ensuite fusionnés chunk par chunk, chacun ne retenant
+    que les noms et relations qu'il cite lui-même.
+    Si `chunks` est fourni (mode livre complet), tous les chunks du livre passent par le
+    préfiltre local et seuls ceux contenant assez de noms propres candidats sont envoyés au LLM.
+    Si `pool` est fourni, les appels LLM y sont soumis (file partagée entre plusieurs livres)
+    au lieu d'un pool dédié de `max_workers` threads (par défaut MAX_CONCURRENT_REQUESTS par serveur).
+    """
+    if max_workers is None:
+        max_workers = MAX_CONCURRENT_REQUESTS * len(OLLAMA_BASE_URLS)
+    slug = slugify(titre)
+    timestamp = datetime.now().strftime("%d%m%Y%H%M")
 
-    # === EXPORT FINAL ===
-    result = [
-        {
-            "id": cid,
-            "nom_complet": c.name,
-            "aliases": c.aliases,
-            "relations": [
-                {
-                    "id": r.target_id,
-                    "type_de_la_relation": r.type,
-                    "evidence": r.evidence
-                }
-                for r in c.relations
-                if r.target_id
-            ]
-        }
-        for cid, c in filtered_characters.items()
-    ]
+    all_characters = {}
+    character_names = {}
 
-    with open(out_file, "w", encoding="utf-8") as f:
-        json.dump(result, f, indent=2, ensure_ascii=False)
+    if chunks is None:
+        query = "personnages principaux relations famille amis ennemis couple travail braque sophie greg"
+        with span("retrieval", k=40) as attrs:
+            docs = vectordb.similarity_search(query, k=40)
+            attrs["results"] = len(docs)
+        # Ordre de lecture : les chunks voisins dans le livre peuvent partager un lot
+        docs = sorted(docs, key=lambda doc: doc.metadata.get("position", 0))
+        contexts = [doc.page_content.strip() for doc in docs]
+    else:
+        docs, total = prefilter_chunks((c.strip() for c in chunks), min_names=PREFILTER_MIN_NAMES)
+        contexts = docs
+        print(f"Préfiltre : {len(docs)}/{total} chunks retenus → {total - len(docs)} appels LLM évités")
+
+    with span("pack", chunks=len(contexts)) as attrs:
+        packs = pack_contexts(contexts)
+        attrs["results"] = len(packs)
+    if len(packs) < len(contexts):
+        print(f"Regroupement : {len(contexts)} chunks → {len(packs)} appels LLM")
+
+    # === JOURNAL D'EXÉCUTION (reprise après interruption) ===
+    journal = RunJournal.open(
+        os.path.join(RUNS_DIR, f"{slug}.jsonl"),
+        {
+            "titre": titre,
+            "auteur": auteur,
+            "model": OLLAMA_MODEL,
+            "fingerprint": chunks_fingerprint([p["text"] for p in packs]),
+            "n_chunks": len(packs),
+            "out_file": os.path.join(save_path, f"{slug}_{timestamp}.json"),
+            "started_at": datetime.now().isoformat()
+        },
+        resume=resume
+    )
+    out_file = journal.header["out_file"]
 
-    print(f"Extraction terminée : {len(filtered_characters)} personnages sauvegardés → {out_file}")
+    # Les réponses arrivent dans le désordre : elles sont mises en attente puis
+    # fusionnées dans l'ordre des lots, pour un résultat identique au mode séquentiel.
+    pending = {
+        i: [Character.model_validate(c) for c in chars]
+        for i, chars in journal.done.items()
+    }
+    next_pack = 1
+    last_snapshot = 0
+
+    def merge_ready():
+        nonlocal next_pack, last_snapshot
+        while next_pack in pending:
+            new_chars = pending.pop(next_pack)
+            if new_chars is not None:
+                pack = packs[next_pack - 1]
+                try:
+                    for j in pack["chunks"]:
+                        with span("merge", chunk=j + 1, chunk_chars=len(contexts[j])):
+                            # Copies : merge_characters modifie les personnages qu'il retient
+                            merge_characters([c.model_copy(deep=True) for c in new_chars], contexts[j],
+                                             all_characters, character_names)
+                    print(f"Lot {next_pack}/{len(packs)} ({len(pack['chunks'])} chunks) → "
+                          f"{len(all_characters)} personnages")
+                except Exception as e:
+                    print(f"Erreur lot {next_pack} : {e}")
+            next_pack += 1
+        # Instantané partiel lisible par graph_viewer pendant l'exécution
+        if next_pack - 1 - last_snapshot >= SNAPSHOT_INTERVAL:
+            last_snapshot = next_pack - 1
+            with span("snapshot", chunk=last_snapshot):
+                write_json_atomic(out_file, export_characters(all_characters, character_names))
+
+    merge_ready()
+    todo = [i for i in range(1, len(packs) + 1) if i not in journal.done]
+    limits = {i: pack_max_characters(len(packs[i - 1]["chunks"])) for i in todo}
+    print(f"Début de l'extraction sur {len(todo)}/{len(packs)} lots ({len(contexts)} chunks)...")
+
+    try:
+        with (ThreadPoolExecutor(max_workers=max_workers) if pool is None else nullcontext(pool)) as executor:
+            futures = {
+                executor.submit(fetch_characters, llm, build_extraction_prompt(packs[i - 1]["text"], limits[i]),
+                                cache, limits[i]): i
+                for i in todo
+            }
+            try:
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        pending[i] = future.result()
+                        journal.record_chunk(i, [c.model_dump() for c in pending[i]])
+                    except Exception as e:
+                        print(f"Erreur lot {i} : {e}")
+                        journal.record_chunk(i, error=e)
+                        pending[i] = None
+                    merge_ready()
+            except KeyboardInterrupt:
+                for future in futures:
+                    future.cancel()
+                print(f"\nInterruption : {len(journal.done)}/{len(packs)} lots enregistrés. Relancez avec --resume pour reprendre.")
+                raise
+    except BaseException:
+        journal.close()
+        raise
+
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Cache LLM : {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%}), {stats['entries']} entrées")
+    if isinstance(llm, ConstrainedExtractor):
+        stats = dict(llm.stats)
+        print(f"Sortie contrainte : {stats['constrained']}/{stats['calls']} réponses conformes, "
+              f"{stats['invalid'] + stats['truncated']} refaites ({llm.retry_rate():.1%}), "
+              f"{stats['fallback']} via instructor")
+
+    # === RÉSOLUTION FINALE DES ENTITÉS ET DES target_id, EXPORT ===
+    print("Résolution finale des personnages et des relations...")
+    with span("export", characters=len(all_characters)) as attrs:
+        result = export_characters(all_characters, character_names,
+                                   embed=embeddings.embed_documents if ENTITY_EMBEDDINGS else None)
+        attrs["results"] = len(result)
+
+    print(f"Personnages initiaux : {len(all_characters)} → après filtrage : {len(result)}")
+
+    write_json_atomic(out_file, result)
+    # Export compact (chaînes internées + tableaux NumPy), lu en priorité par graph_viewer
+    write_graph_binary(binary_path(out_file), result)
+    store_run(titre, auteur, result, out_file, created_at=journal.header["started_at"])
+    journal.finish(out_file)
+
+    print(f"Extraction terminée : {len(result)} personnages sauvegardés → {out_file}")
     return out_file
 
-def local_qa(vectordb, llm, titre, auteur):
+def local_qa(vectordb, llm, titre, auteur, bm25=None):
     print(f"Q&A sur '{titre}' — tape 'exit' pour quitter")
+    engine = QAEngine(vectordb, embeddings, llm, k=5, bm25=bm25)
     while True:
         q = input("\nQuestion : ").strip()
         if q.lower() in {"exit", "quit"}:
             break
-        docs = vectordb.similarity_search(q, k=5)
-        context = "\n\n".join([d.page_content for d in docs])
-
-        prompt = f"""
-Réponds UNIQUEMENT à partir du contexte. Si tu ne sais pas, dis "Je ne sais pas".
 
-Contexte :
-{context}
-
-Question : {q}
-Réponse :
-"""
-        answer = llm.invoke(prompt)
-        print(f"\n{answer.strip()}\n" + "-" * 50)
+        timings = {}
+        print()
+        for token in engine.stream_answer(q, timings):
+            print(token, end="", flush=True)
+        print(f"\n{format_timings(timings)}\n" + "-" * 50)
 
 # ===================== MENU =====================
 if __name__ == "__main__":
-    print("\nChoisissez une option :")
-    print("1 - Générer le JSON des personnages")
-    print("2 - Lancer le Q&A interactif")
-    choice = input("Entrez 1 ou 2 : ").strip()
-
-    if choice == "1":
-        extract_characters_progressively(vectordb, llm_instructor, TITRE, AUTEUR, RELATIONS_DIR)
-    elif choice == "2":
-        local_qa(vectordb, llm, TITRE, AUTEUR)
-    else:
-        print("Option invalide.")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extraction des personnages et Q&A sur un livre.")
+    parser.add_argument("--resume", action="store_true",
+                        help="reprend la dernière extraction interrompue de ce livre")
+    parser.add_argument("--reindex", action="store_true",
+                        help="reconstruit entièrement la base Chroma du livre")
+    parser.add_argument("--personnages",
+                        help="noms séparés par des virgules : analyse tous les chunks qui les mentionnent")
+    parser.add_argument("--full", action="store_true",
+                        help="analyse tout le livre (avec préfiltre) au lieu des seuls chunks les plus pertinents")
+    parser.add_argument("--llm-urls",
+                        help="serveurs LLM compatibles OpenAI, séparés par des virgules (remplace OLLAMA_BASE_URLS)")
+    parser.add_argument("--trace", action="store_true",
+                        help=f"enregistre chaque opération mesurée dans {RUNS_DIR}/<livre>.trace.jsonl")
+    parser.add_argument("--profile", choices=["cprofile", "tracemalloc"],
+                        help="profile l'exécution (temps CPU par fonction ou allocations mémoire)")
+    args = parser.parse_args()
+    if args.llm_urls:
+        OLLAMA_BASE_URLS = [u.strip() for u in args.llm_urls.split(",") if u.strip()]
+
+    # Résumé des mesures (latences, tokens/s) affiché en fin d'exécution, même après une interruption
+    tracer.start(os.path.join(RUNS_DIR, f"{slugify(TITRE)}.trace.jsonl") if args.trace else None,
+                 profile=args.profile)
+    try:
+        os.makedirs(RELATIONS_DIR, exist_ok=True)
+        vectordb = load_vectordb(FICHIER_LIVRE, TITRE, AUTEUR, embeddings, reindex=args.reindex)
+
+        print("\nChoisissez une option :")
+        print("1 - Générer le JSON des personnages")
+        print("2 - Lancer le Q&A interactif")
+        choice = input("Entrez 1 ou 2 : ").strip()
+
+        if choice == "1":
+            cache = ExtractionCache(CACHE_PATH, max_entries=CACHE_MAX_ENTRIES)
+            try:
+                chunks = None
+                if args.personnages:
+                    names = [n.strip() for n in args.personnages.split(",") if n.strip()]
+                    chunks = chunks_mentioning(vectordb, load_lexical_index(TITRE, vectordb), names)
+                elif args.full:
+                    chunks = (d["text"] for d in split_book(FICHIER_LIVRE, TITRE, AUTEUR))
+                extract_characters_progressively(vectordb, get_llm_extractor(), TITRE, AUTEUR, RELATIONS_DIR,
+                                                 cache=cache, resume=args.resume, chunks=chunks)
+            finally:
+                cache.close()
+        elif choice == "2":
+            local_qa(vectordb, get_qa_llm(), TITRE, AUTEUR, bm25=load_lexical_index(TITRE, vectordb))
+        else:
+            print("Option invalide.")
+    finally:
+        print("\n" + format_summary(tracer.finish()))
+        if _llm_router is not None:
+            print(format_endpoint_stats(_llm_router.stats()))
+            _llm_router.close()
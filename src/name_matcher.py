@@ -0,0 +1,72 @@
+import re
+
+
+def _normalize(name):
+    return name.strip().lower()
+
+
+def _is_word_char(c):
+    return c.isalnum() or c == "_"
+
+
+def _trie_pattern(node):
+    """
+    Construit récursivement l'expression régulière d'un trie de caractères.
+    Les continuations sont essayées avant la fin de nom, pour préférer la correspondance la plus longue.
+    """
+    terminal = "" in node
+    branches = [re.escape(c) + _trie_pattern(child) for c, child in sorted(node.items()) if c != ""]
+    if not branches:
+        return ""
+    if len(branches) == 1 and not terminal:
+        return branches[0]
+    pattern = "(?:" + "|".join(branches) + ")"
+    return pattern + "?" if terminal else pattern
+
+
+class NameMatcher:
+    """
+    Recherche simultanée d'un ensemble de noms dans un texte.
+
+    Les noms sont compilés une seule fois en une expression régulière factorisée (trie),
+    puis le texte est parcouru en une seule passe. La sémantique est celle de
+    `is_name_in_text` : correspondance littérale entre limites de mots, insensible à la casse.
+    """
+
+    def __init__(self, names):
+        self.names = {_normalize(n) for n in names if n and n.strip()}
+        self._lengths = sorted({len(n) for n in self.names})
+        trie = {}
+        for name in self.names:
+            node = trie
+            for c in name:
+                node = node.setdefault(c, {})
+            node[""] = {}
+        body = _trie_pattern(trie)
+        # Lookahead : autorise les correspondances qui se chevauchent
+        self._regex = re.compile(rf"(?=\b({body})\b)", re.IGNORECASE) if self.names else None
+
+    def _is_boundary(self, text, end):
+        before = end > 0 and _is_word_char(text[end - 1])
+        after = end < len(text) and _is_word_char(text[end])
+        return before != after
+
+    def find_all(self, text):
+        """
+        Retourne l'ensemble des noms (normalisés) présents dans le texte.
+        """
+        found = set()
+        if self._regex is None:
+            return found
+        for m in self._regex.finditer(text):
+            matched = m.group(1)
+            found.add(matched.lower())
+            # Les noms plus courts commençant à la même position (préfixes) sont masqués
+            # par la correspondance la plus longue : on les vérifie séparément.
+            start = m.start(1)
+            for length in self._lengths:
+                if length >= len(matched):
+                    break
+                if matched[:length].lower() in self.names and self._is_boundary(text, start + length):
+                    found.add(matched[:length].lower())
+        return found
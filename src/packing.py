@@ -0,0 +1,103 @@
+import math
+import threading
+
+# ===================== CONFIG =====================
+CHARS_PER_TOKEN = 3.0  # estimation prudente (texte français) si le tokenizer du modèle est indisponible
+MIN_OVERLAP = 20       # chevauchement minimal retiré entre deux chunks (évite les coïncidences)
+SEPARATEUR = "\n\n"
+
+
+class TokenCounter:
+    """
+    Compte les tokens d'un texte avec le tokenizer du modèle cible (fichier tokenizer.json du Hub
+    Hugging Face, lu par la bibliothèque `tokenizers`), chargé au premier usage.
+
+    Si le tokenizer ne peut pas être chargé (bibliothèque absente, hors ligne), le nombre de tokens
+    est estimé à partir du nombre de caractères, avec une marge qui évite de dépasser la fenêtre.
+    """
+
+    def __init__(self, tokenizer_name=None, chars_per_token=CHARS_PER_TOKEN):
+        self.tokenizer_name = tokenizer_name
+        self.chars_per_token = chars_per_token
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._tokenizer is None:
+                self._tokenizer = False
+                if self.tokenizer_name:
+                    try:
+                        from tokenizers import Tokenizer
+                        self._tokenizer = Tokenizer.from_pretrained(self.tokenizer_name)
+                    except Exception as e:
+                        print(f"Tokenizer '{self.tokenizer_name}' indisponible ({e}) → "
+                              f"estimation à {self.chars_per_token} caractères par token")
+        return self._tokenizer
+
+    @property
+    def exact(self):
+        return bool(self._load())
+
+    def count_many(self, texts):
+        tokenizer = self._load()
+        if tokenizer:
+            return [len(e.ids) for e in tokenizer.encode_batch(list(texts), add_special_tokens=False)]
+        return [math.ceil(len(t) / self.chars_per_token) for t in texts]
+
+    def count(self, text):
+        return self.count_many([text])[0]
+
+
+def overlap_length(previous, following, max_overlap):
+    """
+    Longueur du plus long suffixe de `previous` qui commence `following` (le chevauchement
+    laissé par le découpage entre deux chunks consécutifs), ou 0 s'il est inférieur à MIN_OVERLAP.
+    """
+    for k in range(min(len(previous), len(following), max_overlap), MIN_OVERLAP - 1, -1):
+        if previous.endswith(following[:k]):
+            return k
+    return 0
+
+
+def pack_chunks(contexts, count_many, budget, max_overlap):
+    """
+    Regroupe des chunks consécutifs en lots d'au plus `budget` tokens chacun.
+
+    Le chevauchement entre deux chunks consécutifs d'un même lot n'est envoyé qu'une fois. Un chunk
+    qui dépasse à lui seul le budget forme un lot à part.
+
+    Args:
+        contexts (list): Textes des chunks, dans l'ordre.
+        count_many (callable): Nombre de tokens de chaque texte d'une liste (TokenCounter.count_many).
+        budget (int): Tokens disponibles pour le texte d'un lot.
+        max_overlap (int): Chevauchement maximal recherché entre deux chunks (caractères).
+
+    Returns:
+        list: Lots {"chunks": [indices des chunks], "text": texte envoyé, "tokens": taille estimée}.
+    """
+    # Chaque chunk est compté une fois, entier et sans son chevauchement avec le précédent
+    overlaps = [0] + [overlap_length(a, b, max_overlap) for a, b in zip(contexts, contexts[1:])]
+    trimmed = [c[k:].lstrip() for c, k in zip(contexts, overlaps)]
+    full_tokens = count_many(contexts)
+    trimmed_tokens = count_many(trimmed)
+    sep_tokens = count_many([SEPARATEUR])[0]
+
+    packs = []
+    current, parts, tokens = [], [], 0
+    for i, text in enumerate(contexts):
+        if current and overlaps[i]:
+            # Suite directe du chunk précédent : le texte commun n'est pas répété
+            part, cost = " " + trimmed[i], trimmed_tokens[i]
+        else:
+            part, cost = (SEPARATEUR if current else "") + text, (sep_tokens if current else 0) + full_tokens[i]
+        if current and tokens + cost > budget:
+            packs.append({"chunks": current, "text": "".join(parts), "tokens": tokens})
+            current, parts, tokens = [], [], 0
+            part, cost = text, full_tokens[i]
+        current.append(i)
+        parts.append(part)
+        tokens += cost
+    if current:
+        packs.append({"chunks": current, "text": "".join(parts), "tokens": tokens})
+    return packs
@@ -0,0 +1,61 @@
+import re
+
+# Mots capitalisés fréquents en début de phrase qui ne sont pas des noms propres
+MOTS_OUTILS = {
+    "a", "à", "ah", "ai", "alors", "après", "au", "aucun", "aussi", "autant", "avant", "avec",
+    "c", "ça", "car", "ce", "cela", "celle", "celui", "ces", "cet", "cette", "chapitre", "chaque",
+    "comme", "comment", "d", "dans", "de", "depuis", "des", "dès", "dieu", "dit", "donc", "du",
+    "elle", "elles", "en", "enfin", "ensuite", "entre", "et", "eh", "il", "ils", "j", "je", "jamais",
+    "l", "la", "là", "le", "les", "leur", "leurs", "lorsque", "lui", "m", "ma", "madame", "mademoiselle",
+    "mais", "me", "même", "mes", "moi", "mon", "monsieur", "n", "ne", "ni", "non", "nos", "notre",
+    "nous", "o", "oh", "on", "or", "ou", "où", "oui", "par", "parce", "partie", "pendant", "peut",
+    "pour", "pourquoi", "puis", "qu", "quand", "que", "quel", "quelle", "quelque", "qui", "quoi",
+    "s", "sa", "sans", "se", "selon", "ses", "si", "son", "sous", "sur", "t", "ta", "tandis", "te",
+    "tes", "toi", "ton", "tous", "tout", "toute", "toutes", "tu", "un", "une", "vers", "voici",
+    "voilà", "vos", "votre", "vous", "y", "titre", "auteur",
+    # anglais, pour les livres non traduits
+    "the", "he", "she", "it", "they", "we", "i", "but", "and", "then", "when", "what", "chapter"
+}
+
+MAJUSCULES = "A-ZÀÂÄÇÉÈÊËÎÏÔÖÙÛÜŸÆŒ"
+MINUSCULES = "a-zàâäçéèêëîïôöùûüÿæœ"
+
+# Mot commençant par une majuscule suivie d'au moins une minuscule (exclut les sigles)
+CANDIDAT_RE = re.compile(rf"(?<!\w)[{MAJUSCULES}][{MINUSCULES}]+(?:-[{MAJUSCULES}]?[{MINUSCULES}]+)*")
+
+
+def candidate_names(text):
+    """
+    Retourne l'ensemble des noms propres candidats d'un texte.
+
+    Heuristique volontairement simple et rapide : mots capitalisés qui ne font pas partie
+    des mots-outils courants (articles, pronoms, conjonctions...).
+    """
+    return {
+        token for token in CANDIDAT_RE.findall(text)
+        if token.lower() not in MOTS_OUTILS
+    }
+
+
+def is_candidate_chunk(text, min_names=2):
+    """
+    Indique si un chunk mérite d'être envoyé au LLM.
+
+    Une relation n'est conservée à la fusion que si les noms des deux personnages apparaissent
+    dans le chunk : un chunk contenant moins de `min_names` noms candidats distincts ne peut
+    donc rien apporter au graphe exporté.
+    """
+    return len(candidate_names(text)) >= min_names
+
+
+def prefilter_chunks(chunks, min_names=2):
+    """
+    Filtre un flux de chunks et retourne (chunks retenus, nombre total de chunks examinés).
+    """
+    kept = []
+    total = 0
+    for chunk in chunks:
+        total += 1
+        if is_candidate_chunk(chunk, min_names=min_names):
+            kept.append(chunk)
+    return kept, total
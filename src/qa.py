@@ -0,0 +1,165 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+
+from bm25_index import hybrid_search
+from telemetry import record
+
+
+class LRUCache:
+    """
+    Cache LRU borné, utilisable depuis plusieurs threads.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+def normalize_question(question):
+    """
+    Forme normalisée d'une question (casse, espaces, ponctuation finale), pour que des
+    questions quasi identiques partagent le même vecteur et les mêmes chunks.
+    """
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").lower()
+
+
+def build_qa_prompt(question, docs):
+    context = "\n\n".join([d.page_content for d in docs])
+    return f"""
+Réponds UNIQUEMENT à partir du contexte. Si tu ne sais pas, dis "Je ne sais pas".
+
+Contexte :
+{context}
+
+Question : {question}
+Réponse :
+"""
+
+
+class QAEngine:
+    """
+    Questions-réponses sur une base Chroma, avec réponse en flux et caches.
+
+    - les vecteurs des questions et les chunks retrouvés sont gardés dans des caches LRU,
+      indexés par la question normalisée ;
+    - une question posée exactement à l'identique reçoit la réponse déjà générée ;
+    - si un index BM25 est fourni, la recherche est hybride (vecteurs + lexical, fusion RRF),
+      ce qui retrouve mieux les chunks citant un nom propre.
+
+    Chaque réponse est accompagnée de ses temps d'exécution (secondes) : "embed", "search",
+    "prompt", "first_token" et "total".
+    """
+
+    def __init__(self, vectordb, embeddings, llm, k=5, cache_size=256, bm25=None):
+        self.vectordb = vectordb
+        self.bm25 = bm25
+        self.embeddings = embeddings
+        self.llm = llm
+        self.k = k
+        self.query_vectors = LRUCache(cache_size)
+        self.retrievals = LRUCache(cache_size)
+        self.answers = LRUCache(cache_size)
+
+    def needs_embedding(self, question):
+        """
+        Indique si la question doit être vectorisée (ni son vecteur ni ses chunks ne sont en cache).
+        """
+        key = normalize_question(question)
+        return self.retrievals.get((key, self.k)) is None and self.query_vectors.get(key) is None
+
+    def retrieve(self, question, timings=None, vector=None):
+        """
+        Retourne les k chunks les plus proches de la question.
+        Le vecteur de la question peut être fourni s'il a déjà été calculé (par lot, par exemple).
+        """
+        timings = timings if timings is not None else {}
+        key = normalize_question(question)
+
+        debut = time.perf_counter()
+        if vector is not None:
+            self.query_vectors.put(key, vector)
+        vector = self.query_vectors.get(key)
+        docs = self.retrievals.get((key, self.k))
+        if docs is None and vector is None:
+            vector = self.embeddings.embed_query(question)
+            self.query_vectors.put(key, vector)
+        timings["embed"] = time.perf_counter() - debut
+
+        debut = time.perf_counter()
+        if docs is None:
+            if self.bm25 is not None:
+                docs = hybrid_search(self.vectordb, self.bm25, question, k=self.k, vector=vector)
+            else:
+                docs = self.vectordb.similarity_search_by_vector(vector, k=self.k)
+            self.retrievals.put((key, self.k), docs)
+        timings["search"] = time.perf_counter() - debut
+        record("retrieval", timings["embed"] + timings["search"], k=self.k, results=len(docs),
+               embed_s=timings["embed"], search_s=timings["search"], hybrid=self.bm25 is not None)
+        return docs
+
+    def stream_answer(self, question, timings=None):
+        """
+        Génère la réponse morceau par morceau, dès que le modèle les produit.
+
+        Si un dictionnaire `timings` est fourni, il est rempli avec les temps de la question
+        une fois le générateur épuisé.
+        """
+        debut = time.perf_counter()
+        timings = timings if timings is not None else {}
+        timings["cached"] = False
+
+        cached = self.answers.get(question.strip())
+        if cached is not None:
+            timings.update(cached=True, embed=0.0, search=0.0, prompt=0.0)
+            timings["first_token"] = timings["total"] = time.perf_counter() - debut
+            yield cached
+            return
+
+        docs = self.retrieve(question, timings)
+
+        t = time.perf_counter()
+        prompt = build_qa_prompt(question, docs)
+        timings["prompt"] = time.perf_counter() - t
+
+        parts = []
+        for token in self.llm.stream(prompt):
+            if not parts:
+                timings["first_token"] = time.perf_counter() - debut
+            parts.append(token)
+            yield token
+        timings.setdefault("first_token", time.perf_counter() - debut)
+        timings["total"] = time.perf_counter() - debut
+        self.answers.put(question.strip(), "".join(parts))
+
+    def answer(self, question):
+        """
+        Retourne la réponse complète et ses temps d'exécution.
+        """
+        timings = {}
+        answer = "".join(self.stream_answer(question, timings))
+        return answer, timings
+
+
+def format_timings(timings):
+    if timings.get("cached"):
+        return f"[réponse en cache — {timings['total'] * 1000:.0f} ms]"
+    return (f"[embed {timings['embed'] * 1000:.0f} ms | recherche {timings['search'] * 1000:.0f} ms | "
+            f"prompt {timings['prompt'] * 1000:.0f} ms | 1er token {timings['first_token']:.2f} s | "
+            f"total {timings['total']:.2f} s]")
@@ -0,0 +1,317 @@
+import json
+import time
+import asyncio
+import threading
+import argparse
+
+from qa import QAEngine, build_qa_prompt
+
+# ===================== CONFIG =====================
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_LLM_CONCURRENCY = 2   # générations simultanées envoyées à Ollama
+MAX_PENDING = 32          # questions en attente du LLM au-delà desquelles le serveur répond 503
+BATCH_WINDOW_MS = 10      # délai de regroupement des questions à vectoriser
+MAX_BATCH_SIZE = 32
+
+
+class FakeLLM:
+    """
+    Remplaçant local du LLM pour les essais : renvoie une réponse fixe, mot par mot,
+    avec une latence configurable avant le premier mot et entre deux mots.
+    """
+
+    def __init__(self, first_token_delay=0.2, token_delay=0.02, answer="Je ne sais pas."):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.answer = answer
+
+    def stream(self, prompt):
+        time.sleep(self.first_token_delay)
+        for i, word in enumerate(self.answer.split(" ")):
+            if i:
+                time.sleep(self.token_delay)
+            yield word if i == 0 else " " + word
+
+    def invoke(self, prompt):
+        return "".join(self.stream(prompt))
+
+
+class EmbeddingBatcher:
+    """
+    Regroupe les questions à vectoriser arrivées dans une même fenêtre de temps
+    et les vectorise en un seul appel au modèle.
+    """
+
+    def __init__(self, embeddings, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH_SIZE):
+        self.embeddings = embeddings
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def embed(self, text):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = asyncio.get_running_loop().time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await asyncio.to_thread(self.embeddings.embed_queries, texts)
+                for (_, future), vector in zip(batch, vectors):
+                    if not future.done():
+                        future.set_result(vector)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+
+class QAServer:
+    """
+    Serveur HTTP de questions-réponses partagé entre plusieurs utilisateurs.
+
+    Un seul modèle d'embeddings, une seule base Chroma et les caches du QAEngine sont partagés
+    par toutes les requêtes. Les questions à vectoriser sont regroupées par lots, au plus
+    `max_llm` générations tournent en même temps et, au-delà de `max_pending` questions en
+    attente du LLM, les nouvelles requêtes reçoivent 503 (Retry-After).
+
+    Routes :
+        GET  /health -> {"status": "ok", "en_cours": ..., "en_attente": ...}
+        POST /ask    {"question": "...", "stream": false}
+                     -> {"answer": ..., "timings": {...}}, ou avec "stream": true,
+                        une ligne JSON par morceau de réponse ({"token": ...}) puis {"timings": ...}.
+    """
+
+    def __init__(self, engine, max_llm=MAX_LLM_CONCURRENCY, max_pending=MAX_PENDING,
+                 batch_window_ms=BATCH_WINDOW_MS):
+        self.engine = engine
+        self.max_pending = max_pending
+        self.batcher = EmbeddingBatcher(engine.embeddings, window_ms=batch_window_ms)
+        self._llm_slots = asyncio.Semaphore(max_llm)
+        self.pending = 0
+        self.running = 0
+
+    async def answer(self, question, on_token):
+        """
+        Répond à une question en appelant `on_token` (coroutine) pour chaque morceau de réponse.
+        Retourne les temps d'exécution.
+        """
+        debut = time.perf_counter()
+        timings = {"cached": False}
+
+        cached = self.engine.answers.get(question.strip())
+        if cached is not None:
+            await on_token(cached)
+            timings.update(cached=True, total=time.perf_counter() - debut)
+            return timings
+
+        # Une question compte comme « en attente » jusqu'à ce qu'elle obtienne une place auprès du LLM
+        self.pending += 1
+        try:
+            vector = None
+            if self.engine.needs_embedding(question):
+                t = time.perf_counter()
+                vector = await self.batcher.embed(question)
+                timings["embed_batch"] = time.perf_counter() - t
+            docs = await asyncio.to_thread(self.engine.retrieve, question, timings, vector)
+            prompt = build_qa_prompt(question, docs)
+            await self._llm_slots.acquire()
+        finally:
+            self.pending -= 1
+        self.running += 1
+        try:
+            parts = await self._stream_llm(prompt, on_token, timings, debut)
+        finally:
+            self.running -= 1
+            self._llm_slots.release()
+
+        self.engine.answers.put(question.strip(), "".join(parts))
+        timings["total"] = time.perf_counter() - debut
+        return timings
+
+    async def _stream_llm(self, prompt, on_token, timings, debut):
+        """
+        Exécute le générateur (bloquant) du LLM dans un thread et relaie ses morceaux.
+
+        Si le client se déconnecte (ou en cas d'erreur), la génération est arrêtée et ne rend la
+        main qu'une fois le générateur fermé : la place auprès du LLM n'est libérée qu'après.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        fin = object()
+        stop = threading.Event()
+
+        def produire():
+            try:
+                stream = self.engine.llm.stream(prompt)
+                try:
+                    for token in stream:
+                        if stop.is_set():
+                            break
+                        loop.call_soon_threadsafe(queue.put_nowait, token)
+                finally:
+                    if hasattr(stream, "close"):
+                        stream.close()
+                loop.call_soon_threadsafe(queue.put_nowait, fin)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        producteur = loop.run_in_executor(None, produire)
+        parts = []
+        try:
+            while True:
+                token = await queue.get()
+                if token is fin:
+                    break
+                if isinstance(token, Exception):
+                    raise token
+                if not parts:
+                    timings["first_token"] = time.perf_counter() - debut
+                parts.append(token)
+                await on_token(token)
+        finally:
+            stop.set()
+            await producteur
+        return parts
+
+    # ---------- HTTP ----------
+    async def handle(self, reader, writer):
+        try:
+            method, path, body = await self._read_request(reader)
+            if method == "GET" and path == "/health":
+                await self._send_json(writer, 200, {"status": "ok", "en_cours": self.running,
+                                                    "en_attente": self.pending})
+            elif method == "POST" and path == "/ask":
+                await self._ask(writer, body)
+            else:
+                await self._send_json(writer, 404, {"erreur": "route inconnue"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            try:
+                await self._send_json(writer, 500, {"erreur": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _ask(self, writer, body):
+        try:
+            payload = json.loads(body or b"{}")
+            question = payload["question"].strip()
+        except (ValueError, KeyError, AttributeError):
+            await self._send_json(writer, 400, {"erreur": "JSON attendu : {\"question\": \"...\"}"})
+            return
+        if self.pending >= self.max_pending:
+            await self._send_json(writer, 503, {"erreur": "serveur saturé, réessayez plus tard"},
+                                  headers={"Retry-After": "1"})
+            return
+
+        if not payload.get("stream"):
+            parts = []
+
+            async def collect(token):
+                parts.append(token)
+
+            timings = await self.answer(question, collect)
+            await self._send_json(writer, 200, {"answer": "".join(parts).strip(), "timings": timings})
+            return
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+
+        async def send_line(obj):
+            data = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            await writer.drain()
+
+        async def send_token(token):
+            await send_line({"token": token})
+
+        timings = await self.answer(question, send_token)
+        await send_line({"timings": timings})
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def _read_request(reader):
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) < 2:
+            raise ConnectionError("requête vide")
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        body = await reader.readexactly(length) if length else b""
+        return request_line[0].upper(), request_line[1].split("?")[0], body
+
+    @staticmethod
+    async def _send_json(writer, status, obj, headers=None):
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error",
+                   503: "Service Unavailable"}
+        data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        lines = [f"HTTP/1.1 {status} {reasons.get(status, '')}",
+                 "Content-Type: application/json; charset=utf-8",
+                 f"Content-Length: {len(data)}",
+                 "Connection: close"]
+        lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + data)
+        await writer.drain()
+
+    async def serve(self, host=HOST, port=PORT, socket_path=None):
+        self.batcher.start()
+        if socket_path:
+            server = await asyncio.start_unix_server(self.handle, path=socket_path)
+            print(f"Serveur Q&A à l'écoute sur {socket_path}")
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            print(f"Serveur Q&A à l'écoute sur http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur HTTP de Q&A sur un livre indexé.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--socket", help="écoute sur une socket Unix au lieu de TCP")
+    parser.add_argument("--max-llm", type=int, default=MAX_LLM_CONCURRENCY,
+                        help="générations simultanées (à aligner sur OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING,
+                        help="questions en attente au-delà desquelles le serveur répond 503")
+    parser.add_argument("--batch-window-ms", type=int, default=BATCH_WINDOW_MS,
+                        help="fenêtre de regroupement des questions à vectoriser")
+    parser.add_argument("--fake-llm", action="store_true", help="utilise un faux LLM local (essais)")
+    args = parser.parse_args()
+
+    from main import AUTEUR, FICHIER_LIVRE, TITRE, embeddings, get_qa_llm, load_lexical_index, load_vectordb
+
+    vectordb = load_vectordb(FICHIER_LIVRE, TITRE, AUTEUR, embeddings)
+    bm25 = load_lexical_index(TITRE, vectordb)
+    llm = FakeLLM() if args.fake_llm else get_qa_llm()
+    server = QAServer(QAEngine(vectordb, embeddings, llm, k=5, bm25=bm25), max_llm=args.max_llm,
+                      max_pending=args.max_pending, batch_window_ms=args.batch_window_ms)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,114 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+
+def chunks_fingerprint(contexts):
+    """
+    Calcule une empreinte de la liste ordonnée des chunks d'une extraction.
+    Deux exécutions ne peuvent partager un journal que si leurs empreintes sont identiques.
+    """
+    h = hashlib.sha256()
+    for context in contexts:
+        h.update(hashlib.sha256(context.encode("utf-8")).digest())
+    return h.hexdigest()
+
+
+def write_json_atomic(path, data):
+    """
+    Écrit un fichier JSON de façon atomique (fichier temporaire puis remplacement),
+    pour qu'un lecteur concurrent ne voie jamais un fichier à moitié écrit.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class RunJournal:
+    """
+    Journal append-only (JSONL) d'une extraction.
+
+    La première ligne décrit l'exécution (livre, modèle, empreinte des chunks, fichier de sortie),
+    chaque ligne suivante contient le résultat brut d'un chunk. Le journal est vidé sur disque
+    après chaque chunk : en cas d'interruption, il suffit de rejouer les résultats enregistrés,
+    dans l'ordre des chunks, pour reconstruire l'état de fusion.
+    """
+
+    def __init__(self, path, header, done=None, append=False):
+        self.path = path
+        self.header = header
+        self.done = done or {}
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+        if not append:
+            self._write({"type": "run", **header})
+        elif self._file.tell() > 0:
+            # Termine une éventuelle ligne tronquée avant d'ajouter de nouveaux enregistrements
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write("\n")
+
+    @classmethod
+    def open(cls, path, header, resume=False):
+        """
+        Ouvre le journal d'une exécution.
+
+        Avec `resume=True`, relit le journal existant si son empreinte correspond à celle de
+        `header` ; les chunks déjà traités sont exposés dans `journal.done` (index -> personnages)
+        et l'en-tête d'origine est conservé. Sinon, un nouveau journal est créé.
+        """
+        dossier = os.path.dirname(path)
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+
+        if resume and os.path.exists(path):
+            old_header, done = cls._read(path)
+            if old_header and old_header.get("fingerprint") == header.get("fingerprint"):
+                print(f"Reprise de l'exécution : {len(done)} chunks déjà traités ({path})")
+                return cls(path, old_header, done=done, append=True)
+            print(f"Journal '{path}' incompatible avec les chunks actuels → nouvelle exécution")
+
+        return cls(path, header)
+
+    @staticmethod
+    def _read(path):
+        header = None
+        done = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # dernière ligne tronquée par une interruption
+                if record.get("type") == "run":
+                    header = record
+                elif record.get("type") == "chunk" and record.get("characters") is not None:
+                    done[record["index"]] = record["characters"]
+        return header, done
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def record_chunk(self, index, characters=None, error=None):
+        """
+        Enregistre le résultat d'un chunk : la liste brute des personnages, ou l'erreur rencontrée.
+        Les chunks en erreur seront retentés lors d'une reprise.
+        """
+        record = {"type": "chunk", "index": index, "characters": characters}
+        if error is not None:
+            record["error"] = str(error)
+        self._write(record)
+        if characters is not None:
+            self.done[index] = characters
+
+    def finish(self, out_file):
+        self._write({"type": "done", "out_file": out_file, "finished_at": datetime.now().isoformat()})
+        self.close()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
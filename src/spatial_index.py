@@ -0,0 +1,36 @@
+import numpy as np
+
+
+class SpatialGrid:
+    """
+    Grille uniforme sur des disques (centre, rayon) en coordonnées écran.
+
+    La taille des cellules est celle du plus grand rayon : un point ne peut donc toucher
+    que les disques des 3 × 3 cellules qui l'entourent, quel que soit le nombre de nœuds.
+    """
+
+    def __init__(self, centers, radii):
+        self.centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        self.radii = np.asarray(radii, dtype=float)
+        self.cell = max(float(self.radii.max()) if len(self.radii) else 1.0, 1.0)
+        self.cells = {}
+        keys = np.floor(self.centers / self.cell).astype(int)
+        for i, (cx, cy) in enumerate(keys.tolist()):
+            self.cells.setdefault((cx, cy), []).append(i)
+
+    def hit(self, x, y):
+        """
+        Retourne l'indice du disque contenant le point (x, y), ou None.
+        Si plusieurs disques se recouvrent, celui dont le centre est relativement le plus proche l'emporte.
+        """
+        cx, cy = int(np.floor(x / self.cell)), int(np.floor(y / self.cell))
+        candidates = [
+            i for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+            for i in self.cells.get((cx + dx, cy + dy), ())
+        ]
+        if not candidates:
+            return None
+        idx = np.array(candidates)
+        dist = np.hypot(self.centers[idx, 0] - x, self.centers[idx, 1] - y) / self.radii[idx]
+        best = int(np.argmin(dist))
+        return candidates[best] if dist[best] <= 1 else None
@@ -0,0 +1,173 @@
+import os
+import io
+import json
+import time
+import pstats
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+# ===================== CONFIG =====================
+PERCENTILES = (50, 90, 99)
+PROFILE_TOP = 25  # lignes affichées pour cProfile / tracemalloc
+# Attributs additionnés dans le résumé (les autres, comme un numéro de chunk, ne sont que tracés)
+SUMMED_FIELDS = {
+    "chars", "chunks", "texts", "encoded", "chunk_chars", "prompt_chars", "results",
+    "prompt_tokens", "completion_tokens", "completions", "validation_retries"
+}
+
+
+class Tracer:
+    """
+    Mesures d'une exécution : chaque opération instrumentée (conversion, indexation, recherche,
+    appel LLM, fusion...) produit un événement {"name", "ts", "seconds", ...attributs}.
+
+    Les durées et les compteurs (tokens, tailles) sont toujours agrégés en mémoire pour le résumé de fin
+    d'exécution ; les événements ne sont écrits (une ligne JSON chacun) que si une trace a été
+    ouverte avec start(). Sûr entre threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file = None
+        self._profiler = None
+        self._profile_mode = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.path = None
+            self.started = time.perf_counter()
+            self.durations = {}
+            self.errors = {}
+            self.totals = {}
+
+    def start(self, path=None, profile=None):
+        """
+        Commence une exécution : ouvre la trace JSONL `path` (si fourni) et active le profilage
+        `profile` ("cprofile" ou "tracemalloc") jusqu'à finish().
+        """
+        self.reset()
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+            self.path = path
+        self._profile_mode = profile
+        if profile == "cprofile":
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif profile == "tracemalloc":
+            import tracemalloc
+            tracemalloc.start()
+        elif profile:
+            raise ValueError(f"Profilage inconnu : {profile}")
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """
+        Chronomètre un bloc. Le dictionnaire d'attributs produit peut être complété pendant
+        le bloc (tokens, tailles...) ; une exception est notée dans "error" puis propagée.
+        """
+        debut = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.record(name, time.perf_counter() - debut, **attrs)
+
+    def record(self, name, seconds, **attrs):
+        """
+        Enregistre une opération déjà chronométrée.
+        """
+        with self._lock:
+            self.durations.setdefault(name, []).append(seconds)
+            if "error" in attrs:
+                self.errors[name] = self.errors.get(name, 0) + 1
+            totals = self.totals.setdefault(name, {})
+            for field in SUMMED_FIELDS.intersection(attrs):
+                totals[field] = totals.get(field, 0) + attrs[field]
+            if self._file is not None:
+                event = {"name": name, "ts": time.time(), "seconds": round(seconds, 6), **attrs}
+                self._file.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+                self._file.flush()
+
+    def summary(self):
+        """
+        Résumé par opération : nombre, erreurs, durée totale et percentiles (secondes), totaux
+        des attributs numériques et, pour les appels LLM, débit en tokens générés par seconde.
+        """
+        with self._lock:
+            result = {"wall_seconds": time.perf_counter() - self.started, "operations": {}}
+            for name, durees in self.durations.items():
+                values = np.asarray(durees)
+                stats = {"count": len(durees), "errors": self.errors.get(name, 0), "total_s": float(values.sum())}
+                for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                    stats[f"p{p}_s"] = float(v)
+                stats["max_s"] = float(values.max())
+                stats.update(self.totals.get(name, {}))
+                if "completion_tokens" in stats and stats["total_s"] > 0:
+                    # Débit d'un appel (tokens générés / durée des appels) et débit global de l'exécution
+                    stats["tokens_per_s"] = stats["completion_tokens"] / stats["total_s"]
+                    stats["tokens_per_wall_s"] = stats["completion_tokens"] / max(result["wall_seconds"], 1e-9)
+                result["operations"][name] = stats
+            return result
+
+    def finish(self):
+        """
+        Termine l'exécution : arrête le profilage, écrit le résumé à la fin de la trace,
+        ferme celle-ci et retourne le résumé.
+        """
+        summary = self.summary()
+        if self._profiler is not None:
+            self._profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+            summary["profile"] = out.getvalue()
+            if self.path:
+                self._profiler.dump_stats(os.path.splitext(self.path)[0] + ".prof")
+            self._profiler = None
+        elif self._profile_mode == "tracemalloc":
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:PROFILE_TOP]
+            tracemalloc.stop()
+            summary["memory"] = {"current_bytes": current, "peak_bytes": peak, "top": [str(s) for s in top]}
+        self._profile_mode = None
+        with self._lock:
+            if self._file is not None:
+                self._file.write(json.dumps({"name": "summary", "ts": time.time(), **summary},
+                                            ensure_ascii=False) + "\n")
+                self._file.close()
+                self._file = None
+        return summary
+
+
+def format_summary(summary):
+    """
+    Tableau lisible du résumé (durées en millisecondes).
+    """
+    lignes = [f"{'opération':<14}{'n':>6}{'err':>5}{'total':>10}{'p50':>9}{'p90':>9}{'p99':>9}  tokens"]
+    for name, s in sorted(summary["operations"].items(), key=lambda item: -item[1]["total_s"]):
+        tokens = ""
+        if "completion_tokens" in s:
+            tokens = (f"{s.get('prompt_tokens', 0):.0f} → {s['completion_tokens']:.0f} "
+                      f"({s.get('tokens_per_s', 0):.1f} tok/s par appel, {s.get('tokens_per_wall_s', 0):.1f} tok/s global)")
+        lignes.append(f"{name:<14}{s['count']:>6}{s['errors']:>5}{s['total_s']:>9.2f}s"
+                      f"{s['p50_s'] * 1000:>7.0f}ms{s['p90_s'] * 1000:>7.0f}ms{s['p99_s'] * 1000:>7.0f}ms  {tokens}")
+    lignes.append(f"Durée totale : {summary['wall_seconds']:.1f}s")
+    if "profile" in summary:
+        lignes.append(summary["profile"])
+    if "memory" in summary:
+        lignes.append(f"Mémoire : pic {summary['memory']['peak_bytes'] / 1e6:.1f} Mo")
+        lignes.extend(summary["memory"]["top"])
+    return "\n".join(lignes)
+
+
+# Traceur de l'exécution en cours, partagé par les modules instrumentés
+tracer = Tracer()
+span = tracer.span
+record = tracer.record